@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ファイルの一括判定（CSV / JSONL）
+
+入力ファイルをチャンク単位で読み込み、classify_batch（バッチEmbedding・まとめて判定・結果キャッシュ）で
+並列に判定して、入力の順序のまま結果を逐次書き出します（全件をメモリに載せません）。
+進捗ファイルに書き込み済みの行数を記録し、--resume で中断した位置から再開できます。
+
+使い方（backend ディレクトリで実行。リポジトリのルートでは python main.py bulk ... でも実行できます）:
+    python -m app.bulk answers.csv -o results.jsonl
+    python -m app.bulk answers.csv -o results.jsonl --resume
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+from . import config
+from .classifier import OccupationClassifier
+
+
+# backend ディレクトリ（職業データCSVの相対パスの基準）
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def default_catalog_path() -> str:
+    """職業データCSVのデフォルト（OCCUPATION_CSV_PATH。相対パスは backend ディレクトリ基準）"""
+    path = config.OCCUPATION_CSV_PATH
+    return path if os.path.isabs(path) else os.path.join(BACKEND_DIR, path)
+
+
+# 一括判定の出力項目
+BULK_OUTPUT_FIELDS = ["row", "user_input", "code", "name", "reason", "decision_path", "error"]
+
+
+def iter_input_chunks(path: str, column: str, chunk_size: int, skip: int = 0):
+    """
+    入力ファイル（CSV / JSONL）をチャンク単位で読み込む（全件をメモリに載せない）
+    
+    Args:
+        path: 入力ファイルのパス
+        column: 自由記述が入っている列名（JSONLの場合はキー名）
+        chunk_size: 1チャンクあたりの行数
+        skip: 読み飛ばす行数（再開時）
+    
+    Yields:
+        (チャンク先頭の行番号, 自由記述のリスト)
+    """
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.endswith(".jsonl"):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+        
+        chunk, start = [], skip
+        for row_number, row in enumerate(rows):
+            if row_number < skip:
+                continue
+            if column not in row:
+                raise ValueError(f"入力ファイルに列 '{column}' がありません（--column で指定してください）")
+            chunk.append(str(row[column] or ""))
+            if len(chunk) >= chunk_size:
+                yield start, chunk
+                chunk, start = [], row_number + 1
+        if chunk:
+            yield start, chunk
+
+
+class BulkWriter:
+    """
+    一括判定結果の書き込み（CSV / JSONL）と進捗ファイルの管理
+    進捗ファイルには書き込み済みの行数と出力ファイルのサイズを記録し、
+    再開時は出力ファイルをその位置まで切り詰めてから追記します。
+    """
+    
+    def __init__(self, path: str, input_path: str, resume: bool):
+        self.path = path
+        self.progress_path = path + ".progress.json"
+        self.is_csv = path.endswith(".csv")
+        self.completed_rows = 0
+        
+        offset = 0
+        if resume and os.path.exists(self.progress_path):
+            with open(self.progress_path, encoding="utf-8") as f:
+                progress = json.load(f)
+            if progress.get("input") != os.path.abspath(input_path):
+                raise ValueError(f"進捗ファイルは別の入力ファイルのものです: {progress.get('input')}")
+            self.completed_rows = progress["completed_rows"]
+            offset = progress["output_bytes"]
+        
+        if offset and os.path.exists(path):
+            # 前回の中断時に書きかけだった部分を破棄
+            self.file = open(path, "r+", encoding="utf-8", newline="")
+            self.file.truncate(offset)
+            self.file.seek(offset)
+        else:
+            self.file = open(path, "w", encoding="utf-8", newline="")
+        # ヘッダーと各行の改行コードを揃える（JSONL と同じ "\n"）
+        self.csv_writer = (
+            csv.DictWriter(self.file, fieldnames=BULK_OUTPUT_FIELDS, lineterminator="\n") if self.is_csv else None
+        )
+        if self.csv_writer is not None and not offset:
+            self.csv_writer.writeheader()
+        self.input_path = os.path.abspath(input_path)
+    
+    def write_chunk(self, start: int, texts, items):
+        """1チャンク分の結果を書き込み、進捗を記録"""
+        for offset, (text, item) in enumerate(zip(texts, items)):
+            result = item["result"] or {}
+            record = {
+                "row": start + offset,
+                "user_input": text,
+                "code": result.get("code"),
+                "name": result.get("name"),
+                "reason": result.get("reason"),
+                "decision_path": result.get("decision_path"),
+                "error": item["error"],
+            }
+            if self.csv_writer is not None:
+                self.csv_writer.writerow(record)
+            else:
+                self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.completed_rows = start + len(texts)
+        
+        tmp_path = self.progress_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "input": self.input_path,
+                "completed_rows": self.completed_rows,
+                "output_bytes": self.file.tell(),
+            }, f)
+        os.replace(tmp_path, self.progress_path)
+    
+    def close(self):
+        self.file.close()
+
+
+def bulk_main(args):
+    """
+    一括判定：入力ファイルをチャンク単位で読み込み、並列に判定して結果を逐次書き込む
+    """
+    load_dotenv()
+    classifier = OccupationClassifier(csv_path=args.catalog or default_catalog_path())
+    classifier.create_embeddings()
+    
+    writer = BulkWriter(args.output, args.input, resume=args.resume)
+    if writer.completed_rows:
+        print(f"{writer.completed_rows}行目まで処理済みのため、続きから再開します")
+    
+    started = time.monotonic()
+    processed = 0
+    failed = 0
+    pending = deque()
+    
+    def drain(limit: int):
+        """先頭のチャンクから順に完了を待って書き込む（出力の順序を保つ）"""
+        nonlocal processed, failed
+        while len(pending) > limit:
+            start, texts, future = pending.popleft()
+            items = future.result()
+            writer.write_chunk(start, texts, items)
+            processed += len(texts)
+            failed += sum(1 for item in items if item["error"] is not None)
+            elapsed = time.monotonic() - started
+            print(
+                f"  {writer.completed_rows}行 完了（エラー {failed}件） "
+                f"{processed / elapsed if elapsed > 0 else 0:.1f} 行/秒"
+            )
+    
+    executor = ThreadPoolExecutor(max_workers=args.workers)
+    try:
+        for start, texts in iter_input_chunks(args.input, args.column, args.chunk_size, skip=writer.completed_rows):
+            pending.append((start, texts, executor.submit(classifier.classify_batch, texts)))
+            # 実行中のチャンク数を制限してメモリ使用量を一定に保つ
+            drain(args.workers * 2)
+        drain(0)
+    except BaseException:
+        # 中断（Ctrl-C）・エラーの場合は未着手のチャンクを取り消し、完了を待たずに終了する
+        # （結果は書き込まれないが、進捗ファイルは書き込み済みの行までを指すため --resume で再開できる）
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    finally:
+        writer.close()
+    executor.shutdown()
+    
+    elapsed = time.monotonic() - started
+    print(f"完了: {processed}行（エラー {failed}件） {elapsed:.1f}秒, {processed / elapsed if elapsed > 0 else 0:.1f} 行/秒")
+    print(f"出力: {args.output}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="CSV / JSONL ファイルの自由記述を一括判定")
+    parser.add_argument("input", help="入力ファイル（.csv または .jsonl）")
+    parser.add_argument("-o", "--output", required=True, help="出力ファイル（.csv または .jsonl）")
+    parser.add_argument("--column", default="user_input", help="自由記述の列名（デフォルト: user_input）")
+    parser.add_argument("--catalog", default=None,
+                        help="職業分類データのCSV（デフォルト: OCCUPATION_CSV_PATH、backend/data/occupation.csv）")
+    parser.add_argument("--chunk-size", type=int, default=200, help="1チャンクあたりの行数（デフォルト: 200）")
+    parser.add_argument("--workers", type=int, default=4, help="並列に処理するチャンク数（デフォルト: 4）")
+    parser.add_argument("--resume", action="store_true", help="前回中断した位置から再開")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        bulk_main(args)
+    except KeyboardInterrupt:
+        # 未着手のチャンクは bulk_main で取り消し済み、出力ファイルも閉じているため、通常どおり終了する
+        # （実行中のチャンクは完了を待つが、結果は書き込まない）
+        print("\n中断しました。--resume を付けて再実行すると続きから再開できます", file=sys.stderr)
+        sys.exit(130)
+    except (ValueError, RuntimeError) as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
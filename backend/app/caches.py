@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+インプロセスキャッシュ
+件数上限（LRU）と有効期限（TTL）付きのスレッドセーフなキャッシュを提供します。
+"""
+
+import re
+import time
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+def normalize_input(text: str) -> str:
+    """
+    キャッシュキー用にユーザー入力を正規化
+    （NFKC正規化・前後の空白除去・連続する空白の1文字化）
+
+    Args:
+        text: ユーザーの自由記述入力
+
+    Returns:
+        正規化済みのテキスト
+    """
+    text = unicodedata.normalize("NFKC", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class TTLCache:
+    """
+    LRU + TTL キャッシュ
+    上限件数を超えた場合は最も長く使われていないエントリから削除し、
+    有効期限を過ぎたエントリは参照時に削除します。
+    """
+
+    def __init__(self, maxsize: int, ttl: float = 0):
+        """
+        Args:
+            maxsize: 最大件数（0以下の場合はキャッシュしない）
+            ttl: 有効期限（秒）。0以下の場合は無期限
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        値の取得（見つからない・期限切れの場合は default）
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        """
+        値の保存（上限を超えた場合は最も古いエントリを削除）
+        """
+        if self.maxsize <= 0:
+            return
+
+        expires_at = time.monotonic() + self.ttl if self.ttl > 0 else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable):
+        """エントリの削除"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """全エントリの削除"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        """
+        キャッシュの統計情報
+
+        Returns:
+            件数・ヒット数・ミス数・ヒット率など
+        """
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else None,
+        }
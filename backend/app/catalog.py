@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+職業データ（カタログ）
+
+職業データを列ごとのタプル（code / name / description）として保持し、
+候補として返す辞書（code, name, description）と、職業コード → 行番号の索引を
+読み込み時に1度だけ作成します。
+CSVは標準ライブラリの csv モジュールで読み込むため、職業コードは "01" のような
+先頭が0の文字列のまま保持されます（pandas は不要）。
+"""
+
+import csv
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+
+# CSVに必要な列
+COLUMNS = ("code", "name", "description")
+
+
+class OccupationCatalog:
+    """
+    職業データ（読み取り専用）
+    """
+
+    __slots__ = ("codes", "names", "descriptions", "records", "index")
+
+    def __init__(self, codes: Iterable[str], names: Iterable[str], descriptions: Iterable[str]):
+        """
+        Args:
+            codes: 職業コード
+            names: 職業名
+            descriptions: 職業の説明
+
+        Raises:
+            ValueError: 列の長さが一致しない場合・職業コードが重複している場合
+        """
+        self.codes: Tuple[str, ...] = tuple(str(code) for code in codes)
+        self.names: Tuple[str, ...] = tuple(names)
+        self.descriptions: Tuple[str, ...] = tuple(descriptions)
+        if not len(self.codes) == len(self.names) == len(self.descriptions):
+            raise ValueError("職業データの列の長さが一致しません")
+
+        # 候補として返す職業データ（検索ごとに作り直さない）
+        self.records: List[Dict[str, str]] = [
+            {"code": code, "name": name, "description": description}
+            for code, name, description in zip(self.codes, self.names, self.descriptions)
+        ]
+
+        # 職業コード → 行番号
+        self.index: Dict[str, int] = {}
+        for row, code in enumerate(self.codes):
+            if code in self.index:
+                raise ValueError(f"職業コードが重複しています: {code}")
+            self.index[code] = row
+
+    @classmethod
+    def from_csv(cls, path: str) -> "OccupationCatalog":
+        """
+        CSVファイル（code, name, description の列を含む）から読み込み
+
+        Args:
+            path: CSVファイルのパス
+
+        Returns:
+            職業データ
+
+        Raises:
+            ValueError: 必要な列がない場合
+        """
+        # utf-8-sig: Excel で保存したCSVの BOM を除く
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            reader = csv.DictReader(f)
+            missing = [column for column in COLUMNS if column not in (reader.fieldnames or [])]
+            if missing:
+                raise ValueError(f"CSVに必要な列がありません: {', '.join(missing)}（{path}）")
+            return cls.from_records(reader)
+
+    @classmethod
+    def from_records(cls, records: Iterable[Mapping[str, str]]) -> "OccupationCatalog":
+        """
+        辞書（code, name, description）のリストから作成
+
+        Args:
+            records: 職業データ
+
+        Returns:
+            職業データ
+        """
+        codes, names, descriptions = [], [], []
+        for record in records:
+            codes.append(record["code"])
+            names.append(record["name"] or "")
+            descriptions.append(record["description"] or "")
+        return cls(codes, names, descriptions)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def get(self, code: str) -> Optional[Dict[str, str]]:
+        """
+        職業コードから職業データを取得
+
+        Args:
+            code: 職業コード
+
+        Returns:
+            候補データ（code, name, description）。存在しない場合はNone
+        """
+        row = self.index.get(str(code))
+        return None if row is None else self.records[row]
+
+    def rows(self) -> List[Tuple[str, str, str]]:
+        """(code, name, description) のリスト（Embeddingキャッシュのキー作成用）"""
+        return list(zip(self.codes, self.names, self.descriptions))
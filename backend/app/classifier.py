@@ -2,16 +2,75 @@
 # -*- coding: utf-8 -*-
 """
 職業分類判定クラス（RAG構成）
-Google Gemini API を使用
+Google Gemini API を使用（呼び出しは providers のモデルプロバイダー経由）
 """
 
 import os
+import re
 import json
-import pandas as pd
+import time
+import random
+import asyncio
+import hashlib
+import threading
+import contextvars
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import numpy as np
-from typing import List, Dict
-import google.generativeai as genai
-from sklearn.metrics.pairwise import cosine_similarity
+from typing import AsyncIterator, Callable, List, Dict, Optional, Tuple
+
+from . import config, metrics, scheduler, shared_index
+from .caches import TTLCache, normalize_input
+from .catalog import OccupationCatalog
+from .embedding_cache import EmbeddingCache, build_embedding_texts, text_hash
+from .vector_index import VectorIndex, HierarchicalVectorIndex, normalize_rows
+from .result_cache import create_result_cache
+from .singleflight import AsyncSingleFlight
+from .micro_batcher import AsyncMicroBatcher
+from .lexical_index import BM25Index, fuse_scores, rank_records
+from .providers import TRANSIENT_ERRORS, create_provider
+from .prompt_budget import condense_description, fit_descriptions
+
+
+# 判定時の生成の温度（回答は JSON Mode）
+GENERATION_TEMPERATURE = 0.3
+
+# 判定プロンプトのバージョン（プロンプトを変更した場合は上げる。分類結果キャッシュのキーに使用）
+PROMPT_VERSION = "2"
+
+
+
+def _partial_json_string(text: str, field: str) -> Optional[str]:
+    """
+    生成途中のJSONテキストから文字列フィールドの（途中までの）値を取り出す
+
+    Args:
+        text: 生成途中のJSONテキスト
+        field: フィールド名
+
+    Returns:
+        デコード済みの値（フィールドがまだ現れていない場合はNone）
+    """
+    match = re.search(r'"%s"\s*:\s*"' % re.escape(field), text)
+    if match is None:
+        return None
+    raw = text[match.end():]
+    # 閉じ引用符（エスケープされていないもの）があればそこまで
+    end = re.search(r'(?<!\\)(?:\\\\)*"', raw)
+    if end is not None:
+        raw = raw[:end.end() - 1]
+    else:
+        # 途中で切れたエスケープシーケンスは次のチャンクまで保留
+        raw = re.sub(r'\\(u[0-9a-fA-F]{0,3})?$', '', raw)
+    try:
+        return json.loads(f'"{raw}"', strict=False)
+    except ValueError:
+        return None
+
+
+def _elapsed_ms(start: float, end: Optional[float] = None) -> float:
+    """経過時間（ミリ秒、time.perf_counter() の値から計算）"""
+    return round(((time.perf_counter() if end is None else end) - start) * 1000, 3)
 
 
 class OccupationClassifier:
@@ -29,49 +88,120 @@ class OccupationClassifier:
             cls._instance = super().__new__(cls)
         return cls._instance
     
-    def __init__(self, csv_path: str = None, api_key: str = None):
+    def __init__(self, csv_path: str = None, api_key: str = None, max_concurrency: int = None):
         """
         初期化処理
         
         Args:
             csv_path: CSVファイルのパス（Noneの場合はダミーデータを使用）
             api_key: Gemini APIキー（Noneの場合は環境変数から取得）
+            max_concurrency: 非同期APIで同時に処理する分類の上限（Noneの場合は設定値を使用）
         """
         # 既に初期化済みの場合はスキップ
         if hasattr(self, '_initialized'):
             return
         
-        # Gemini APIキーの取得と検証
+        # Gemini APIキー（MODEL_PROVIDER が gemini / record の場合に必要）
         self.api_key = api_key or os.getenv("GEMINI_API_KEY")
-        if not self.api_key or self.api_key == "your_gemini_api_key_here":
-            raise ValueError(
-                "GEMINI_API_KEYが設定されていません。\n"
-                "環境変数を設定してください。"
-            )
         
-        # Gemini APIの設定
-        genai.configure(api_key=self.api_key)
+        # モデルプロバイダーの初期化（Embedding・判定の呼び出し先。fake / replay はオフラインで動作）
+        # （呼び出し時間・エラー・トークン使用量をメトリクスに記録し、
+        #   呼び出しの種類・優先度ごとの流量制御を経由して送信）
+        self.provider = scheduler.ScheduledProvider(metrics.InstrumentedProvider(create_provider(
+            config.MODEL_PROVIDER,
+            api_key=self.api_key,
+            embedding_model="models/text-embedding-004",
+            llm_model="models/gemini-2.5-flash",
+            record_dir=config.PROVIDER_RECORD_DIR or os.path.join(
+                config.EMBEDDING_CACHE_DIR or self._default_cache_dir(csv_path), "provider_recordings"
+            ),
+            fake_latency_ms=config.FAKE_LATENCY_MS,
+            fake_embedding_latency_ms=config.FAKE_EMBEDDING_LATENCY_MS,
+            fake_error_rate=config.FAKE_ERROR_RATE,
+            fake_dim=config.FAKE_EMBEDDING_DIM
+        )))
+        
+        # Embeddingモデル・LLMモデル（キャッシュキーに使用）
+        self.embedding_model = self.provider.embedding_model
+        self.llm_model = self.provider.llm_model
+        
+        # 職業データのEmbedding作成時のtask_type（NoneはAPIのデフォルト）
+        self.document_task_type = None
         
-        # Embeddingモデルの指定
-        self.embedding_model = "models/text-embedding-004"
+        # データのロード（reload_catalog() で同じファイルを再読み込み）
+        self.csv_path = csv_path
+        self.catalog = self._load_data(csv_path)
         
-        # LLMモデルの指定
-        self.llm_model = "models/gemini-2.5-flash"
+        # 候補として返す職業データ（事前に作成し、検索ごとの変換を省く）
+        self.records = self.catalog.records
         
-        # GenerativeModelの初期化
-        self.model = genai.GenerativeModel(self.llm_model)
+        # 判定プロンプトに使う候補の説明（職業コード → 説明。要約は読み込み時に1度だけ作成）
+        if config.PROMPT_DESCRIPTIONS not in ("condensed", "full"):
+            raise ValueError(f"不明な PROMPT_DESCRIPTIONS です: {config.PROMPT_DESCRIPTIONS}（condensed / full）")
+        self.prompt_descriptions = self._build_prompt_descriptions(self.catalog)
         
-        # データのロード
-        self.data = self._load_data(csv_path)
+        # 文字n-gramのBM25インデックス（API呼び出しなしの候補検索・Embedding障害時の縮退運転に使用）
+        if config.RETRIEVAL_BACKEND not in ("vector", "bm25", "hybrid"):
+            raise ValueError(f"不明な RETRIEVAL_BACKEND です: {config.RETRIEVAL_BACKEND}（vector / bm25 / hybrid）")
+        self.lexical_index = BM25Index(self.records)
         
         # Embeddingsの初期化（遅延評価）
         self.embeddings = None
         self.embedding_texts = None
+        self.index = None
+        
+        # Embeddingキャッシュ（CSVと同じディレクトリに保存。作業ディレクトリには依存しない）
+        self.embedding_cache = EmbeddingCache(
+            cache_dir=config.EMBEDDING_CACHE_DIR or self._default_cache_dir(csv_path),
+            embedding_model=self.embedding_model,
+            task_type=self.document_task_type
+        )
+        self.cache_key = None
+        self.result_version = None
+        
+        # 職業データの再読み込み（同時に1回のみ）と、検索インデックス一式の差し替え
+        self._reload_lock = threading.Lock()
+        self._swap_lock = threading.Lock()
+        
+        # クエリEmbeddingのキャッシュ（同じ入力の再検索ではAPIを呼ばない）
+        self.query_embedding_cache = TTLCache(
+            maxsize=config.QUERY_EMBEDDING_CACHE_SIZE,
+            ttl=config.QUERY_EMBEDDING_CACHE_TTL
+        )
+        
+        # 分類結果のキャッシュ（共有層を設定すると複数レプリカで結果を共有）
+        self.result_cache = create_result_cache(
+            backend=config.RESULT_CACHE_BACKEND,
+            size=config.RESULT_CACHE_SIZE,
+            ttl=config.RESULT_CACHE_TTL,
+            sqlite_path=config.RESULT_CACHE_SQLITE_PATH or os.path.join(
+                self.embedding_cache.cache_dir, "result_cache.sqlite3"
+            ),
+            redis_url=config.RESULT_CACHE_REDIS_URL,
+            shared_max_entries=config.RESULT_CACHE_SQLITE_MAX_ENTRIES
+        )
+        
+        # 判定経路ごとの件数（llm / fast_path / cache、fast_path_shadow は無効時に条件を満たした件数、
+        # lexical_fallback はEmbedding障害のため BM25 で候補検索した件数）
+        self.decision_path_counts = Counter()
+        self._counts_lock = threading.Lock()
+        
+        # 同じ入力の同時リクエストを1回の判定処理にまとめる
+        self.single_flight = AsyncSingleFlight()
+        
+        # 非同期APIの同時実行数制御（セマフォはイベントループごとに遅延作成）
+        # （0以下ではセマフォが空きを作れず、全リクエストが待ち続けるため1以上にする）
+        self.max_concurrency = max(1, max_concurrency or config.MAX_CONCURRENT_CLASSIFICATIONS)
+        self._semaphore = None
+        self._semaphore_loop = None
+        
+        # クエリEmbeddingのマイクロバッチ（同時リクエストのEmbeddingをまとめて送信。イベントループごとに遅延作成）
+        self._query_batcher = None
         
         self._initialized = True
-        print(f"OccupationClassifier initialized with {len(self.data)} occupations")
+        print(f"OccupationClassifier initialized with {len(self.catalog)} occupations")
     
-    def _load_data(self, csv_path: str = None) -> pd.DataFrame:
+    def _load_data(self, csv_path: str = None) -> OccupationCatalog:
         """
         職業分類データの読み込み
         
@@ -79,12 +209,12 @@ class OccupationClassifier:
             csv_path: CSVファイルのパス（Noneの場合はダミーデータを作成）
         
         Returns:
-            職業分類データのDataFrame
+            職業分類データ
         """
         if csv_path and os.path.exists(csv_path):
             # CSVファイルから読み込み
             print(f"CSVファイルを読み込んでいます: {csv_path}")
-            return pd.read_csv(csv_path)
+            return OccupationCatalog.from_csv(csv_path)
         else:
             # ダミーデータの作成
             print("ダミーデータを使用しています...")
@@ -170,81 +300,492 @@ class OccupationClassifier:
                     "description": "小学校教員、中学校教員、高校教員、大学教授、塾講師、教師。学校での授業、教育、生徒指導。"
                 },
             ]
-            return pd.DataFrame(dummy_data)
+            return OccupationCatalog.from_records(dummy_data)
+    
+    def _build_prompt_descriptions(self, catalog: OccupationCatalog) -> Dict[str, str]:
+        """
+        判定プロンプトに使う候補の説明（PROMPT_DESCRIPTIONS=condensed の場合は要約）
+        
+        Args:
+            catalog: 職業データ
+        
+        Returns:
+            職業コード → 説明
+        """
+        if config.PROMPT_DESCRIPTIONS == "full":
+            return dict(zip(catalog.codes, catalog.descriptions))
+        return {
+            code: condense_description(name, description)
+            for code, name, description in zip(catalog.codes, catalog.names, catalog.descriptions)
+        }
+    
+    def _default_cache_dir(self, csv_path: str = None) -> str:
+        """
+        Embeddingキャッシュのデフォルト保存先
+        
+        Args:
+            csv_path: CSVファイルのパス
+        
+        Returns:
+            CSVと同じディレクトリ（ダミーデータの場合は backend/data）
+        """
+        if csv_path and os.path.exists(csv_path):
+            return os.path.dirname(os.path.abspath(csv_path))
+        return os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
     
-    def create_embeddings(self, force_recreate: bool = False):
+    def create_embeddings(self, force_recreate: bool = False,
+                          on_progress: Optional[Callable[[int, int], None]] = None):
         """
         職業データのEmbeddingsを作成（キャッシュ機能付き）
         
+        キャッシュは職業データの内容・モデル・テキストの組み立て方から計算したキーで
+        管理され、CSVが変更された場合は自動的に再作成されます。
+        バッチ単位のEmbeddingリクエストを並列ワーカーで送信し、一時的なエラーは
+        バックオフ付きでリトライします。途中経過はチェックポイントに保存されるため、
+        中断しても次回は続きから再開できます。
+        
         Args:
             force_recreate: Trueの場合、キャッシュを無視して再作成
+            on_progress: Embedding作成の進捗を受け取る関数（作成済み件数, 全件数）
         """
-        cache_file = "data/embeddings_cache.npy"
+        # 各職業のテキストを結合
+        self.embedding_texts = build_embedding_texts(
+            self.catalog.names, self.catalog.descriptions
+        )
+        meta = self.embedding_cache.describe(self.catalog.rows(), self.embedding_texts)
+        cache_file = self.embedding_cache.embeddings_path(meta)
         
-        # キャッシュファイルが存在し、強制再作成でない場合は読み込み
-        if not force_recreate and os.path.exists(cache_file):
-            try:
-                print(f"キャッシュからEmbeddingsを読み込んでいます: {cache_file}")
-                self.embeddings = np.load(cache_file)
-                
-                # embedding_textsも再構築
-                self.embedding_texts = (
-                    self.data['name'] + '。' + self.data['description']
-                ).tolist()
-                
-                print(f"Embeddingsキャッシュ読み込み完了 (shape: {self.embeddings.shape})")
-                print(f"💡 API呼び出しを節約しました！（{len(self.data)}件のEmbedding作成をスキップ）")
-                return
-                
-            except Exception as e:
-                print(f"⚠️ キャッシュ読み込み失敗: {e}")
-                print("新しくEmbeddingsを作成します...")
+        # BM25 のみで候補検索する場合はEmbeddingを作成しない
+        if config.RETRIEVAL_BACKEND == "bm25":
+            self.cache_key = meta["key"]
+            self._set_result_version()
+            print("RETRIEVAL_BACKEND=bm25 のため、Embeddingsの作成をスキップします")
+            return
         
-        # キャッシュがない、または強制再作成の場合
-        if self.embeddings is not None:
+        # 作成済みのEmbeddingsが現在のデータと一致する場合は何もしない
+        if self.embeddings is not None and self.cache_key == meta["key"] and not force_recreate:
             print("Embeddingsは既に作成済みです")
             return
         
-        print(f"Embeddingsを作成しています...（{len(self.data)}件）")
-        print("⚠️ 初回のみ時間がかかります。次回からはキャッシュを使用します。")
-        
-        # 各職業のテキストを結合
-        self.embedding_texts = (
-            self.data['name'] + '。' + self.data['description']
-        ).tolist()
+        # 複数ワーカーで起動した場合は親プロセスが作成した共有インデックスに接続（コピーしない）
+        if config.SHARED_INDEX_PATH and not force_recreate:
+            # python -m app.serve はワーカーと並行して共有インデックスを作成するため、書き出されるまで待つ
+            # （起動時の準備処理のスレッドで待つため、liveness には影響しない）
+            if config.SHARED_INDEX_WAIT_SECONDS > 0:
+                print(f"共有インデックスの作成を待っています: {config.SHARED_INDEX_PATH}")
+                shared_index.wait_for(config.SHARED_INDEX_PATH, config.SHARED_INDEX_WAIT_SECONDS)
+            matrix = shared_index.attach(config.SHARED_INDEX_PATH, meta["key"])
+            if matrix is not None:
+                self.embeddings = matrix
+                self.cache_key = meta["key"]
+                self._build_index(normalized=True)
+                print(f"共有インデックスに接続しました: {config.SHARED_INDEX_PATH} (shape: {matrix.shape})")
+                return
+            print("⚠️ 共有インデックスを使用できないため、このプロセスでEmbeddingsを読み込みます")
         
-        # Embeddingsを作成
-        embeddings_list = []
+        # キャッシュが存在し、強制再作成でない場合は読み込み（メモリマップ）
+        if not force_recreate:
+            embeddings = self.embedding_cache.load(meta)
+            if embeddings is not None:
+                self.embeddings = embeddings
+                self.cache_key = meta["key"]
+                self._build_index()
+                print(f"キャッシュからEmbeddingsを読み込みました: {cache_file}")
+                print(f"Embeddingsキャッシュ読み込み完了 (shape: {self.embeddings.shape})")
+                print(f"💡 API呼び出しを節約しました！（{len(self.catalog)}件のEmbedding作成をスキップ）")
+                return
         
-        for i, text in enumerate(self.embedding_texts):
-            if (i + 1) % 50 == 0:
-                print(f"  進捗: {i + 1}/{len(self.embedding_texts)}")
-            
-            try:
-                result = genai.embed_content(
-                    model=self.embedding_model,
-                    content=text
-                )
-                embeddings_list.append(result['embedding'])
-            except Exception as e:
-                print(f"  エラー (職業 {i}): {e}")
-                raise
+        try:
+            self.embeddings = self._embed_corpus(
+                self.embedding_texts,
+                checkpoint_file=self.embedding_cache.checkpoint_path(meta),
+                fingerprint=meta["key"],
+                on_progress=on_progress
+            )
+            self.cache_key = meta["key"]
+        except Exception as e:
+            raise RuntimeError(f"Embeddings作成中にエラーが発生しました: {str(e)}")
         
-        self.embeddings = np.array(embeddings_list)
         print(f"Embeddings作成完了 (shape: {self.embeddings.shape})")
+        self._build_index()
         
         # キャッシュファイルに保存
         try:
-            # ディレクトリが存在しない場合は作成
-            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
-            np.save(cache_file, self.embeddings)
+            self.embedding_cache.save(meta, self.embeddings)
             print(f"✅ Embeddingsをキャッシュに保存しました: {cache_file}")
             print(f"💡 次回起動時はAPI呼び出しなしで高速起動できます！")
         except Exception as e:
             print(f"⚠️ キャッシュ保存失敗（無視して続行）: {e}")
-            
+    
+    def _build_index(self, normalized: bool = False):
+        """
+        検索インデックスの作成
+        （単位ベクトル化した float32 行列と、候補として返す職業データを事前に作成）
+        
+        Args:
+            normalized: True の場合、self.embeddings は単位ベクトル化済み（共有インデックス）
+        """
+        self.index = self._make_index(self.embeddings, self.records, normalized=normalized)
+        self._set_result_version()
+    
+    def _make_index(self, vectors: np.ndarray, records: List[Dict], normalized: bool = False) -> VectorIndex:
+        """
+        RETRIEVAL_MODE に対応する検索インデックスを作成
+        
+        Args:
+            vectors: 職業データのEmbedding行列
+            records: 各行に対応する候補データ
+            normalized: True の場合、vectors は単位ベクトル化済み
+        
+        Returns:
+            検索インデックス
+        """
+        if config.RETRIEVAL_MODE == "hierarchical":
+            index = HierarchicalVectorIndex(
+                vectors, records,
+                level=config.HIERARCHY_LEVEL,
+                major_beam=config.HIERARCHY_MAJOR_BEAM,
+                middle_beam=config.HIERARCHY_MIDDLE_BEAM,
+                normalized=normalized
+            )
+            if not index.hierarchical:
+                print("⚠️ 職業コードの階層を判別できないため、全件検索を使用します")
+            return index
+        if config.RETRIEVAL_MODE == "flat":
+            return VectorIndex(vectors, records, normalized=normalized)
+        raise ValueError(f"不明な RETRIEVAL_MODE です: {config.RETRIEVAL_MODE}（flat / hierarchical）")
+    
+    def publish_shared_index(self, path: str) -> bool:
+        """
+        検索インデックスの行列をワーカー間の共有インデックスとして書き出し
+        （create_embeddings() の後に親プロセスで呼び出す）
+        
+        Args:
+            path: 共有インデックスのパス
+        
+        Returns:
+            書き出した場合はTrue（BM25のみで候補検索する場合はFalse）
+        """
+        if self.index is None:
+            return False
+        shared_index.publish(path, self.index.matrix, self.cache_key)
+        print(f"共有インデックスを書き出しました: {path} (shape: {self.index.matrix.shape})")
+        return True
+    
+    def _set_result_version(self):
+        """
+        分類結果のバージョン（職業データ・モデル・プロンプト・検索方式・高速判定の設定）を設定
+        （分類結果キャッシュ・同時リクエストの集約のキーに使用）
+        """
+        # 高速判定の結果もキャッシュに入るため、有効な場合は閾値を含める（無効な場合の閾値は結果に影響しない）
+        fast_path = (
+            f"{config.FAST_PATH_MIN_SIMILARITY}/{config.FAST_PATH_MIN_MARGIN}"
+            if config.FAST_PATH_ENABLED else "off"
+        )
+        version_source = (
+            f"{self.cache_key}:{self.llm_model}:{PROMPT_VERSION}:"
+            f"{config.PROMPT_DESCRIPTIONS}:{config.PROMPT_TOKEN_BUDGET}:"
+            f"{config.RETRIEVAL_BACKEND}:{config.HYBRID_FUSION}:{config.HYBRID_VECTOR_WEIGHT}:"
+            f"{config.RETRIEVAL_MODE}:{config.HIERARCHY_LEVEL}:"
+            f"{config.HIERARCHY_MAJOR_BEAM}:{config.HIERARCHY_MIDDLE_BEAM}:"
+            f"{fast_path}"
+        )
+        self.result_version = hashlib.sha256(version_source.encode("utf-8")).hexdigest()[:16]
+        if self.result_cache is not None:
+            self.result_cache.set_version(self.result_version)
+    
+    def invalidate_result_cache(self, all_versions: bool = True):
+        """
+        分類結果キャッシュの無効化（職業データを更新した場合などに呼び出す）
+        
+        Args:
+            all_versions: Trueの場合は共有層の全バージョン、Falseの場合は現在のバージョンのみ削除
+        """
+        if self.result_cache is not None:
+            self.result_cache.invalidate(all_versions=all_versions)
+            print("分類結果キャッシュを無効化しました")
+    
+    def reload_catalog(self, csv_path: str = None) -> Dict:
+        """
+        職業データの再読み込み（処理中のリクエストを止めずに差し替え）
+        
+        新しい職業データを現在のデータとEmbedding対象テキストのハッシュで比較し、
+        追加・変更された行だけをEmbedding化します（変更のない行は現在の検索インデックスのベクトルを再利用）。
+        新しい検索インデックス・BM25インデックスは現在のものとは別に作成し、完成後にまとめて差し替えます
+        （作成中のリクエストは現在のインデックスで処理されます）。
+        分類結果キャッシュは職業データのバージョンの変更により無効化されます。
+        
+        Args:
+            csv_path: CSVファイルのパス（Noneの場合は起動時と同じファイル）
+        
+        Returns:
+            再読み込みの結果（件数・追加/変更/削除された職業数・Embedding化した件数・所要時間）
+        
+        Raises:
+            ValueError: CSVファイルが指定されていない・読み込めない・不正な場合
+            RuntimeError: 再読み込みを実行中の場合・Embeddingの作成に失敗した場合
+        """
+        csv_path = csv_path or self.csv_path
+        if not csv_path:
+            raise ValueError("再読み込みする職業データCSVのパスが指定されていません")
+        if not self._reload_lock.acquire(blocking=False):
+            raise RuntimeError("職業データの再読み込みを実行中です")
+        try:
+            return self._reload_catalog(csv_path)
+        finally:
+            self._reload_lock.release()
+    
+    @property
+    def reloading(self) -> bool:
+        """職業データの再読み込みを実行中かどうか"""
+        return self._reload_lock.locked()
+    
+    def _reload_catalog(self, csv_path: str) -> Dict:
+        """reload_catalog の処理本体（_reload_lock を取得済み）"""
+        started = time.perf_counter()
+        try:
+            catalog = OccupationCatalog.from_csv(csv_path)
+        except OSError as e:
+            raise ValueError(f"職業データCSVを読み込めません: {e}")
+        if len(catalog) == 0:
+            raise ValueError(f"職業データが空です: {csv_path}")
+        
+        texts = build_embedding_texts(catalog.names, catalog.descriptions)
+        meta = self.embedding_cache.describe(catalog.rows(), texts)
+        current = self.catalog
+        summary = {
+            "occupations": len(catalog),
+            "added": sum(code not in current.index for code in catalog.codes),
+            "changed": sum(
+                code in current.index and current.get(code) != record
+                for code, record in zip(catalog.codes, catalog.records)
+            ),
+            "removed": sum(code not in catalog.index for code in current.codes),
+            "embedded": 0,
+            "reloaded": False,
+        }
+        
+        if meta["key"] == self.cache_key:
+            summary["seconds"] = round(time.perf_counter() - started, 3)
+            print("職業データに変更はありません（再読み込みをスキップします）")
+            return summary
+        
+        # 新しいインデックス一式を現在のものとは別に作成
+        prompt_descriptions = self._build_prompt_descriptions(catalog)
+        lexical_index = BM25Index(catalog.records)
+        matrix, index = None, None
+        if config.RETRIEVAL_BACKEND != "bm25":
+            matrix, summary["embedded"] = self._incremental_embeddings(texts, meta)
+            index = self._make_index(matrix, catalog.records, normalized=True)
+            try:
+                self.embedding_cache.save(meta, matrix)
+            except Exception as e:
+                print(f"⚠️ キャッシュ保存失敗（無視して続行）: {e}")
+        
+        # まとめて差し替え（ハイブリッド検索は _swap_lock の中で参照を取得する）
+        with self._swap_lock:
+            self.catalog = catalog
+            self.records = catalog.records
+            self.prompt_descriptions = prompt_descriptions
+            self.lexical_index = lexical_index
+            self.embedding_texts = texts
+            if index is not None:
+                self.embeddings = matrix
+                self.index = index
+            self.cache_key = meta["key"]
+            self.csv_path = csv_path
+        self._set_result_version()
+        
+        summary["reloaded"] = True
+        summary["seconds"] = round(time.perf_counter() - started, 3)
+        print(
+            f"職業データを再読み込みしました: {summary['occupations']}件 "
+            f"（追加 {summary['added']} / 変更 {summary['changed']} / 削除 {summary['removed']}、"
+            f"Embedding作成 {summary['embedded']}件、{summary['seconds']:.2f}秒）"
+        )
+        return summary
+    
+    def _incremental_embeddings(self, texts: List[str], meta: Dict) -> Tuple[np.ndarray, int]:
+        """
+        新しい職業データのEmbedding行列（単位ベクトル化済み）を差分だけEmbedding化して作成
+        
+        Args:
+            texts: 新しい職業データのEmbedding対象テキスト
+            meta: 新しい職業データのキャッシュのメタデータ
+        
+        Returns:
+            (Embedding行列, Embedding化した件数)
+        """
+        # 現在の検索インデックスのベクトルをテキストのハッシュで再利用
+        reusable: Dict[str, int] = {}
+        if self.index is not None and self.embedding_texts is not None:
+            for row, text in enumerate(self.embedding_texts):
+                reusable.setdefault(text_hash(text), row)
+        missing = [i for i, digest in enumerate(meta["row_hashes"]) if digest not in reusable]
+        
+        # 差分が多い場合などで、新しいデータのキャッシュが既にあればそのまま使用
+        if missing:
+            cached = self.embedding_cache.load(meta)
+            if cached is not None:
+                return normalize_rows(cached), 0
+        
+        vectors = None
+        if missing:
+            vectors = normalize_rows(self._embed_corpus(
+                [texts[i] for i in missing],
+                checkpoint_file=self.embedding_cache.checkpoint_path(meta),
+                fingerprint=f"{meta['key']}:incremental"
+            ))
+        
+        dim = self.index.dim if self.index is not None else vectors.shape[1]
+        matrix = np.empty((len(texts), dim), dtype=np.float32)
+        if vectors is not None:
+            matrix[missing] = vectors
+        for row, digest in enumerate(meta["row_hashes"]):
+            if digest in reusable:
+                matrix[row] = self.index.matrix[reusable[digest]]
+        return matrix, len(missing)
+
+    def _embed_corpus(self, texts: List[str], checkpoint_file: str, fingerprint: str,
+                      on_progress: Optional[Callable[[int, int], None]] = None) -> np.ndarray:
+        """
+        テキスト群をバッチ・並列でEmbedding化（チェックポイントから再開可能）
+        
+        Args:
+            texts: Embedding対象のテキストリスト
+            checkpoint_file: 途中経過を保存するファイルのパス
+            fingerprint: 対象データの識別子（一致するチェックポイントのみ再利用）
+            on_progress: 進捗を受け取る関数（作成済み件数, 全件数）
+        
+        Returns:
+            Embedding行列（len(texts) × 次元数）
+        """
+        batch_size = max(1, config.EMBEDDING_BATCH_SIZE)
+        batches = [
+            (start, texts[start:start + batch_size])
+            for start in range(0, len(texts), batch_size)
+        ]
+        
+        # チェックポイントの読み込み（対象データが同一の場合のみ再利用）
+        rows = self._load_checkpoint(checkpoint_file, fingerprint, len(texts))
+        
+        pending = [
+            (start, batch) for start, batch in batches
+            if any(rows[i] is None for i in range(start, start + len(batch)))
+        ]
+        done_count = sum(row is not None for row in rows)
+        if done_count:
+            print(f"チェックポイントから再開します（{done_count}/{len(texts)}件 作成済み）")
+        if on_progress is not None:
+            on_progress(done_count, len(texts))
+        
+        print(
+            f"Embeddingsを作成しています...（{len(texts) - done_count}件, "
+            f"{len(pending)}バッチ, 並列数 {config.EMBEDDING_WORKERS}）"
+        )
+        
+        completed_batches = 0
+        with ThreadPoolExecutor(max_workers=max(1, config.EMBEDDING_WORKERS)) as executor:
+            futures = {
+                executor.submit(self._embed_batch_with_retry, batch): (start, batch)
+                for start, batch in pending
+            }
+            try:
+                for future in as_completed(futures):
+                    start, batch = futures[future]
+                    vectors = future.result()
+                    for offset, vector in enumerate(vectors):
+                        rows[start + offset] = vector
+                    
+                    done_count += len(batch)
+                    completed_batches += 1
+                    print(f"  進捗: {done_count}/{len(texts)}")
+                    if on_progress is not None:
+                        on_progress(done_count, len(texts))
+                    
+                    if completed_batches % max(1, config.EMBEDDING_CHECKPOINT_INTERVAL) == 0:
+                        self._save_checkpoint(checkpoint_file, fingerprint, rows)
+            except Exception:
+                # 失敗しても完了分は保存しておき、次回はそこから再開する
+                for future in futures:
+                    future.cancel()
+                self._save_checkpoint(checkpoint_file, fingerprint, rows)
+                raise
+        
+        # 完了したのでチェックポイントは不要
+        if os.path.exists(checkpoint_file):
+            os.remove(checkpoint_file)
+        
+        return np.array(rows)
+    
+    def _embed_batch_with_retry(self, texts: List[str]) -> List[List[float]]:
+        """
+        1バッチ分のEmbeddingを作成（一時的なエラーは指数バックオフでリトライ）
+        
+        Args:
+            texts: バッチ内のテキストリスト
+        
+        Returns:
+            各テキストのEmbeddingリスト
+        """
+        for attempt in range(config.EMBEDDING_MAX_RETRIES + 1):
+            try:
+                # 職業データのEmbedding作成（起動時・再読み込み時）は対話的なリクエストより後回しにする
+                with scheduler.priority("bulk"):
+                    return self.provider.embed(texts, task_type=self.document_task_type)
+            except TRANSIENT_ERRORS as e:
+                if attempt >= config.EMBEDDING_MAX_RETRIES:
+                    raise
+                # 指数バックオフ + ジッター（1, 2, 4, ... 秒、最大30秒）
+                wait = min(30.0, 2 ** attempt) * (0.5 + random.random() / 2)
+                metrics.record_retry("embed")
+                print(f"  ⚠️ 一時的なエラー（{attempt + 1}回目）: {e} → {wait:.1f}秒後にリトライ")
+                time.sleep(wait)
+    
+    def _load_checkpoint(self, checkpoint_file: str, fingerprint: str, size: int) -> List:
+        """
+        チェックポイントの読み込み
+        
+        Returns:
+            行ごとのEmbedding（未作成の行はNone）
+        """
+        rows = [None] * size
+        if not os.path.exists(checkpoint_file):
+            return rows
+        
+        try:
+            with np.load(checkpoint_file) as checkpoint:
+                if str(checkpoint["fingerprint"]) != fingerprint:
+                    print("⚠️ チェックポイントが現在のデータと一致しないため破棄します")
+                    return rows
+                for i, vector in zip(checkpoint["indices"], checkpoint["embeddings"]):
+                    rows[int(i)] = vector.tolist()
         except Exception as e:
-            raise RuntimeError(f"Embeddings作成中にエラーが発生しました: {str(e)}")
+            print(f"⚠️ チェックポイント読み込み失敗（最初から作成します）: {e}")
+            return [None] * size
+        
+        return rows
+    
+    def _save_checkpoint(self, checkpoint_file: str, fingerprint: str, rows: List):
+        """
+        作成済みの行をチェックポイントに保存（一時ファイル経由で置き換え）
+        """
+        indices = [i for i, row in enumerate(rows) if row is not None]
+        if not indices:
+            return
+        
+        try:
+            os.makedirs(os.path.dirname(checkpoint_file) or ".", exist_ok=True)
+            tmp_file = checkpoint_file + ".tmp.npz"
+            np.savez(
+                tmp_file,
+                fingerprint=np.array(fingerprint),
+                indices=np.array(indices),
+                embeddings=np.array([rows[i] for i in indices])
+            )
+            os.replace(tmp_file, checkpoint_file)
+        except Exception as e:
+            print(f"⚠️ チェックポイント保存失敗（無視して続行）: {e}")
     
     def search_candidates(self, user_input: str, top_k: int = 5) -> List[Dict]:
         """
@@ -257,108 +798,1139 @@ class OccupationClassifier:
         Returns:
             類似度の高い職業候補のリスト
         """
+        return self._search(user_input, top_k)[0]
+    
+    async def asearch_candidates(self, user_input: str, top_k: int = 5) -> List[Dict]:
+        """
+        search_candidates の非同期版（イベントループをブロックしない）
+        
+        Args:
+            user_input: ユーザーの自由記述入力
+            top_k: 取得する候補数（デフォルト: 5）
+        
+        Returns:
+            類似度の高い職業候補のリスト
+        """
+        return (await self._asearch(user_input, top_k))[0]
+    
+    def _search(self, user_input: str, top_k: int) -> Tuple[List[Dict], Optional[List[Dict]], str]:
+        """
+        RETRIEVAL_BACKEND に応じた候補検索
+        （クエリEmbeddingの作成に失敗した場合は BM25 で続行）
+        
+        Args:
+            user_input: ユーザーの自由記述入力
+            top_k: 取得する候補数
+        
+        Returns:
+            (候補リスト, 高速判定に使うベクトル検索の上位候補（使えない場合はNone), 検索方式)
+        """
+        if config.RETRIEVAL_BACKEND == "bm25":
+            return self._lexical_search(user_input, top_k)
+        
         # Embeddingsが未作成の場合は作成
-        if self.embeddings is None:
+        if self.index is None:
             self.create_embeddings()
         
+        started = time.perf_counter()
         try:
             # ユーザー入力をベクトル化
-            result = genai.embed_content(
-                model=self.embedding_model,
-                content=user_input,
-                task_type="retrieval_query"
-            )
-            user_embedding = np.array([result['embedding']])
-            
-            # コサイン類似度を計算
-            similarities = cosine_similarity(user_embedding, self.embeddings)[0]
-            
-            # 類似度の高い順にソート
-            top_indices = np.argsort(similarities)[::-1][:top_k]
-            
-            # 候補を作成
-            candidates = []
-            for idx in top_indices:
-                candidates.append({
-                    "code": self.data.iloc[idx]["code"],
-                    "name": self.data.iloc[idx]["name"],
-                    "description": self.data.iloc[idx]["description"],
-                    "similarity": float(similarities[idx])
-                })
-            
-            return candidates
-            
+            embedding = self._embed_query(user_input)
+        except Exception as e:
+            return self._lexical_fallback([user_input], top_k, e)[0]
+        finally:
+            metrics.observe_stage("embedding", time.perf_counter() - started)
+        
+        return self._timed_rank(user_input, embedding, top_k)
+    
+    async def _asearch(self, user_input: str, top_k: int) -> Tuple[List[Dict], Optional[List[Dict]], str]:
+        """
+        _search の非同期版
+        （クエリEmbeddingの応答が LEXICAL_FALLBACK_TIMEOUT 秒を超えた場合も BM25 で続行）
+        """
+        if config.RETRIEVAL_BACKEND == "bm25":
+            return self._lexical_search(user_input, top_k)
+        
+        # Embeddingsが未作成の場合はスレッドで作成（イベントループをブロックしない）
+        if self.index is None:
+            await asyncio.to_thread(self.create_embeddings)
+        
+        started = time.perf_counter()
+        try:
+            # ユーザー入力をベクトル化
+            timeout = config.LEXICAL_FALLBACK_TIMEOUT
+            if config.LEXICAL_FALLBACK_ENABLED and timeout > 0:
+                embedding = await asyncio.wait_for(self._aembed_query(user_input), timeout)
+            else:
+                embedding = await self._aembed_query(user_input)
+        except Exception as e:
+            return self._lexical_fallback([user_input], top_k, e)[0]
+        finally:
+            metrics.observe_stage("embedding", time.perf_counter() - started)
+        
+        return self._timed_rank(user_input, embedding, top_k)
+    
+    def _timed_rank(self, user_input: str, embedding: np.ndarray,
+                    top_k: int) -> Tuple[List[Dict], Optional[List[Dict]], str]:
+        """_rank を実行し、所要時間を search 段階として記録"""
+        started = time.perf_counter()
+        try:
+            return self._rank(user_input, embedding, top_k)
         except Exception as e:
             raise RuntimeError(f"候補検索中にエラーが発生しました: {str(e)}")
+        finally:
+            metrics.observe_stage("search", time.perf_counter() - started)
     
-    def decide_class(self, user_input: str, candidates: List[Dict]) -> Dict:
+    def _lexical_search(self, user_input: str, top_k: int) -> Tuple[List[Dict], None, str]:
+        """BM25 による候補検索（RETRIEVAL_BACKEND=bm25、所要時間を search 段階として記録）"""
+        started = time.perf_counter()
+        candidates = self.lexical_index.search(user_input, top_k)
+        metrics.observe_stage("search", time.perf_counter() - started)
+        return candidates, None, "bm25"
+    
+    def _lexical_fallback(self, texts: List[str], top_k: int,
+                          error: Exception) -> List[Tuple[List[Dict], None, str]]:
         """
-        Gemini を使用して最終的な職業分類を判定
+        クエリEmbeddingの作成に失敗した場合の縮退運転（BM25 で候補検索）
         
         Args:
-            user_input: ユーザーの自由記述入力
-            candidates: 検索された候補リスト
+            texts: ユーザー入力のリスト
+            top_k: 取得する候補数
+            error: Embedding作成時の例外
         
         Returns:
-            判定結果（code, name, reason）
+            入力ごとの (候補リスト, None, "bm25_fallback")
+        
+        Raises:
+            RuntimeError: 縮退運転が無効の場合
         """
-        # User Prompt の作成
-        candidates_text = "\n".join([
-            f"- コード: {c['code']}, 名称: {c['name']}, 説明: {c['description']}"
-            for c in candidates
-        ])
+        message = str(error) or type(error).__name__
+        if not config.LEXICAL_FALLBACK_ENABLED:
+            raise RuntimeError(f"候補検索中にエラーが発生しました: {message}")
+        print(f"⚠️ クエリEmbeddingの作成に失敗したため、BM25で候補検索を続行します（{len(texts)}件）: {message}")
+        results = []
+        for text in texts:
+            self._record_path('lexical_fallback')
+            results.append((self.lexical_index.search(text, top_k), None, "bm25_fallback"))
+        return results
+    
+    def _rank(self, user_input: str, embedding: np.ndarray,
+              top_k: int) -> Tuple[List[Dict], Optional[List[Dict]], str]:
+        """
+        クエリEmbeddingから候補を検索（hybrid の場合は BM25 のスコアと融合）
         
-        prompt = f"""あなたは職業分類の専門家です。
-ユーザーの入力と、候補となる職業分類リストを比較し、最も適切な職業分類を1つ選択してください。
-
-【ユーザーの入力】
-{user_input}
-
-【候補となる職業分類】
-{candidates_text}
-
-上記の候補から最も適切な職業分類を1つ選択し、必ず以下のJSON形式で回答してください：
-{{
-  "code": "職業コード",
-  "name": "職業名",
-  "reason": "この職業を選択した理由（日本語で簡潔に）"
-}}"""
+        Returns:
+            (候補リスト, 高速判定に使うベクトル検索の上位候補, 検索方式)
+        """
+        if config.RETRIEVAL_BACKEND != "hybrid":
+            candidates = self._rank_candidates(embedding, top_k)
+            return candidates, candidates, "vector"
         
-        try:
-            # Gemini での判定（JSON Modeを使用）
-            response = self.model.generate_content(
-                prompt,
-                generation_config=genai.GenerationConfig(
-                    response_mime_type="application/json",
-                    temperature=0.3
-                )
-            )
-            
-            # レスポンスの解析
-            result = json.loads(response.text)
-            return result
-            
-        except Exception as e:
-            raise RuntimeError(f"Gemini での判定中にエラーが発生しました: {str(e)}")
+        # 検索インデックスと BM25 インデックスは同じ世代のものを使う（再読み込みによる差し替えの途中を避ける）
+        with self._swap_lock:
+            index, lexical_index = self.index, self.lexical_index
+        
+        # 融合は全件のスコアで行う（RETRIEVAL_MODE=hierarchical の絞り込みは使わない）
+        vector_scores = index.scores(embedding)
+        fused = fuse_scores(
+            vector_scores,
+            lexical_index.normalized_scores(user_input),
+            method=config.HYBRID_FUSION,
+            vector_weight=config.HYBRID_VECTOR_WEIGHT
+        )
+        candidates = rank_records(index.records, fused, vector_scores, top_k)
+        # 高速判定はベクトル検索の類似度だけで判断する
+        vector_top = rank_records(index.records, vector_scores, vector_scores, 2)
+        return candidates, vector_top, "hybrid"
     
-    def classify(self, user_input: str) -> Dict:
+    def _embed_query(self, user_input: str) -> np.ndarray:
         """
-        職業分類判定のメイン処理
+        ユーザー入力のEmbedding（キャッシュにあればAPIを呼ばない）
         
         Args:
             user_input: ユーザーの自由記述入力
         
         Returns:
-            判定結果（code, name, reason, candidates を含む）
+            クエリのEmbedding
         """
-        # Step 1: 候補検索 (Retrieval)
-        candidates = self.search_candidates(user_input, top_k=5)
+        text = normalize_input(user_input)
+        key = (self.embedding_model, text)
+        embedding = self.query_embedding_cache.get(key)
+        if embedding is None:
+            values = self.provider.embed([text], task_type="retrieval_query")[0]
+            embedding = self._store_query_embedding(key, values)
+        return embedding
+    
+    async def _aembed_query(self, user_input: str) -> np.ndarray:
+        """
+        _embed_query の非同期版
+        
+        Args:
+            user_input: ユーザーの自由記述入力
         
-        # Step 2: 最終判定 (Generation)
-        result = self.decide_class(user_input, candidates)
+        Returns:
+            クエリのEmbedding
+        """
+        text = normalize_input(user_input)
+        key = (self.embedding_model, text)
+        embedding = self.query_embedding_cache.get(key)
+        if embedding is None:
+            batcher = self._get_query_batcher()
+            if batcher is not None:
+                # 同時に届いた他のリクエストとまとめて送信
+                values = await batcher.submit(text)
+            else:
+                values = (await self.provider.aembed([text], task_type="retrieval_query"))[0]
+            embedding = self._store_query_embedding(key, values)
+        return embedding
+    
+    async def _aembed_query_batch(self, texts: List[str]) -> List[List[float]]:
+        """
+        マイクロバッチで溜まったクエリを1回のAPI呼び出しでEmbedding化
         
-        # 結果に候補リストを追加
-        result['candidates'] = candidates
-        result['user_input'] = user_input
+        Args:
+            texts: 正規化済みのユーザー入力リスト（重複を含む場合あり）
         
-        return result
+        Returns:
+            入力と同じ順序のEmbedding
+        """
+        unique = list(dict.fromkeys(texts))
+        embeddings = await self.provider.aembed(unique, task_type="retrieval_query")
+        by_text = dict(zip(unique, embeddings))
+        return [by_text[text] for text in texts]
+    
+    def _store_query_embedding(self, key, values: List[float]) -> np.ndarray:
+        """クエリEmbeddingを読み取り専用の float32 配列としてキャッシュに保存"""
+        embedding = np.asarray(values, dtype=np.float32)
+        embedding.flags.writeable = False
+        self.query_embedding_cache.set(key, embedding)
+        return embedding
+    
+    def _embed_queries(self, texts: List[str]) -> List[np.ndarray]:
+        """
+        複数のユーザー入力をまとめてEmbedding化（キャッシュにないものだけをバッチで送信）
+        
+        Args:
+            texts: 正規化済みのユーザー入力リスト
+        
+        Returns:
+            各入力のEmbedding
+        """
+        keys = [(self.embedding_model, text) for text in texts]
+        embeddings = [self.query_embedding_cache.get(key) for key in keys]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            values_list = self.provider.embed([texts[i] for i in missing], task_type="retrieval_query")
+            for i, values in zip(missing, values_list):
+                embeddings[i] = self._store_query_embedding(keys[i], values)
+        return embeddings
+    
+    async def _aembed_queries(self, texts: List[str]) -> List[np.ndarray]:
+        """
+        _embed_queries の非同期版
+        
+        Args:
+            texts: 正規化済みのユーザー入力リスト
+        
+        Returns:
+            各入力のEmbedding
+        """
+        keys = [(self.embedding_model, text) for text in texts]
+        embeddings = [self.query_embedding_cache.get(key) for key in keys]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            values_list = await self.provider.aembed([texts[i] for i in missing], task_type="retrieval_query")
+            for i, values in zip(missing, values_list):
+                embeddings[i] = self._store_query_embedding(keys[i], values)
+        return embeddings
+    
+    def prewarm_queries(self, user_inputs: List[str]) -> int:
+        """
+        よく使われる入力のクエリEmbeddingを事前に作成（起動時の準備処理）
+        
+        Args:
+            user_inputs: ユーザー入力のリスト
+        
+        Returns:
+            クエリEmbeddingキャッシュに保存した件数（BM25のみ・キャッシュ無効の場合は0）
+        """
+        if config.RETRIEVAL_BACKEND == "bm25" or config.QUERY_EMBEDDING_CACHE_SIZE <= 0:
+            return 0
+        texts = list(dict.fromkeys(
+            normalize_input(text) for text in user_inputs if text.strip()
+        ))[:config.QUERY_EMBEDDING_CACHE_SIZE]
+        batch_size = max(1, config.EMBEDDING_BATCH_SIZE)
+        with scheduler.priority("bulk"):
+            for start in range(0, len(texts), batch_size):
+                self._embed_queries(texts[start:start + batch_size])
+        return len(texts)
+    
+    def _rank_candidates(self, embedding: List[float], top_k: int) -> List[Dict]:
+        """
+        クエリベクトルと職業データの類似度から上位候補を作成
+        
+        Args:
+            embedding: ユーザー入力のEmbedding
+            top_k: 取得する候補数
+        
+        Returns:
+            類似度の高い職業候補のリスト
+        """
+        return self.index.search(embedding, top_k)
+    
+    def decide_class(self, user_input: str, candidates: List[Dict]) -> Dict:
+        """
+        Gemini を使用して最終的な職業分類を判定
+        
+        Args:
+            user_input: ユーザーの自由記述入力
+            candidates: 検索された候補リスト
+        
+        Returns:
+            判定結果（code, name, reason）
+        """
+        prompt = self._build_prompt(user_input, candidates)
+        
+        try:
+            # Gemini での判定（JSON Modeを使用）
+            response = self.provider.generate(prompt, temperature=GENERATION_TEMPERATURE)
+            
+            # レスポンスの解析（トークン使用量を付与）
+            result = json.loads(response.text)
+            result['usage'] = response.usage
+            return result
+            
+        except Exception as e:
+            raise RuntimeError(f"Gemini での判定中にエラーが発生しました: {str(e)}")
+    
+    async def adecide_class(self, user_input: str, candidates: List[Dict]) -> Dict:
+        """
+        decide_class の非同期版（イベントループをブロックしない）
+        
+        Args:
+            user_input: ユーザーの自由記述入力
+            candidates: 検索された候補リスト
+        
+        Returns:
+            判定結果（code, name, reason）
+        """
+        prompt = self._build_prompt(user_input, candidates)
+        
+        try:
+            # Gemini での判定（JSON Modeを使用）
+            response = await self.provider.agenerate(prompt, temperature=GENERATION_TEMPERATURE)
+            
+            # レスポンスの解析（トークン使用量を付与）
+            result = json.loads(response.text)
+            result['usage'] = response.usage
+            return result
+            
+        except Exception as e:
+            raise RuntimeError(f"Gemini での判定中にエラーが発生しました: {str(e)}")
+    
+    async def adecide_class_stream(self, user_input: str, candidates: List[Dict]) -> AsyncIterator[str]:
+        """
+        adecide_class のストリーミング版（生成されたJSONテキストを届いた順に返す）
+        
+        Args:
+            user_input: ユーザーの自由記述入力
+            candidates: 検索された候補リスト
+        
+        Yields:
+            生成されたJSONテキストの断片
+        """
+        prompt = self._build_prompt(user_input, candidates)
+        
+        try:
+            async for chunk in self.provider.astream(prompt, temperature=GENERATION_TEMPERATURE):
+                yield chunk
+        except Exception as e:
+            raise RuntimeError(f"Gemini での判定中にエラーが発生しました: {str(e)}")
+    
+    def _build_prompt(self, user_input: str, candidates: List[Dict]) -> str:
+        """
+        判定用プロンプトの作成
+        
+        Args:
+            user_input: ユーザーの自由記述入力
+            candidates: 検索された候補リスト
+        
+        Returns:
+            Gemini に渡すプロンプト
+        """
+        # User Prompt の作成
+        candidates_text = self._candidates_text(candidates)
+        
+        return f"""あなたは職業分類の専門家です。
+ユーザーの入力と、候補となる職業分類リストを比較し、最も適切な職業分類を1つ選択してください。
+
+【ユーザーの入力】
+{user_input}
+
+【候補となる職業分類】
+{candidates_text}
+
+上記の候補から最も適切な職業分類を1つ選択し、必ず以下のJSON形式で回答してください：
+{{
+  "code": "職業コード",
+  "name": "職業名",
+  "reason": "この職業を選択した理由（日本語で簡潔に）"
+}}"""
+    
+    def decide_classes(self, items: List[Tuple[str, List[Dict]]]) -> List:
+        """
+        複数の入力を1回の Gemini 呼び出しでまとめて判定
+        
+        回答は項目ごとに候補リストと照合し、不正な項目（候補にないコード・欠落など）だけを
+        decide_class で個別に再判定します。
+        
+        Args:
+            items: (ユーザー入力, 候補リスト) のリスト
+        
+        Returns:
+            入力と同じ順序の判定結果（失敗した項目は例外オブジェクト）
+        """
+        if len(items) == 1:
+            return self._decide_each(items)
+        
+        try:
+            response = self.provider.generate(self._build_packed_prompt(items), temperature=GENERATION_TEMPERATURE)
+            results = self._parse_packed_decisions(response.text, items)
+        except Exception as e:
+            print(f"⚠️ まとめて判定に失敗しました（{len(items)}件を個別に再判定します）: {e}")
+            results = [None] * len(items)
+        
+        retry = [i for i, result in enumerate(results) if result is None]
+        if retry:
+            for i, outcome in zip(retry, self._decide_each([items[i] for i in retry])):
+                results[i] = outcome
+        return results
+    
+    async def adecide_classes(self, items: List[Tuple[str, List[Dict]]]) -> List:
+        """
+        decide_classes の非同期版
+        
+        Args:
+            items: (ユーザー入力, 候補リスト) のリスト
+        
+        Returns:
+            入力と同じ順序の判定結果（失敗した項目は例外オブジェクト）
+        """
+        if len(items) == 1:
+            return await self._adecide_each(items)
+        
+        try:
+            response = await self.provider.agenerate(self._build_packed_prompt(items), temperature=GENERATION_TEMPERATURE)
+            results = self._parse_packed_decisions(response.text, items)
+        except Exception as e:
+            print(f"⚠️ まとめて判定に失敗しました（{len(items)}件を個別に再判定します）: {e}")
+            results = [None] * len(items)
+        
+        retry = [i for i, result in enumerate(results) if result is None]
+        if retry:
+            for i, outcome in zip(retry, await self._adecide_each([items[i] for i in retry])):
+                results[i] = outcome
+        return results
+    
+    def _decide_each(self, items: List[Tuple[str, List[Dict]]]) -> List:
+        """decide_class で1件ずつ判定（失敗した項目は例外オブジェクト）"""
+        results = []
+        for user_input, candidates in items:
+            try:
+                results.append(self.decide_class(user_input, candidates))
+            except Exception as e:
+                results.append(e)
+        return results
+    
+    async def _adecide_each(self, items: List[Tuple[str, List[Dict]]]) -> List:
+        """adecide_class で1件ずつ並行に判定（失敗した項目は例外オブジェクト）"""
+        return await asyncio.gather(
+            *[self.adecide_class(user_input, candidates) for user_input, candidates in items],
+            return_exceptions=True
+        )
+    
+    def _candidates_text(self, candidates: List[Dict]) -> str:
+        """
+        プロンプトの候補リスト（説明は要約を使い、合計を PROMPT_TOKEN_BUDGET 以内に切り詰める）
+        
+        Args:
+            candidates: 検索された候補リスト
+        
+        Returns:
+            候補ごとに1行のテキスト
+        
+        Raises:
+            ValueError: 候補がない場合（BM25 で入力と共通の語を含む職業がなかった場合など）
+        """
+        if not candidates:
+            raise ValueError("入力に一致する職業候補が見つかりませんでした")
+        descriptions = fit_descriptions(
+            [self.prompt_descriptions.get(c['code'], c['description']) for c in candidates],
+            config.PROMPT_TOKEN_BUDGET
+        )
+        return "\n".join([
+            f"- コード: {c['code']}, 名称: {c['name']}, 説明: {description}"
+            for c, description in zip(candidates, descriptions)
+        ])
+    
+    def _build_packed_prompt(self, items: List[Tuple[str, List[Dict]]]) -> str:
+        """
+        複数入力をまとめて判定するプロンプトの作成
+        
+        Args:
+            items: (ユーザー入力, 候補リスト) のリスト
+        
+        Returns:
+            Gemini に渡すプロンプト
+        """
+        sections = []
+        for i, (user_input, candidates) in enumerate(items):
+            candidates_text = self._candidates_text(candidates)
+            sections.append(
+                f"■ 項目 {i}\n【ユーザーの入力】\n{user_input}\n\n【候補となる職業分類】\n{candidates_text}"
+            )
+        items_text = "\n\n".join(sections)
+        
+        return f"""あなたは職業分類の専門家です。
+以下の{len(items)}件の項目それぞれについて、ユーザーの入力とその項目の候補リストを比較し、最も適切な職業分類を1つ選択してください。
+候補は必ずその項目の候補リストの中から選んでください。
+
+{items_text}
+
+必ず以下のJSON形式（項目ごとに1要素、全{len(items)}件）の配列で回答してください：
+[
+  {{
+    "id": 項目番号,
+    "code": "職業コード",
+    "name": "職業名",
+    "reason": "この職業を選択した理由（日本語で簡潔に）"
+  }}
+]"""
+    
+    def _parse_packed_decisions(self, text: str, items: List[Tuple[str, List[Dict]]]) -> List[Optional[Dict]]:
+        """
+        まとめて判定した回答の解析と検証
+        
+        Args:
+            text: Gemini の回答（JSON配列）
+            items: (ユーザー入力, 候補リスト) のリスト
+        
+        Returns:
+            項目ごとの判定結果（欠落・候補にないコードの項目はNone）
+        """
+        parsed = json.loads(text)
+        if isinstance(parsed, dict):
+            parsed = parsed.get("results", [])
+        
+        results: List[Optional[Dict]] = [None] * len(items)
+        for entry in parsed if isinstance(parsed, list) else []:
+            try:
+                i = int(entry["id"])
+                code = str(entry["code"])
+            except (TypeError, KeyError, ValueError):
+                continue
+            if not 0 <= i < len(items) or results[i] is not None:
+                continue
+            
+            # 候補リストにあるコードのみ採用（職業名は職業データの正式名称に揃える）
+            matched = next((c for c in items[i][1] if c['code'] == code), None)
+            if matched is None:
+                continue
+            results[i] = {
+                "code": code,
+                "name": matched["name"],
+                "reason": str(entry.get("reason", ""))
+            }
+        return results
+    
+    def classify(self, user_input: str) -> Dict:
+        """
+        職業分類判定のメイン処理
+        
+        Args:
+            user_input: ユーザーの自由記述入力
+        
+        Returns:
+            判定結果（code, name, reason, candidates, 処理段階ごとの所要時間 timings を含む）
+        """
+        started = time.perf_counter()
+        version = self.result_version
+        
+        # キャッシュ済みの結果があればそのまま返す
+        cached = self._get_cached_result(user_input)
+        if cached is not None:
+            result = self._from_cache(cached, user_input)
+            result['timings'] = {"total_ms": _elapsed_ms(started)}
+            metrics.observe_classification("cache", time.perf_counter() - started)
+            return result
+        
+        # Step 1: 候補検索 (Retrieval)
+        candidates, vector_top, retrieval = self._search(user_input, top_k=5)
+        retrieved = time.perf_counter()
+        
+        # Step 2: 最終判定 (Generation)（高信頼度の場合は Gemini を呼ばない）
+        result = self._fast_path_decision(vector_top)
+        if result is None:
+            result = self.decide_class(user_input, candidates)
+            result['decision_path'] = 'llm'
+        metrics.observe_stage("generation", time.perf_counter() - retrieved)
+        self._record_path(result['decision_path'])
+        
+        # 結果に候補リストを追加
+        result['candidates'] = candidates
+        result['retrieval'] = retrieval
+        self._cache_result(user_input, result, version)
+        result['user_input'] = user_input
+        result['timings'] = {
+            "retrieval_ms": _elapsed_ms(started, retrieved),
+            "generation_ms": _elapsed_ms(retrieved),
+            "total_ms": _elapsed_ms(started),
+        }
+        metrics.observe_classification(result['decision_path'], time.perf_counter() - started)
+        
+        return result
+    
+    async def aclassify(self, user_input: str) -> Dict:
+        """
+        classify の非同期版
+        同時実行数は max_concurrency で制限され、上限を超えたリクエストは空きを待ちます。
+        同じ入力の判定が実行中の場合は新たに判定せず、その結果を共有します。
+        
+        Args:
+            user_input: ユーザーの自由記述入力
+        
+        Returns:
+            判定結果（code, name, reason, candidates, 処理段階ごとの所要時間 timings を含む）
+        """
+        started = time.perf_counter()
+        
+        # キャッシュ済みの結果があればそのまま返す（共有層の参照はスレッドで実行）
+        cached = await self._aget_cached_result(user_input)
+        if cached is not None:
+            result = self._from_cache(cached, user_input)
+            result['timings'] = {"total_ms": _elapsed_ms(started)}
+            metrics.observe_classification("cache", time.perf_counter() - started)
+            return result
+        
+        # 同じ入力（正規化後）の判定が実行中であれば、その結果を共有する
+        key = (self.result_version, normalize_input(user_input))
+        result = await self.single_flight.do(key, lambda: self._aclassify_uncached(user_input))
+        return self._shared_result(result, user_input, started)
+    
+    def _shared_result(self, result: Dict, user_input: str, started: float) -> Dict:
+        """single_flight で共有された判定結果を、変更しないよう複製してから入力・所要時間を追加"""
+        result = dict(result)
+        result['user_input'] = user_input
+        result['timings'] = {**result['timings'], "total_ms": _elapsed_ms(started)}
+        metrics.observe_classification(result['decision_path'], time.perf_counter() - started)
+        return result
+    
+    async def _aclassify_uncached(self, user_input: str, events: Optional[asyncio.Queue] = None) -> Dict:
+        """
+        aclassify の判定処理本体（候補検索 → 判定 → キャッシュ保存）
+        
+        Args:
+            user_input: ユーザーの自由記述入力
+            events: 途中経過（候補リスト・判定理由の断片）を送るキュー（aclassify_stream が指定）
+        
+        Returns:
+            判定結果（code, name, reason, candidates, timings を含む。user_input は含まない）
+        """
+        started = time.perf_counter()
+        version = self.result_version
+        async with self._get_semaphore():
+            acquired = time.perf_counter()
+            
+            # Step 1: 候補検索 (Retrieval)
+            candidates, vector_top, retrieval = await self._asearch(user_input, top_k=5)
+            retrieved = time.perf_counter()
+            if events is not None:
+                events.put_nowait(("candidates", {"candidates": candidates}))
+            
+            # Step 2: 最終判定 (Generation)（高信頼度の場合は Gemini を呼ばない）
+            result = self._fast_path_decision(vector_top)
+            if result is None:
+                if events is None:
+                    result = await self.adecide_class(user_input, candidates)
+                else:
+                    result = await self._adecide_class_streamed(user_input, candidates, events)
+                result['decision_path'] = 'llm'
+            generated = time.perf_counter()
+        self._record_path(result['decision_path'])
+        metrics.observe_stage("queue", acquired - started)
+        metrics.observe_stage("generation", generated - retrieved)
+        
+        # 結果に候補リストを追加
+        result['candidates'] = candidates
+        result['retrieval'] = retrieval
+        await self._acache_result(user_input, result, version)
+        
+        # 処理段階ごとの所要時間（queue: 同時実行数の空き待ち）
+        result['timings'] = {
+            "queue_ms": _elapsed_ms(started, acquired),
+            "retrieval_ms": _elapsed_ms(acquired, retrieved),
+            "generation_ms": _elapsed_ms(retrieved, generated),
+        }
+        return result
+    
+    async def aclassify_stream(self, user_input: str) -> AsyncIterator[Tuple[str, Dict]]:
+        """
+        aclassify のストリーミング版
+        候補検索が終わった時点で候補リストを返し、続いて Gemini の判定理由を
+        生成された順に、最後に判定結果を返します。
+        
+        判定は aclassify と同じ処理本体（single_flight で同じ入力の判定を共有）で行い、
+        途中経過はキューで受け取ります。セマフォはクライアントへの送信を待つ間は保持しません。
+        同じ入力の判定が実行中だった場合は、判定理由の断片は返さず候補リストと判定結果のみを返します。
+        
+        Args:
+            user_input: ユーザーの自由記述入力
+        
+        Yields:
+            (イベント名, データ) のタプル
+                - ("candidates", {"candidates": [...]})
+                - ("token", {"text": 判定理由の断片})  ※ Gemini で判定する場合のみ
+                - ("result", 判定結果)  ※ aclassify と同じ形式
+        """
+        started = time.perf_counter()
+        
+        # キャッシュ済みの結果があればそのまま返す
+        cached = await self._aget_cached_result(user_input)
+        if cached is not None:
+            result = self._from_cache(cached, user_input)
+            result['timings'] = {"total_ms": _elapsed_ms(started)}
+            metrics.observe_classification("cache", time.perf_counter() - started)
+            yield "candidates", {"candidates": result['candidates']}
+            yield "result", result
+            return
+        
+        # 判定の完了（失敗を含む）は None で知らせる
+        events: asyncio.Queue = asyncio.Queue()
+        key = (self.result_version, normalize_input(user_input))
+        waiter = asyncio.ensure_future(
+            self.single_flight.do(key, lambda: self._aclassify_uncached(user_input, events))
+        )
+        waiter.add_done_callback(lambda _: events.put_nowait(None))
+        sent_candidates = False
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                sent_candidates = sent_candidates or event[0] == "candidates"
+                yield event
+            result = self._shared_result(await waiter, user_input, started)
+        finally:
+            # クライアントが切断した場合は待機をやめる（他に待っているリクエストがなければ判定も中止）
+            if not waiter.done():
+                waiter.cancel()
+        
+        if not sent_candidates:
+            yield "candidates", {"candidates": result['candidates']}
+        yield "result", result
+    
+    async def _adecide_class_streamed(self, user_input: str, candidates: List[Dict], events: asyncio.Queue) -> Dict:
+        """
+        adecide_class_stream で判定し、判定理由の断片を生成された順に events に送る
+        
+        Returns:
+            判定結果（code, name, reason。ストリーミングではトークン使用量を取得できないため usage はNone）
+        """
+        text = ""
+        streamed = 0
+        async for chunk in self.adecide_class_stream(user_input, candidates):
+            text += chunk
+            reason = _partial_json_string(text, "reason")
+            if reason is not None and len(reason) > streamed:
+                events.put_nowait(("token", {"text": reason[streamed:]}))
+                streamed = len(reason)
+        try:
+            result = json.loads(text)
+        except ValueError as e:
+            raise RuntimeError(f"Gemini での判定中にエラーが発生しました: {str(e)}")
+        result['usage'] = None
+        return result
+    
+    def classify_batch(self, user_inputs: List[str], top_k: int = 5) -> List[Dict]:
+        """
+        複数の入力をまとめて職業分類判定
+        
+        Embeddingはバッチで作成し、類似度計算は全入力分を行列積1回で行います。
+        Gemini での判定は BATCH_LLM_CONCURRENCY 件まで並列に実行します。
+        上流APIの呼び出しは優先度 bulk で送信し、対話的なリクエストを優先します。
+        1件の失敗でバッチ全体が失敗することはなく、エラーは項目ごとに返します。
+        
+        Args:
+            user_inputs: ユーザーの自由記述入力のリスト
+            top_k: 取得する候補数（デフォルト: 5）
+        
+        Returns:
+            入力と同じ順序の結果リスト（index, result, error）
+        """
+        # 上流APIの呼び出しは bulk（対話的なリクエストが使わなかった残りの枠で送信）
+        with scheduler.priority("bulk"):
+            return self._classify_batch(user_inputs, top_k)
+    
+    def _classify_batch(self, user_inputs: List[str], top_k: int) -> List[Dict]:
+        """classify_batch の本体"""
+        if self.index is None and config.RETRIEVAL_BACKEND != "bm25":
+            self.create_embeddings()
+        
+        items, groups = self._plan_batch(user_inputs)
+        version = self.result_version
+        
+        # キャッシュ済みの結果を反映
+        for text in list(groups):
+            cached = self._get_cached_result(text)
+            if cached is not None:
+                self._fill_batch(items, groups.pop(text), user_inputs, result=self._from_cache(cached))
+        if not groups:
+            return items
+        
+        # Step 1: 候補検索（Embeddingはバッチ、類似度は行列積1回）
+        texts = list(groups)
+        try:
+            searched = self._search_batch(texts, top_k)
+        except Exception as e:
+            for indices in groups.values():
+                self._fill_batch(items, indices, user_inputs, error=f"候補検索中にエラーが発生しました: {str(e)}")
+            return items
+        
+        # Step 2: 最終判定（高信頼度の項目は Gemini を呼ばずに確定）
+        candidates_by_text = {text: candidates for text, (candidates, _, _) in zip(texts, searched)}
+        retrieval_by_text = {text: retrieval for text, (_, _, retrieval) in zip(texts, searched)}
+        llm_texts = []
+        for text, (candidates, vector_top, _) in zip(texts, searched):
+            if not candidates:
+                # 候補がない項目はまとめて判定に含めない（まとめて判定全体が失敗しないように）
+                self._fill_batch(items, groups[text], user_inputs, error="入力に一致する職業候補が見つかりませんでした")
+                continue
+            result = self._fast_path_decision(vector_top)
+            if result is None:
+                llm_texts.append(text)
+                continue
+            self._record_path('fast_path')
+            result['candidates'] = candidates_by_text[text]
+            result['retrieval'] = retrieval_by_text[text]
+            self._cache_result(text, result, version)
+            self._fill_batch(items, groups[text], user_inputs, result=result)
+        
+        # 残りは LLM_PACK_SIZE 件ずつまとめて、並列数を制限して実行
+        packs = self._make_packs(llm_texts)
+        
+        def decide_pack(pack: List[str]) -> List:
+            return self.decide_classes([
+                (user_inputs[groups[text][0]], candidates_by_text[text]) for text in pack
+            ])
+        
+        with ThreadPoolExecutor(max_workers=max(1, config.BATCH_LLM_CONCURRENCY)) as executor:
+            # 呼び出しの優先度（contextvars）はスレッドに引き継がれないため、コンテキストをコピーして実行
+            futures = [executor.submit(contextvars.copy_context().run, decide_pack, pack) for pack in packs]
+            for pack, future in zip(packs, futures):
+                for text, outcome in zip(pack, future.result()):
+                    if isinstance(outcome, Exception):
+                        self._fill_batch(items, groups[text], user_inputs, error=str(outcome))
+                        continue
+                    outcome['decision_path'] = 'llm'
+                    self._record_path('llm')
+                    outcome['candidates'] = candidates_by_text[text]
+                    outcome['retrieval'] = retrieval_by_text[text]
+                    self._cache_result(text, outcome, version)
+                    self._fill_batch(items, groups[text], user_inputs, result=outcome)
+        
+        return items
+    
+    async def aclassify_batch(self, user_inputs: List[str], top_k: int = 5) -> List[Dict]:
+        """
+        classify_batch の非同期版
+        
+        Args:
+            user_inputs: ユーザーの自由記述入力のリスト
+            top_k: 取得する候補数（デフォルト: 5）
+        
+        Returns:
+            入力と同じ順序の結果リスト（index, result, error）
+        """
+        with scheduler.priority("bulk"):
+            return await self._aclassify_batch(user_inputs, top_k)
+    
+    async def _aclassify_batch(self, user_inputs: List[str], top_k: int) -> List[Dict]:
+        """aclassify_batch の本体"""
+        if self.index is None and config.RETRIEVAL_BACKEND != "bm25":
+            await asyncio.to_thread(self.create_embeddings)
+        
+        items, groups = self._plan_batch(user_inputs)
+        version = self.result_version
+        
+        # キャッシュ済みの結果を反映
+        for text in list(groups):
+            cached = await self._aget_cached_result(text)
+            if cached is not None:
+                self._fill_batch(items, groups.pop(text), user_inputs, result=self._from_cache(cached))
+        if not groups:
+            return items
+        
+        # Step 1: 候補検索（Embeddingはバッチ、類似度は行列積1回）
+        texts = list(groups)
+        try:
+            searched = await self._asearch_batch(texts, top_k)
+        except Exception as e:
+            for indices in groups.values():
+                self._fill_batch(items, indices, user_inputs, error=f"候補検索中にエラーが発生しました: {str(e)}")
+            return items
+        
+        # Step 2: 最終判定（高信頼度の項目は Gemini を呼ばずに確定）
+        candidates_by_text = {text: candidates for text, (candidates, _, _) in zip(texts, searched)}
+        retrieval_by_text = {text: retrieval for text, (_, _, retrieval) in zip(texts, searched)}
+        llm_texts = []
+        for text, (candidates, vector_top, _) in zip(texts, searched):
+            if not candidates:
+                # 候補がない項目はまとめて判定に含めない（まとめて判定全体が失敗しないように）
+                self._fill_batch(items, groups[text], user_inputs, error="入力に一致する職業候補が見つかりませんでした")
+                continue
+            result = self._fast_path_decision(vector_top)
+            if result is None:
+                llm_texts.append(text)
+                continue
+            self._record_path('fast_path')
+            result['candidates'] = candidates_by_text[text]
+            result['retrieval'] = retrieval_by_text[text]
+            await self._acache_result(text, result, version)
+            self._fill_batch(items, groups[text], user_inputs, result=result)
+        
+        # 残りは LLM_PACK_SIZE 件ずつまとめて、並列数を制限して実行
+        semaphore = asyncio.Semaphore(max(1, config.BATCH_LLM_CONCURRENCY))
+        
+        async def decide_pack(pack: List[str]):
+            async with semaphore:
+                outcomes = await self.adecide_classes([
+                    (user_inputs[groups[text][0]], candidates_by_text[text]) for text in pack
+                ])
+            for text, outcome in zip(pack, outcomes):
+                if isinstance(outcome, Exception):
+                    self._fill_batch(items, groups[text], user_inputs, error=str(outcome))
+                    continue
+                outcome['decision_path'] = 'llm'
+                self._record_path('llm')
+                outcome['candidates'] = candidates_by_text[text]
+                outcome['retrieval'] = retrieval_by_text[text]
+                await self._acache_result(text, outcome, version)
+                self._fill_batch(items, groups[text], user_inputs, result=outcome)
+        
+        await asyncio.gather(*[decide_pack(pack) for pack in self._make_packs(llm_texts)])
+        
+        return items
+    
+    def _search_batch(self, texts: List[str], top_k: int) -> List[Tuple[List[Dict], Optional[List[Dict]], str]]:
+        """
+        複数入力の候補検索（Embeddingはバッチで作成。失敗した場合は BM25 で続行）
+        
+        Args:
+            texts: 正規化済みのユーザー入力リスト
+            top_k: 取得する候補数
+        
+        Returns:
+            入力ごとの (候補リスト, 高速判定に使うベクトル検索の上位候補, 検索方式)
+        """
+        if config.RETRIEVAL_BACKEND == "bm25":
+            return [(self.lexical_index.search(text, top_k), None, "bm25") for text in texts]
+        try:
+            embeddings = self._embed_queries(texts)
+        except Exception as e:
+            return self._lexical_fallback(texts, top_k, e)
+        return self._rank_batch(texts, embeddings, top_k)
+    
+    async def _asearch_batch(self, texts: List[str], top_k: int) -> List[Tuple[List[Dict], Optional[List[Dict]], str]]:
+        """_search_batch の非同期版"""
+        if config.RETRIEVAL_BACKEND == "bm25":
+            return [(self.lexical_index.search(text, top_k), None, "bm25") for text in texts]
+        try:
+            embeddings = await self._aembed_queries(texts)
+        except Exception as e:
+            return self._lexical_fallback(texts, top_k, e)
+        return self._rank_batch(texts, embeddings, top_k)
+    
+    def _rank_batch(self, texts: List[str], embeddings: List[np.ndarray],
+                    top_k: int) -> List[Tuple[List[Dict], Optional[List[Dict]], str]]:
+        """複数入力の候補検索（ベクトル検索のみの場合は類似度計算を行列積1回で行う）"""
+        if config.RETRIEVAL_BACKEND == "hybrid":
+            return [self._rank(text, embedding, top_k) for text, embedding in zip(texts, embeddings)]
+        candidate_lists = self.index.search_batch(np.stack(embeddings), top_k)
+        return [(candidates, candidates, "vector") for candidates in candidate_lists]
+    
+    def _make_packs(self, texts: List[str]) -> List[List[str]]:
+        """入力を LLM_PACK_SIZE 件ずつのまとまりに分割"""
+        pack_size = max(1, config.LLM_PACK_SIZE)
+        return [texts[i:i + pack_size] for i in range(0, len(texts), pack_size)]
+    
+    def _plan_batch(self, user_inputs: List[str]):
+        """
+        バッチ入力を正規化し、同じ内容の入力をまとめる
+        
+        Returns:
+            (結果リストの雛形, 正規化済み入力 → 元のインデックスのリスト)
+        """
+        items = [{"index": i, "result": None, "error": None} for i in range(len(user_inputs))]
+        groups: Dict[str, List[int]] = {}
+        for i, user_input in enumerate(user_inputs):
+            text = normalize_input(user_input)
+            if not text:
+                items[i]["error"] = "入力が空です"
+                continue
+            groups.setdefault(text, []).append(i)
+        return items, groups
+    
+    def _fill_batch(self, items: List[Dict], indices: List[int], user_inputs: List[str],
+                    result: Dict = None, error: str = None):
+        """同じ内容の入力すべてに結果またはエラーを設定"""
+        for i in indices:
+            if result is not None:
+                items[i]["result"] = {**result, "user_input": user_inputs[i]}
+            else:
+                items[i]["error"] = error
+    
+    def _fast_path_decision(self, candidates: List[Dict]) -> Optional[Dict]:
+        """
+        高信頼度の場合の高速判定（Gemini を呼ばずに類似度1位を採用）
+        
+        類似度1位が FAST_PATH_MIN_SIMILARITY 以上、かつ2位との差が
+        FAST_PATH_MIN_MARGIN 以上の場合に1位の候補を返します。
+        無効時も条件を満たした件数は fast_path_shadow として記録します（閾値調整用）。
+        
+        Args:
+            candidates: 類似度の高い順の候補リスト
+        
+        Returns:
+            判定結果（条件を満たさない・無効の場合はNone）
+        """
+        if not candidates:
+            return None
+        
+        top = candidates[0]
+        margin = top['similarity'] - candidates[1]['similarity'] if len(candidates) > 1 else top['similarity']
+        if top['similarity'] < config.FAST_PATH_MIN_SIMILARITY or margin < config.FAST_PATH_MIN_MARGIN:
+            return None
+        
+        if not config.FAST_PATH_ENABLED:
+            self._record_path('fast_path_shadow')
+            return None
+        
+        return {
+            "code": top['code'],
+            "name": top['name'],
+            "reason": (
+                f"入力内容が「{top['name']}」の説明と非常に高い類似度を示したため"
+                f"（類似度 {top['similarity']:.3f}、次点との差 {margin:.3f}）"
+            ),
+            "decision_path": "fast_path"
+        }
+    
+    def _from_cache(self, cached: Dict, user_input: str = None) -> Dict:
+        """キャッシュ済みの結果を応答用に整える"""
+        cached['decision_path'] = 'cache'
+        # キャッシュから返す場合はトークンを使用しない
+        cached['usage'] = None
+        self._record_path('cache')
+        if user_input is not None:
+            cached['user_input'] = user_input
+        return cached
+    
+    def _record_path(self, path: str):
+        """判定経路の件数を記録"""
+        with self._counts_lock:
+            self.decision_path_counts[path] += 1
+    
+    def stats(self) -> Dict:
+        """
+        統計情報（判定経路ごとの件数・キャッシュの状況）
+        
+        Returns:
+            統計情報
+        """
+        with self._counts_lock:
+            paths = dict(self.decision_path_counts)
+        return {
+            "decision_paths": paths,
+            "fast_path": {
+                "enabled": config.FAST_PATH_ENABLED,
+                "min_similarity": config.FAST_PATH_MIN_SIMILARITY,
+                "min_margin": config.FAST_PATH_MIN_MARGIN,
+            },
+            "query_embedding_cache": self.query_embedding_cache.stats(),
+            "result_cache": self.result_cache.stats() if self.result_cache is not None else None,
+            "single_flight": self.single_flight.stats(),
+            "query_embedding_batcher": self._query_batcher.stats() if self._query_batcher is not None else None,
+            "upstream_scheduler": self.provider.scheduler.stats(),
+        }
+    
+    def _get_cached_result(self, user_input: str) -> Optional[Dict]:
+        """分類結果キャッシュの参照"""
+        if self.result_cache is None:
+            return None
+        return self.result_cache.get(user_input)
+    
+    def _set_cached_result(self, user_input: str, result: Dict):
+        """分類結果キャッシュへの保存"""
+        if self.result_cache is not None:
+            self.result_cache.set(user_input, result)
+    
+    def _cache_result(self, user_input: str, result: Dict, version: str):
+        """
+        判定結果をキャッシュ（縮退運転中の結果は精度が低いため保存しない）
+        
+        Args:
+            version: 判定開始時の分類結果のバージョン（判定中に職業データを再読み込みした場合は保存しない）
+        """
+        if result.get('retrieval') != 'bm25_fallback' and version == self.result_version:
+            self._set_cached_result(user_input, result)
+    
+    async def _acache_result(self, user_input: str, result: Dict, version: str):
+        """_cache_result の非同期版"""
+        if result.get('retrieval') != 'bm25_fallback' and version == self.result_version:
+            await self._aset_cached_result(user_input, result)
+    
+    async def _aget_cached_result(self, user_input: str) -> Optional[Dict]:
+        """分類結果キャッシュの参照（共有層がある場合はスレッドで実行）"""
+        if self.result_cache is None:
+            return None
+        if self.result_cache.shared is None:
+            return self.result_cache.get(user_input)
+        return await asyncio.to_thread(self.result_cache.get, user_input)
+    
+    async def _aset_cached_result(self, user_input: str, result: Dict):
+        """分類結果キャッシュへの保存（共有層がある場合はスレッドで実行）"""
+        if self.result_cache is None:
+            return
+        if self.result_cache.shared is None:
+            self.result_cache.set(user_input, result)
+        else:
+            await asyncio.to_thread(self.result_cache.set, user_input, result)
+    
+    def _get_query_batcher(self) -> Optional[AsyncMicroBatcher]:
+        """
+        実行中のイベントループに対応するクエリEmbeddingのマイクロバッチを取得
+        （QUERY_BATCH_MAX_SIZE が1以下の場合は無効としてNone）
+        """
+        if config.QUERY_BATCH_MAX_SIZE <= 1:
+            return None
+        loop = asyncio.get_running_loop()
+        if self._query_batcher is None or self._query_batcher.loop is not loop:
+            self._query_batcher = AsyncMicroBatcher(
+                self._aembed_query_batch,
+                max_batch_size=config.QUERY_BATCH_MAX_SIZE,
+                max_wait=config.QUERY_BATCH_WAIT_MS / 1000,
+                # 上流APIの優先度ごとにバッチを分ける（対話的なリクエストが bulk の枠で送信されないように）
+                key=scheduler.current_priority
+            )
+        return self._query_batcher
+    
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """
+        実行中のイベントループに対応するセマフォを取得
+        （セマフォは作成されたループでしか使えないため、ループが変わった場合は作り直す）
+        """
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
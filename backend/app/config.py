@@ -0,0 +1,194 @@
+"""
+アプリケーション設定
+環境変数から各種パラメータを読み込みます
+"""
+import os
+
+
+def _env_int(name: str, default: int) -> int:
+    """環境変数を整数として取得（未設定・不正値の場合はデフォルト値）"""
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        print(f"⚠️ 環境変数 {name} の値が不正です（{value}）。デフォルト値 {default} を使用します")
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    """環境変数を浮動小数点数として取得（未設定・不正値の場合はデフォルト値）"""
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        print(f"⚠️ 環境変数 {name} の値が不正です（{value}）。デフォルト値 {default} を使用します")
+        return default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    """環境変数を真偽値として取得（true/1/yes/on を真とみなす）"""
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# 同時に処理できる分類リクエスト数の上限（Gemini API への同時リクエスト数の上限。1未満は1として扱う）
+MAX_CONCURRENT_CLASSIFICATIONS = max(1, _env_int("MAX_CONCURRENT_CLASSIFICATIONS", 32))
+
+# コーパスEmbedding作成時の1リクエストあたりの件数（Gemini API の上限は100件）
+EMBEDDING_BATCH_SIZE = min(_env_int("EMBEDDING_BATCH_SIZE", 100), 100)
+
+# コーパスEmbedding作成時の並列ワーカー数
+EMBEDDING_WORKERS = _env_int("EMBEDDING_WORKERS", 4)
+
+# 一時的なエラー（429/503など）発生時の最大リトライ回数
+EMBEDDING_MAX_RETRIES = _env_int("EMBEDDING_MAX_RETRIES", 5)
+
+# 途中経過（チェックポイント）を保存する間隔（完了バッチ数）
+EMBEDDING_CHECKPOINT_INTERVAL = _env_int("EMBEDDING_CHECKPOINT_INTERVAL", 1)
+
+# 職業データCSVのパス（backend ディレクトリからの相対パス）
+OCCUPATION_CSV_PATH = os.getenv("OCCUPATION_CSV_PATH", "data/occupation.csv")
+
+# Embeddingキャッシュの保存先（未設定の場合は職業データCSVと同じディレクトリ）
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR") or None
+
+# クエリEmbeddingキャッシュの最大件数（0でキャッシュ無効）
+QUERY_EMBEDDING_CACHE_SIZE = _env_int("QUERY_EMBEDDING_CACHE_SIZE", 4096)
+
+# クエリEmbeddingキャッシュの有効期限（秒、0で無期限）
+QUERY_EMBEDDING_CACHE_TTL = _env_float("QUERY_EMBEDDING_CACHE_TTL", 86400)
+
+# 分類結果キャッシュの種類（none / memory / sqlite / redis）
+RESULT_CACHE_BACKEND = os.getenv("RESULT_CACHE_BACKEND", "memory")
+
+# 分類結果キャッシュ（インプロセス層）の最大件数
+RESULT_CACHE_SIZE = _env_int("RESULT_CACHE_SIZE", 4096)
+
+# 分類結果キャッシュの有効期限（秒、0で無期限）
+RESULT_CACHE_TTL = _env_float("RESULT_CACHE_TTL", 86400)
+
+# SQLite 共有キャッシュのファイルパス（未設定の場合はEmbeddingキャッシュと同じディレクトリ）
+RESULT_CACHE_SQLITE_PATH = os.getenv("RESULT_CACHE_SQLITE_PATH") or None
+
+# SQLite 共有キャッシュの最大件数
+RESULT_CACHE_SQLITE_MAX_ENTRIES = _env_int("RESULT_CACHE_SQLITE_MAX_ENTRIES", 100000)
+
+# Redis 共有キャッシュの接続先
+RESULT_CACHE_REDIS_URL = os.getenv("RESULT_CACHE_REDIS_URL", "redis://localhost:6379/0")
+
+# バッチ判定APIの1リクエストあたりの最大件数
+BATCH_MAX_ITEMS = _env_int("BATCH_MAX_ITEMS", 1000)
+
+# バッチ判定時に並列実行する Gemini 判定の上限
+BATCH_LLM_CONCURRENCY = _env_int("BATCH_LLM_CONCURRENCY", 8)
+
+# バッチ判定時に1回の Gemini 呼び出しでまとめて判定する入力数（1でまとめない）
+LLM_PACK_SIZE = _env_int("LLM_PACK_SIZE", 8)
+
+# 高信頼度の場合に Gemini 判定を省略する（類似度1位をそのまま採用する）
+FAST_PATH_ENABLED = _env_bool("FAST_PATH_ENABLED", False)
+
+# 高速判定の条件: 類似度1位のスコアの下限
+FAST_PATH_MIN_SIMILARITY = _env_float("FAST_PATH_MIN_SIMILARITY", 0.80)
+
+# 高速判定の条件: 類似度1位と2位の差の下限
+FAST_PATH_MIN_MARGIN = _env_float("FAST_PATH_MIN_MARGIN", 0.08)
+
+# 候補検索の方式（flat: 全件検索 / hierarchical: 職業コードの階層を使った段階的検索）
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "flat")
+
+# 階層検索で返す候補の階層（major / middle / minor）
+HIERARCHY_LEVEL = os.getenv("HIERARCHY_LEVEL", "minor")
+
+# 階層検索で絞り込む大分類の数
+HIERARCHY_MAJOR_BEAM = _env_int("HIERARCHY_MAJOR_BEAM", 3)
+
+# 階層検索で絞り込む中分類の数
+HIERARCHY_MIDDLE_BEAM = _env_int("HIERARCHY_MIDDLE_BEAM", 6)
+
+# クエリEmbeddingのマイクロバッチ: 最初のリクエストからまとめて送信するまでの待ち時間（ミリ秒）
+QUERY_BATCH_WAIT_MS = _env_float("QUERY_BATCH_WAIT_MS", 5)
+
+# クエリEmbeddingのマイクロバッチ: 1回の送信にまとめる最大件数（1でマイクロバッチ無効、API の上限は100件）
+QUERY_BATCH_MAX_SIZE = min(_env_int("QUERY_BATCH_MAX_SIZE", 100), 100)
+
+# 候補検索のバックエンド（vector: Embeddingによるベクトル検索 / bm25: 文字n-gramのBM25（API呼び出しなし） / hybrid: 両方の融合）
+RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "vector")
+
+# hybrid の融合方法（rrf: 順位の逆数の和 / weighted: スコアの加重和）
+HYBRID_FUSION = os.getenv("HYBRID_FUSION", "rrf")
+
+# hybrid（weighted）のベクトル検索の重み（BM25は 1 - この値）
+HYBRID_VECTOR_WEIGHT = _env_float("HYBRID_VECTOR_WEIGHT", 0.7)
+
+# クエリEmbeddingの作成に失敗した場合に BM25 で候補検索を続行する（縮退運転）
+LEXICAL_FALLBACK_ENABLED = _env_bool("LEXICAL_FALLBACK_ENABLED", True)
+
+# 非同期APIでクエリEmbeddingの応答を待つ上限（秒、超えた場合は BM25 で続行。0で無制限）
+LEXICAL_FALLBACK_TIMEOUT = _env_float("LEXICAL_FALLBACK_TIMEOUT", 5.0)
+
+# モデルプロバイダー（gemini: Gemini API / fake: 決定的なローカル実装 / record: Gemini APIの応答を記録 / replay: 記録した応答を再生）
+MODEL_PROVIDER = os.getenv("MODEL_PROVIDER", "gemini")
+
+# record / replay の応答の保存先（未設定の場合はEmbeddingキャッシュと同じディレクトリの provider_recordings）
+PROVIDER_RECORD_DIR = os.getenv("PROVIDER_RECORD_DIR") or None
+
+# fake の生成（判定）の呼び出しごとの遅延（ミリ秒）
+FAKE_LATENCY_MS = _env_float("FAKE_LATENCY_MS", 0)
+
+# fake のEmbeddingの呼び出しごとの遅延（ミリ秒、未設定の場合は FAKE_LATENCY_MS と同じ）
+FAKE_EMBEDDING_LATENCY_MS = _env_float("FAKE_EMBEDDING_LATENCY_MS", FAKE_LATENCY_MS)
+
+# fake のレート制限エラー（429）を発生させる確率（0〜1）
+FAKE_ERROR_RATE = _env_float("FAKE_ERROR_RATE", 0)
+
+# fake のEmbeddingの次元数
+FAKE_EMBEDDING_DIM = _env_int("FAKE_EMBEDDING_DIM", 768)
+
+# 判定プロンプトの候補の説明（condensed: 定義と除外の要点に要約 / full: 職業データの説明をそのまま）
+PROMPT_DESCRIPTIONS = os.getenv("PROMPT_DESCRIPTIONS", "condensed")
+
+# 判定プロンプト1件（まとめて判定する場合は1項目）あたりの候補の説明の推定トークン数の上限（0で無制限）
+PROMPT_TOKEN_BUDGET = _env_int("PROMPT_TOKEN_BUDGET", 400)
+
+# python -m app.serve で起動するワーカープロセス数（uvicorn と同じ環境変数名）
+WEB_CONCURRENCY = _env_int("WEB_CONCURRENCY", 1)
+
+# ワーカー間で共有する検索インデックスのパス（python -m app.serve が設定。未設定の場合は共有しない）
+SHARED_INDEX_PATH = os.getenv("SHARED_INDEX_PATH", "")
+
+# 共有インデックスが書き出されるまでワーカーが待つ上限（秒。python -m app.serve が設定。0で待たない）
+SHARED_INDEX_WAIT_SECONDS = _env_float("SHARED_INDEX_WAIT_SECONDS", 0)
+
+# 管理APIのトークン（POST /api/admin/reload の X-Admin-Token ヘッダー。未設定の場合は管理APIを無効化）
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# 職業データCSVの更新を確認する間隔（秒。変更を検知すると再読み込み。0で監視しない）
+CATALOG_WATCH_INTERVAL = _env_float("CATALOG_WATCH_INTERVAL", 0.0)
+
+# 起動時にクエリEmbeddingを事前に作成する入力の一覧（1行1件のテキストファイル。未設定の場合は作成しない）
+PREWARM_QUERIES_PATH = os.getenv("PREWARM_QUERIES_PATH", "")
+
+# Embeddingの呼び出しの1分あたりのリクエスト数の上限（プロセスごと。0で無制限）
+EMBED_REQUESTS_PER_MINUTE = _env_float("EMBED_REQUESTS_PER_MINUTE", 0)
+
+# 判定（生成）の呼び出しの1分あたりのリクエスト数の上限（プロセスごと。0で無制限）
+GENERATE_REQUESTS_PER_MINUTE = _env_float("GENERATE_REQUESTS_PER_MINUTE", 0)
+
+# 上流APIに一度に送信できるリクエスト数（0の場合は1秒分）
+UPSTREAM_BURST = _env_int("UPSTREAM_BURST", 0)
+
+# バースト分のうち対話的なリクエストのために残し、バッチ判定などの bulk には使わせない割合（0〜1）
+BULK_RESERVED_RATIO = _env_float("BULK_RESERVED_RATIO", 0.2)
+
+# レート制限エラー（429）を受けた場合に下げる送信レートの下限（上限の設定値に対する割合）
+UPSTREAM_MIN_RATE_RATIO = _env_float("UPSTREAM_MIN_RATE_RATIO", 0.1)
+
+# 下げた送信レートを上限の設定値まで戻すのにかける時間（秒）
+UPSTREAM_RATE_RECOVERY_SECONDS = _env_float("UPSTREAM_RATE_RECOVERY_SECONDS", 60)
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+職業データEmbeddingのキャッシュ（内容アドレス方式）
+
+キャッシュは「職業データの内容・Embeddingモデル・テキストの組み立て方・task_type」
+から計算したキーで管理します。CSVやモデルが変わるとキーが変わるため、
+古いキャッシュが誤って使われることはありません。
+
+ファイル構成（cache_dir 配下）:
+    embeddings_<key>.npy          Embedding行列
+    embeddings_<key>.json         メタデータ（モデル名・行ごとのテキストハッシュなど）
+    embeddings_<key>.partial.npz  作成途中のチェックポイント
+"""
+
+import os
+import glob
+import json
+import hashlib
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+# キャッシュファイル形式のバージョン（形式を変えた場合は上げる）
+CACHE_FORMAT_VERSION = 1
+
+# Embedding対象テキストの組み立て方（変更するとキャッシュキーが変わる）
+TEXT_RECIPE = "{name}。{description}"
+
+
+def build_embedding_texts(names: Iterable[str], descriptions: Iterable[str]) -> List[str]:
+    """
+    職業名と説明からEmbedding対象のテキストを作成
+
+    Args:
+        names: 職業名のリスト
+        descriptions: 職業説明のリスト
+
+    Returns:
+        Embedding対象のテキストリスト
+    """
+    return [
+        TEXT_RECIPE.format(name=name, description=description)
+        for name, description in zip(names, descriptions)
+    ]
+
+
+def text_hash(text: str) -> str:
+    """テキストのハッシュ値（SHA-256）"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def catalog_hash(rows: Iterable[Tuple[str, str, str]]) -> str:
+    """
+    職業データ全体のハッシュ値（行の順序・コードも含む）
+
+    Args:
+        rows: (code, name, description) のリスト
+    """
+    digest = hashlib.sha256()
+    for row in rows:
+        digest.update(json.dumps([str(value) for value in row], ensure_ascii=False).encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+class EmbeddingCache:
+    """
+    職業データEmbeddingのキャッシュ
+    メタデータで内容を検証し、一致しない（古い）キャッシュは使用しません。
+    """
+
+    def __init__(self, cache_dir: str, embedding_model: str, task_type: Optional[str] = None):
+        """
+        Args:
+            cache_dir: キャッシュファイルを保存するディレクトリ
+            embedding_model: Embeddingモデル名
+            task_type: コーパスのEmbedding作成時のtask_type（NoneはAPIのデフォルト）
+        """
+        self.cache_dir = cache_dir
+        self.embedding_model = embedding_model
+        self.task_type = task_type
+
+    def describe(self, rows: List[Tuple[str, str, str]], texts: List[str]) -> Dict:
+        """
+        職業データに対応するキャッシュのメタデータを作成
+
+        Args:
+            rows: (code, name, description) のリスト
+            texts: Embedding対象のテキストリスト
+
+        Returns:
+            キャッシュキーを含むメタデータ
+        """
+        meta = {
+            "format_version": CACHE_FORMAT_VERSION,
+            "embedding_model": self.embedding_model,
+            "task_type": self.task_type,
+            "text_recipe": TEXT_RECIPE,
+            "catalog_hash": catalog_hash(rows),
+            "num_rows": len(texts),
+            "row_hashes": [text_hash(text) for text in texts],
+        }
+        key_source = json.dumps(
+            {k: meta[k] for k in ("format_version", "embedding_model", "task_type", "text_recipe", "catalog_hash")},
+            sort_keys=True
+        )
+        meta["key"] = hashlib.sha256(key_source.encode("utf-8")).hexdigest()[:16]
+        return meta
+
+    def embeddings_path(self, meta: Dict) -> str:
+        return os.path.join(self.cache_dir, f"embeddings_{meta['key']}.npy")
+
+    def metadata_path(self, meta: Dict) -> str:
+        return os.path.join(self.cache_dir, f"embeddings_{meta['key']}.json")
+
+    def checkpoint_path(self, meta: Dict) -> str:
+        return os.path.join(self.cache_dir, f"embeddings_{meta['key']}.partial.npz")
+
+    def load(self, meta: Dict) -> Optional[np.ndarray]:
+        """
+        キャッシュの読み込み（メモリマップ）
+
+        Args:
+            meta: describe() で作成したメタデータ
+
+        Returns:
+            Embedding行列（キャッシュがない・内容が一致しない場合はNone）
+        """
+        embeddings_path = self.embeddings_path(meta)
+        metadata_path = self.metadata_path(meta)
+        if not (os.path.exists(embeddings_path) and os.path.exists(metadata_path)):
+            stale = self._find_stale()
+            if stale:
+                print(f"⚠️ 職業データまたはモデルが変更されたため、古いキャッシュは使用しません: {', '.join(stale)}")
+            return None
+
+        try:
+            with open(metadata_path, encoding="utf-8") as f:
+                stored = json.load(f)
+            for field in ("key", "format_version", "embedding_model", "task_type",
+                          "text_recipe", "catalog_hash", "row_hashes"):
+                if stored.get(field) != meta[field]:
+                    print(f"⚠️ キャッシュのメタデータが一致しません（{field}）。再作成します")
+                    return None
+
+            embeddings = np.load(embeddings_path, mmap_mode="r")
+            if embeddings.ndim != 2 or embeddings.shape[0] != meta["num_rows"]:
+                print(f"⚠️ キャッシュの形状が不正です {embeddings.shape}。再作成します")
+                return None
+            return embeddings
+
+        except Exception as e:
+            print(f"⚠️ キャッシュ読み込み失敗: {e}")
+            return None
+
+    def save(self, meta: Dict, embeddings: np.ndarray):
+        """
+        キャッシュの保存（一時ファイル経由で置き換え、古いキャッシュは削除）
+
+        Args:
+            meta: describe() で作成したメタデータ
+            embeddings: Embedding行列
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        embeddings_path = self.embeddings_path(meta)
+        tmp_path = embeddings_path + ".tmp.npy"
+        np.save(tmp_path, embeddings)
+        os.replace(tmp_path, embeddings_path)
+
+        stored = dict(meta)
+        stored["dim"] = int(embeddings.shape[1])
+        stored["dtype"] = str(embeddings.dtype)
+        stored["created_at"] = datetime.now(timezone.utc).isoformat()
+        metadata_path = self.metadata_path(meta)
+        with open(metadata_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(stored, f, ensure_ascii=False, indent=2)
+        os.replace(metadata_path + ".tmp", metadata_path)
+
+        self._remove_stale(meta)
+
+    def _find_stale(self) -> List[str]:
+        """キャッシュディレクトリ内の（現在のキー以外の）キャッシュファイル"""
+        pattern = os.path.join(self.cache_dir, "embeddings_*.npy")
+        return [os.path.basename(path) for path in glob.glob(pattern)]
+
+    def _remove_stale(self, meta: Dict):
+        """現在のキー以外のキャッシュファイルを削除"""
+        keep = {
+            self.embeddings_path(meta),
+            self.metadata_path(meta),
+        }
+        for pattern in ("embeddings_*.npy", "embeddings_*.json", "embeddings_*.partial.npz"):
+            for path in glob.glob(os.path.join(self.cache_dir, pattern)):
+                if path in keep:
+                    continue
+                try:
+                    os.remove(path)
+                    print(f"🗑️ 古いキャッシュを削除しました: {os.path.basename(path)}")
+                except OSError:
+                    pass
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+職業データの文字n-gram BM25インデックス（インプロセス・ネットワーク不要）
+
+日本語の形態素解析器に依存しないよう、文字n-gram（デフォルトは2〜3文字）を語として
+転置インデックスを作成します。語ごとのBM25重みは作成時に計算済みのため、
+検索はクエリに含まれる語の転置リストを足し合わせるだけです（1ミリ秒未満）。
+
+「看護師」のように職業名・説明に文字どおり現れる入力は、Embeddingなしで候補を検索できます。
+Embedding APIの障害時の縮退運転（フォールバック）にも使用します。
+"""
+
+import re
+from collections import Counter
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from .caches import normalize_input
+from .prompt_budget import EXCLUSION_MARKER
+from .vector_index import top_k_indices
+
+
+# n-gram の対象外とする文字（空白・句読点・記号）
+_SEPARATORS = re.compile(r"[\s、。，．・,.\-()（）「」『』〔〕［］\[\]【】:：;；/／]+")
+
+
+def char_ngrams(text: str, ngram_range: Tuple[int, int] = (2, 3)) -> List[str]:
+    """
+    テキストを文字n-gramに分割（記号で区切られた断片ごとに作成）
+
+    Args:
+        text: テキスト
+        ngram_range: n-gram の文字数の範囲（最小, 最大）
+
+    Returns:
+        n-gram のリスト（最小文字数より短い断片はそのまま1語とする）
+    """
+    low, high = ngram_range
+    grams = []
+    for fragment in _SEPARATORS.split(normalize_input(text).lower()):
+        if not fragment:
+            continue
+        if len(fragment) < low:
+            grams.append(fragment)
+            continue
+        for n in range(low, high + 1):
+            grams.extend(fragment[i:i + n] for i in range(len(fragment) - n + 1))
+    return grams
+
+
+def definition_text(description: str) -> str:
+    """
+    説明文から職業の定義部分を取り出す
+    （「ただし、〜は〜に分類される」の注記には他の職業名が含まれ、誤一致の原因になるため除く）
+    """
+    return EXCLUSION_MARKER.split(description, maxsplit=1)[0]
+
+
+class BM25Index:
+    """
+    文字n-gram の BM25 による職業候補の検索インデックス
+    """
+
+    def __init__(self, records: List[Dict], k1: float = 1.2, b: float = 0.75,
+                 name_weight: int = 2, ngram_range: Tuple[int, int] = (2, 3)):
+        """
+        Args:
+            records: 候補データ（code, name, description）
+            k1: BM25 の語頻度の飽和パラメータ
+            b: BM25 の文書長の正規化パラメータ
+            name_weight: 職業名の語を何回分として数えるか（職業名の一致を重視）
+            ngram_range: n-gram の文字数の範囲
+        """
+        self.records = records
+        self.k1 = k1
+        self.ngram_range = ngram_range
+
+        documents = []
+        for record in records:
+            terms = Counter(char_ngrams(definition_text(record["description"]), ngram_range))
+            for term in char_ngrams(record["name"], ngram_range):
+                terms[term] += name_weight
+            documents.append(terms)
+
+        self.size = len(records)
+        lengths = np.array([sum(terms.values()) for terms in documents], dtype=np.float32)
+        avg_length = float(lengths.mean()) if self.size else 0.0
+
+        # 語ごとの転置リスト（文書番号, BM25重み）を事前計算
+        # （全語分を1つの配列にまとめ、語ごとの範囲を offsets で参照する）
+        vocabulary: Dict[str, int] = {}
+        term_ids, doc_ids, tfs = [], [], []
+        for doc_id, terms in enumerate(documents):
+            for term, tf in terms.items():
+                term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+                doc_ids.append(doc_id)
+                tfs.append(tf)
+
+        term_ids = np.array(term_ids, dtype=np.intp)
+        order = np.argsort(term_ids, kind="stable")
+        self.doc_ids = np.array(doc_ids, dtype=np.intp)[order]
+        tf = np.array(tfs, dtype=np.float32)[order]
+        df = np.bincount(term_ids, minlength=len(vocabulary))
+        self.offsets = np.concatenate(([0], np.cumsum(df)))
+        self.idf = np.log(1 + (self.size - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+        norm = k1 * (1 - b + b * lengths[self.doc_ids] / avg_length) if avg_length else k1
+        self.weights = (self.idf[term_ids[order]] * tf * (k1 + 1) / (tf + norm)).astype(np.float32)
+        self.vocabulary = vocabulary
+
+    def __len__(self) -> int:
+        return self.size
+
+    def scores(self, text: str) -> Tuple[np.ndarray, float]:
+        """
+        クエリと全職業データのBM25スコア
+
+        Args:
+            text: ユーザーの自由記述入力
+
+        Returns:
+            (スコア配列, クエリで取り得る最大スコア)。最大スコアは類似度を 0〜1 に正規化するために使用
+        """
+        scores = np.zeros(self.size, dtype=np.float32)
+        max_score = 0.0
+        for term in set(char_ngrams(text, self.ngram_range)):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            scores[self.doc_ids[start:end]] += self.weights[start:end]
+            max_score += float(self.idf[term_id]) * (self.k1 + 1)
+        return scores, max_score
+
+    def normalized_scores(self, text: str) -> np.ndarray:
+        """クエリと全職業データのBM25スコア（0〜1 に正規化）"""
+        scores, max_score = self.scores(text)
+        return scores / max_score if max_score > 0 else scores
+
+    def search(self, text: str, top_k: int = 5) -> List[Dict]:
+        """
+        クエリに一致する職業候補を検索
+
+        Args:
+            text: ユーザーの自由記述入力
+            top_k: 取得する候補数
+
+        Returns:
+            スコアの高い職業候補のリスト（similarity は 0〜1 に正規化したBM25スコア。
+            クエリと共通の語がない職業は含めないため、top_k 件より少ない・空の場合がある）
+        """
+        scores = self.normalized_scores(text)
+        return [
+            {**self.records[idx], "similarity": float(scores[idx])}
+            for idx in top_k_indices(scores, top_k)
+            if scores[idx] > 0
+        ]
+
+
+def fuse_scores(vector_scores: np.ndarray, lexical_scores: np.ndarray, method: str = "rrf",
+                vector_weight: float = 0.7, depth: int = 50, rrf_k: int = 60) -> np.ndarray:
+    """
+    ベクトル検索とBM25のスコアを融合
+
+    Args:
+        vector_scores: コサイン類似度（全職業データ分）
+        lexical_scores: 正規化済みのBM25スコア（全職業データ分）
+        method: "rrf"（順位の逆数の和）/ "weighted"（スコアの加重和）
+        vector_weight: weighted の場合のベクトル検索の重み（BM25は 1 - vector_weight）
+        depth: rrf の場合に順位を数える上位件数
+        rrf_k: rrf の順位の平滑化定数
+
+    Returns:
+        融合後のスコア（全職業データ分）
+    """
+    if method == "weighted":
+        return vector_weight * vector_scores + (1 - vector_weight) * lexical_scores
+    if method != "rrf":
+        raise ValueError(f"不明な HYBRID_FUSION です: {method}（rrf / weighted）")
+
+    fused = np.zeros(len(vector_scores), dtype=np.float32)
+    for scores, matched_only in ((vector_scores, False), (lexical_scores, True)):
+        ranked = top_k_indices(scores, depth)
+        if matched_only:
+            # BM25で一致しなかった職業には順位を付けない
+            ranked = ranked[scores[ranked] > 0]
+        fused[ranked] += 1.0 / (rrf_k + np.arange(1, len(ranked) + 1))
+    return fused
+
+
+def rank_records(records: Sequence[Dict], scores: np.ndarray, similarities: np.ndarray,
+                 top_k: int) -> List[Dict]:
+    """
+    スコアの高い順に候補リストを作成
+
+    Args:
+        records: 候補データ
+        scores: 並び順に使うスコア
+        similarities: 候補の similarity に設定する値（表示・高速判定用のコサイン類似度など）
+        top_k: 取得件数
+
+    Returns:
+        候補リスト
+    """
+    return [
+        {**records[idx], "similarity": float(similarities[idx])}
+        for idx in top_k_indices(scores, top_k)
+    ]
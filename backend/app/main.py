@@ -6,14 +6,25 @@ FastAPI Backend for Occupation Classification System
 """
 
 import os
+import hmac
+import json
+import asyncio
 import logging
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, HTTPException, status
+from typing import Optional
+from fastapi import FastAPI, Header, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from dotenv import load_dotenv
 
-from .models import ClassifyRequest, ClassifyResponse, HealthResponse
+from .models import (
+    ClassifyRequest, ClassifyResponse, HealthResponse,
+    BatchClassifyRequest, BatchClassifyResponse, StatsResponse, CatalogReloadResponse, CacheInvalidateResponse,
+    ReadinessResponse, MAX_INPUT_LENGTH
+)
 from .classifier import OccupationClassifier
+from .warmup import WarmupProgress
+from . import config, metrics
 
 # ロギング設定
 logging.basicConfig(
@@ -25,37 +36,146 @@ logger = logging.getLogger(__name__)
 # 環境変数の読み込み
 load_dotenv()
 
-# グローバル変数
+# グローバル変数（準備処理が完了するまでは None）
 classifier = None
 
+# 起動時の準備処理の進捗（/api/health/ready で返す）
+warmup_progress = WarmupProgress()
+
+# バックグラウンドで実行中のタスク（シャットダウン時にキャンセル）
+_background_tasks = set()
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
     アプリケーションのライフサイクル管理
-    起動時にClassifierを初期化し、Embeddingsを事前作成
+    Classifierの初期化・Embeddingsの作成はバックグラウンドで行い、起動を待たせない
+    （準備が完了するまで /api/health/ready と判定APIは 503 を返す）
     """
-    global classifier
+    global warmup_progress
     
     logger.info("Starting up application...")
+    warmup_progress = WarmupProgress()
+    _start_background(_warm_up())
+    logger.info("Application startup complete (warming up in background)")
+    
+    yield
+    
+    # シャットダウン処理
+    logger.info("Shutting down application...")
+    for task in list(_background_tasks):
+        task.cancel()
+
+
+def _start_background(coro):
+    """バックグラウンドタスクの開始（シャットダウン時にキャンセルするため保持）"""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+async def _warm_up():
+    """
+    起動時の準備処理（職業データの読み込み → Embeddingsの作成 → 準備完了 → クエリEmbeddingの事前作成）
+    必須の段階が失敗した場合は /api/health/live が 503 を返し、Pod が再起動されます。
+    """
+    global classifier
+    progress = warmup_progress
     
     try:
         # Classifierの初期化（実データを使用）
-        classifier = OccupationClassifier(csv_path="data/occupation.csv")
-        
-        # Embeddingsの事前作成
-        classifier.create_embeddings()
+        with progress.phase("catalog"):
+            instance = await asyncio.to_thread(OccupationClassifier, csv_path=config.OCCUPATION_CSV_PATH)
+            progress.update("catalog", occupations=len(instance.catalog))
         
-        logger.info("Application startup complete")
+        # 上流APIのクライアント（google.generativeai）は Embeddings の作成と並行して読み込む
+        _start_background(_warm_provider(instance))
         
+        # Embeddingsの作成（キャッシュがあれば読み込み）と検索インデックスの作成
+        with progress.phase("embeddings"):
+            await asyncio.to_thread(
+                instance.create_embeddings,
+                on_progress=lambda done, total: progress.update("embeddings", done=done, total=total)
+            )
+            
+            # 判定経路・キャッシュの統計情報を /metrics で公開
+            metrics.register_classifier(instance)
+            classifier = instance
+    
     except Exception as e:
         logger.error(f"Failed to initialize classifier: {e}")
-        raise
+        return
     
-    yield
+    logger.info(f"Application ready ({progress.snapshot()['ready_seconds']:.2f}s after startup)")
     
-    # シャットダウン処理
-    logger.info("Shutting down application...")
+    # 職業データCSVの更新を監視（CATALOG_WATCH_INTERVAL 秒ごと）
+    if config.CATALOG_WATCH_INTERVAL > 0:
+        _start_background(_watch_catalog(config.OCCUPATION_CSV_PATH, config.CATALOG_WATCH_INTERVAL))
+    
+    await _prewarm_queries(instance)
+
+
+async def _warm_provider(instance: OccupationClassifier):
+    """モデルプロバイダーのクライアントを読み込む（失敗しても最初の呼び出し時に再試行される）"""
+    try:
+        with warmup_progress.phase("provider"):
+            await asyncio.to_thread(instance.provider.warm)
+    except Exception as e:
+        logger.warning(f"Failed to warm up model provider: {e}")
+        return
+    logger.info(f"Model provider ready ({warmup_progress.snapshot()['phases']['provider']['elapsed_seconds']:.2f}s)")
+
+
+async def _prewarm_queries(instance: OccupationClassifier):
+    """よく使われる入力のクエリEmbeddingを事前に作成（PREWARM_QUERIES_PATH。失敗しても判定は可能）"""
+    if not config.PREWARM_QUERIES_PATH:
+        warmup_progress.finish("prewarm", "skipped")
+        return
+    try:
+        with warmup_progress.phase("prewarm"):
+            with open(config.PREWARM_QUERIES_PATH, encoding="utf-8") as f:
+                queries = f.read().splitlines()
+            count = await asyncio.to_thread(instance.prewarm_queries, queries)
+            warmup_progress.update("prewarm", queries=count)
+    except Exception as e:
+        logger.warning(f"Failed to prewarm query embeddings: {e}")
+        return
+    logger.info(f"Prewarmed {count} query embeddings")
+
+
+def _file_signature(path: str):
+    """ファイルの更新日時とサイズ（存在しない場合はNone）"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+async def _watch_catalog(path: str, interval: float):
+    """
+    職業データCSVの更新を監視し、変更された場合に再読み込み
+    （書き込み途中のファイルを読まないよう、2回続けて同じ状態になってから再読み込み）
+    """
+    loaded = _file_signature(path)
+    pending = None
+    while True:
+        await asyncio.sleep(interval)
+        current = _file_signature(path)
+        if current is None or current == loaded:
+            pending = None
+            continue
+        if current != pending:
+            pending = current
+            continue
+        loaded, pending = current, None
+        try:
+            summary = await asyncio.to_thread(classifier.reload_catalog, path)
+            logger.info(f"Catalog reloaded from {path}: {summary}")
+        except Exception as e:
+            logger.error(f"Failed to reload catalog from {path}: {e}")
 
 
 # FastAPIアプリケーションの作成
@@ -105,10 +225,163 @@ async def health_check():
     
     return {
         "status": "healthy",
-        "message": f"職業分類データ {len(classifier.data)} 件をロード済み"
+        "message": f"職業分類データ {len(classifier.catalog)} 件をロード済み"
+    }
+
+
+@app.get("/api/health/live", response_model=HealthResponse)
+async def liveness():
+    """
+    Liveness エンドポイント
+    
+    準備処理の途中でも即座に応答します（準備処理の必須の段階が失敗した場合のみ 503）。
+    """
+    if warmup_progress.failed:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="起動時の準備処理に失敗しました（/api/health/ready を参照）"
+        )
+    return {
+        "status": "alive",
+        "message": "ready" if classifier is not None else "warming up"
     }
 
 
+@app.get(
+    "/api/health/ready",
+    response_model=ReadinessResponse,
+    responses={503: {"model": ReadinessResponse, "description": "準備中・準備処理の失敗"}}
+)
+async def readiness():
+    """
+    Readiness エンドポイント
+    
+    準備処理の段階ごとの状態と経過時間を返します。
+    職業データの読み込みと Embeddings の作成が完了するまでは 503 を返します。
+    """
+    snapshot = warmup_progress.snapshot()
+    if classifier is None or snapshot["status"] != "ready":
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content=snapshot)
+    return snapshot
+
+
+@app.get("/api/stats", response_model=StatsResponse)
+async def get_stats():
+    """
+    統計情報エンドポイント
+    
+    判定経路（llm / fast_path / cache）ごとの件数とキャッシュの状況を返します。
+    高速判定の閾値調整に使用します。
+    """
+    if classifier is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Classifier is not initialized"
+        )
+    
+    return classifier.stats()
+
+
+def _check_admin_token(x_admin_token: Optional[str]):
+    """管理APIのトークンの確認（ADMIN_TOKEN が未設定・一致しない場合は403）"""
+    if not config.ADMIN_TOKEN or not hmac.compare_digest(
+        (x_admin_token or "").encode("utf-8"), config.ADMIN_TOKEN.encode("utf-8")
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="管理APIのトークンが正しくありません"
+        )
+
+
+@app.post("/api/admin/reload", response_model=CatalogReloadResponse)
+async def reload_catalog(x_admin_token: Optional[str] = Header(None)):
+    """
+    職業データ再読み込みエンドポイント（管理用）
+    
+    職業データCSVを読み込み直し、追加・変更された職業だけEmbeddingを作成して
+    検索インデックスを差し替えます。処理中のリクエストは差し替えまで現在のデータで処理されます。
+    
+    Args:
+        x_admin_token: 管理APIのトークン（X-Admin-Token ヘッダー、ADMIN_TOKEN と一致する必要がある）
+    
+    Returns:
+        CatalogReloadResponse - 再読み込みの結果
+    
+    Raises:
+        HTTPException: 403 - トークンが一致しない・管理APIが無効 / 400 - CSVが不正 / 409 - 再読み込み中
+    """
+    _check_admin_token(x_admin_token)
+    if classifier is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Classifier is not initialized"
+        )
+    
+    try:
+        summary = await asyncio.to_thread(classifier.reload_catalog)
+        logger.info(f"Catalog reloaded: {summary}")
+        return summary
+    
+    except ValueError as e:
+        logger.error(f"Validation error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except RuntimeError as e:
+        if classifier.reloading:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=str(e)
+            )
+        logger.error(f"Runtime error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"職業データの再読み込み中にエラーが発生しました: {str(e)}"
+        )
+
+
+@app.post("/api/admin/cache/invalidate", response_model=CacheInvalidateResponse)
+async def invalidate_result_cache(all_versions: bool = False, x_admin_token: Optional[str] = Header(None)):
+    """
+    分類結果キャッシュ無効化エンドポイント（管理用）
+    
+    インプロセス層と共有層（SQLite / Redis）の分類結果を削除します。
+    共有層は全レプリカで共有されるため、他のレプリカのキャッシュも削除されます。
+    
+    Args:
+        all_versions: trueの場合は共有層の全バージョン、falseの場合は現在のバージョンのみ削除
+        x_admin_token: 管理APIのトークン（X-Admin-Token ヘッダー）
+    
+    Returns:
+        CacheInvalidateResponse - 削除の範囲
+    
+    Raises:
+        HTTPException: 403 - トークンが一致しない・管理APIが無効
+    """
+    _check_admin_token(x_admin_token)
+    if classifier is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Classifier is not initialized"
+        )
+    
+    await asyncio.to_thread(classifier.invalidate_result_cache, all_versions)
+    logger.info(f"Result cache invalidated (all_versions={all_versions})")
+    return {"all_versions": all_versions, "version": classifier.result_version}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """
+    Prometheus メトリクスエンドポイント
+    
+    判定処理の段階ごとの所要時間、上流APIの呼び出し時間・エラー・リトライ・トークン使用量、
+    処理中のリクエスト数、キャッシュの件数などを Prometheus のテキスト形式で返します。
+    """
+    return Response(content=metrics.latest(), media_type=metrics.CONTENT_TYPE_LATEST)
+
+
 @app.post("/api/classify", response_model=ClassifyResponse)
 async def classify_occupation(request: ClassifyRequest):
     """
@@ -134,10 +407,11 @@ async def classify_occupation(request: ClassifyRequest):
     try:
         logger.info(f"Classification request: {request.user_input[:50]}...")
         
-        # 職業分類判定の実行
-        result = classifier.classify(request.user_input)
+        # 職業分類判定の実行（非同期APIでイベントループをブロックしない）
+        with metrics.track_in_flight("classify"):
+            result = await classifier.aclassify(request.user_input)
         
-        logger.info(f"Classification result: [{result['code']}] {result['name']}")
+        logger.info(f"Classification result: [{result['code']}] {result['name']} ({result.get('decision_path')})")
         
         return result
         
@@ -161,6 +435,120 @@ async def classify_occupation(request: ClassifyRequest):
         )
 
 
+@app.post("/api/classify/stream")
+async def classify_occupation_stream(request: ClassifyRequest):
+    """
+    職業分類判定エンドポイント（Server-Sent Events）
+    
+    候補検索が終わった時点で候補リストを送信し、続いて Gemini の判定理由を
+    生成された順に、最後に判定結果を送信します。
+    
+    イベント:
+        candidates - {"candidates": [...]}（類似職業候補）
+        token      - {"text": "..."}（判定理由の断片。Gemini で判定する場合のみ）
+        result     - ClassifyResponse と同じ形式の判定結果
+        error      - {"detail": "..."}（判定処理中のエラー）
+    
+    Args:
+        request: ClassifyRequest - ユーザー入力を含むリクエストボディ
+    
+    Returns:
+        StreamingResponse - text/event-stream
+    """
+    if classifier is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Classifier is not initialized"
+        )
+    
+    logger.info(f"Streaming classification request: {request.user_input[:50]}...")
+    
+    async def event_stream():
+        with metrics.track_in_flight("classify_stream"):
+            try:
+                async for event, data in classifier.aclassify_stream(request.user_input):
+                    if event == "result":
+                        logger.info(f"Classification result: [{data['code']}] {data['name']} ({data.get('decision_path')})")
+                    yield _sse(event, data)
+            except (ValueError, RuntimeError) as e:
+                logger.error(f"Streaming classification error: {e}")
+                yield _sse("error", {"detail": f"判定処理中にエラーが発生しました: {str(e)}"})
+            except Exception as e:
+                logger.error(f"Unexpected error: {e}", exc_info=True)
+                yield _sse("error", {"detail": "予期しないエラーが発生しました"})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # リバースプロキシ（nginx など）によるバッファリングを無効化
+            "X-Accel-Buffering": "no",
+        }
+    )
+
+
+def _sse(event: str, data) -> str:
+    """Server-Sent Events の1イベント分のテキストを作成"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.post("/api/classify/batch", response_model=BatchClassifyResponse)
+async def classify_occupation_batch(request: BatchClassifyRequest):
+    """
+    バッチ判定エンドポイント
+    
+    複数の自由記述をまとめて判定します。Embeddingはバッチで作成し、
+    Gemini での判定は並列数を制限して実行します。
+    失敗した項目はバッチ全体を失敗させず、項目ごとに error を返します。
+    
+    Args:
+        request: BatchClassifyRequest - ユーザー入力のリスト
+    
+    Returns:
+        BatchClassifyResponse - 入力と同じ順序の判定結果
+    """
+    if classifier is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Classifier is not initialized"
+        )
+    
+    logger.info(f"Batch classification request: {len(request.user_inputs)} items")
+    
+    # 文字数の上限を超える項目は判定せずにエラーとして返す
+    valid_indices = [
+        i for i, user_input in enumerate(request.user_inputs)
+        if len(user_input) <= MAX_INPUT_LENGTH
+    ]
+    
+    try:
+        with metrics.track_in_flight("classify_batch"):
+            items = await classifier.aclassify_batch([request.user_inputs[i] for i in valid_indices])
+    except Exception as e:
+        logger.error(f"Unexpected error: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="予期しないエラーが発生しました"
+        )
+    
+    results = [
+        {"index": i, "result": None, "error": f"入力が{MAX_INPUT_LENGTH}文字を超えています"}
+        for i in range(len(request.user_inputs))
+    ]
+    for i, item in zip(valid_indices, items):
+        results[i] = {**item, "index": i}
+    
+    failed = sum(1 for item in results if item["error"] is not None)
+    logger.info(f"Batch classification done: {len(results) - failed} succeeded, {failed} failed")
+    
+    return {
+        "results": results,
+        "succeeded": len(results) - failed,
+        "failed": failed
+    }
+
+
 if __name__ == "__main__":
     import uvicorn
     
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Prometheus メトリクス
+
+- 判定処理の段階ごと（queue / embedding / search / generation）の所要時間
+- 上流API（Embedding・判定）の呼び出し時間・エラー・リトライ・トークン使用量
+- 上流APIの送信待ち（優先度ごとの待機数・待ち時間）と現在の送信レート
+- 処理中のリクエスト数、キャッシュの件数・ヒット数（/metrics の取得時に stats() から作成）
+
+メトリクスはプロセスごとに集計されます（uvicorn を複数ワーカーで起動する場合は各プロセスを個別に取得）。
+"""
+
+import time
+from typing import AsyncIterator, Dict, List, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from .providers import GenerationResult, ModelProvider
+
+
+# 判定処理の所要時間のバケット（秒。キャッシュヒットの 1ms 未満〜 Gemini の応答待ちの数十秒）
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STAGE_SECONDS = Histogram(
+    "occupation_classify_stage_seconds",
+    "判定処理の段階ごとの所要時間（queue: 同時実行数の空き待ち / embedding: クエリEmbedding / "
+    "search: 類似度計算・並べ替え / generation: 判定）",
+    ["stage"],
+    buckets=LATENCY_BUCKETS
+)
+CLASSIFY_SECONDS = Histogram(
+    "occupation_classify_seconds",
+    "1件の判定の所要時間（判定経路ごと）",
+    ["decision_path"],
+    buckets=LATENCY_BUCKETS
+)
+UPSTREAM_SECONDS = Histogram(
+    "occupation_upstream_request_seconds",
+    "上流API（Embedding・判定）の呼び出し時間",
+    ["operation"],
+    buckets=LATENCY_BUCKETS
+)
+UPSTREAM_ERRORS = Counter(
+    "occupation_upstream_errors_total",
+    "上流APIの呼び出しエラー数（リトライしたものを含む）",
+    ["operation", "error"]
+)
+UPSTREAM_RETRIES = Counter(
+    "occupation_upstream_retries_total",
+    "上流APIの呼び出しのリトライ数",
+    ["operation"]
+)
+LLM_TOKENS = Counter(
+    "occupation_llm_tokens_total",
+    "判定で使用したトークン数（API が使用量を返す場合のみ）",
+    ["kind"]
+)
+PROMPT_TOKENS = Histogram(
+    "occupation_llm_prompt_tokens",
+    "判定1回あたりの入力トークン数（API が使用量を返す場合のみ）",
+    buckets=(100, 200, 300, 400, 600, 800, 1000, 1500, 2000, 3000, 5000, 10000)
+)
+UPSTREAM_QUEUE_DEPTH = Gauge(
+    "occupation_upstream_queue_depth",
+    "上流APIの送信待ち（流量制御）の呼び出し数",
+    ["operation", "priority"]
+)
+UPSTREAM_QUEUE_SECONDS = Histogram(
+    "occupation_upstream_queue_seconds",
+    "上流APIの送信待ち（流量制御）の時間",
+    ["operation", "priority"],
+    buckets=LATENCY_BUCKETS
+)
+UPSTREAM_RATE_LIMIT = Gauge(
+    "occupation_upstream_rate_limit",
+    "上流APIの現在の送信レート（1分あたりのリクエスト数。429 を受けると下げる。0は無制限）",
+    ["operation"]
+)
+IN_FLIGHT = Gauge(
+    "occupation_requests_in_flight",
+    "処理中のリクエスト数",
+    ["endpoint"]
+)
+
+
+def observe_stage(stage: str, seconds: float):
+    """判定処理の1段階の所要時間を記録"""
+    STAGE_SECONDS.labels(stage).observe(seconds)
+
+
+def observe_classification(decision_path: str, seconds: float):
+    """1件の判定の所要時間を記録"""
+    CLASSIFY_SECONDS.labels(decision_path or "unknown").observe(seconds)
+
+
+def record_retry(operation: str):
+    """上流APIの呼び出しのリトライを記録"""
+    UPSTREAM_RETRIES.labels(operation).inc()
+
+
+def track_in_flight(endpoint: str):
+    """
+    処理中のリクエスト数を数えるコンテキストマネージャ
+
+    Args:
+        endpoint: エンドポイント名（ラベル）
+    """
+    return IN_FLIGHT.labels(endpoint).track_inprogress()
+
+
+def latest() -> bytes:
+    """Prometheus のテキスト形式のメトリクス"""
+    return generate_latest(REGISTRY)
+
+
+class InstrumentedProvider(ModelProvider):
+    """
+    モデルプロバイダーの呼び出し時間・エラー・トークン使用量を記録するラッパー
+    """
+
+    def __init__(self, inner: ModelProvider):
+        """
+        Args:
+            inner: 実際に呼び出すプロバイダー
+        """
+        super().__init__(inner.embedding_model, inner.llm_model)
+        self.name = inner.name
+        self.inner = inner
+
+    def __getattr__(self, name):
+        # プロバイダー固有の属性（FakeProvider の設定など）は内側のプロバイダーを参照
+        if name == "inner":
+            raise AttributeError(name)
+        return getattr(self.inner, name)
+
+    def warm(self):
+        self.inner.warm()
+
+    @staticmethod
+    def _record_error(operation: str, error: Exception):
+        UPSTREAM_ERRORS.labels(operation, type(error).__name__).inc()
+
+    @staticmethod
+    def _record_usage(result: GenerationResult):
+        for kind in ("prompt_tokens", "output_tokens"):
+            count = (result.usage or {}).get(kind)
+            if count:
+                LLM_TOKENS.labels(kind.replace("_tokens", "")).inc(count)
+        if result.usage and result.usage.get("prompt_tokens"):
+            PROMPT_TOKENS.observe(result.usage["prompt_tokens"])
+
+    def _call(self, operation: str, func, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            self._record_error(operation, e)
+            raise
+        finally:
+            UPSTREAM_SECONDS.labels(operation).observe(time.perf_counter() - started)
+
+    async def _acall(self, operation: str, func, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        except Exception as e:
+            self._record_error(operation, e)
+            raise
+        finally:
+            UPSTREAM_SECONDS.labels(operation).observe(time.perf_counter() - started)
+
+    def embed(self, texts: List[str], task_type: Optional[str] = None) -> List[List[float]]:
+        return self._call("embed", self.inner.embed, texts, task_type=task_type)
+
+    async def aembed(self, texts: List[str], task_type: Optional[str] = None) -> List[List[float]]:
+        return await self._acall("embed", self.inner.aembed, texts, task_type=task_type)
+
+    def generate(self, prompt: str, temperature: float = 0.3, json_mode: bool = True) -> GenerationResult:
+        result = self._call("generate", self.inner.generate, prompt,
+                            temperature=temperature, json_mode=json_mode)
+        self._record_usage(result)
+        return result
+
+    async def agenerate(self, prompt: str, temperature: float = 0.3, json_mode: bool = True) -> GenerationResult:
+        result = await self._acall("generate", self.inner.agenerate, prompt,
+                                   temperature=temperature, json_mode=json_mode)
+        self._record_usage(result)
+        return result
+
+    async def astream(self, prompt: str, temperature: float = 0.3, json_mode: bool = True) -> AsyncIterator[str]:
+        started = time.perf_counter()
+        try:
+            async for chunk in self.inner.astream(prompt, temperature=temperature, json_mode=json_mode):
+                yield chunk
+        except Exception as e:
+            self._record_error("stream", e)
+            raise
+        finally:
+            UPSTREAM_SECONDS.labels("stream").observe(time.perf_counter() - started)
+
+
+class ClassifierCollector:
+    """
+    Classifier の stats() から判定経路ごとの件数・キャッシュ・集約の状況を作成するコレクター
+    （/metrics の取得時に値を読み取るため、処理中の記録は不要）
+    """
+
+    def __init__(self, classifier):
+        self.classifier = classifier
+
+    def collect(self):
+        stats = self.classifier.stats()
+
+        paths = CounterMetricFamily(
+            "occupation_decision_paths", "判定経路ごとの件数", labels=["path"]
+        )
+        for path, count in stats["decision_paths"].items():
+            paths.add_metric([path], count)
+        yield paths
+
+        caches: Dict[str, Dict] = {"query_embedding": stats["query_embedding_cache"]}
+        if stats.get("result_cache"):
+            caches["result"] = stats["result_cache"]["local"]
+        entries = GaugeMetricFamily("occupation_cache_entries", "キャッシュの件数", labels=["cache"])
+        hits = CounterMetricFamily("occupation_cache_hits", "キャッシュのヒット数", labels=["cache"])
+        misses = CounterMetricFamily("occupation_cache_misses", "キャッシュのミス数", labels=["cache"])
+        for name, cache in caches.items():
+            entries.add_metric([name], cache["size"])
+            hits.add_metric([name], cache["hits"])
+            misses.add_metric([name], cache["misses"])
+        yield entries
+        yield hits
+        yield misses
+
+        single_flight = stats["single_flight"]
+        yield GaugeMetricFamily(
+            "occupation_single_flight_in_flight", "実行中の判定処理（同じ入力の集約単位）の数",
+            value=single_flight["in_flight"]
+        )
+        yield CounterMetricFamily(
+            "occupation_single_flight_coalesced", "実行中の判定に集約されたリクエスト数",
+            value=single_flight["coalesced"]
+        )
+
+
+_registered = None
+
+
+def register_classifier(classifier):
+    """
+    Classifier の統計情報をメトリクスとして公開（同じプロセスで再登録した場合は置き換え）
+
+    Args:
+        classifier: OccupationClassifier
+    """
+    global _registered
+    if _registered is not None:
+        REGISTRY.unregister(_registered)
+    _registered = ClassifierCollector(classifier)
+    REGISTRY.register(_registered)
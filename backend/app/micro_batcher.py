@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+非同期マイクロバッチ
+
+同時に届いた個別のリクエストを短時間（数ミリ秒）だけ溜め、
+1回のバッチ呼び出しにまとめて実行します。各呼び出し元には自分の結果だけを返します。
+（同時リクエストが多い場合に、上流APIの呼び出し回数・接続数を減らす）
+
+key を指定すると、呼び出し元のコンテキストから求めたキー（上流APIの優先度など）ごとに
+別のバッチに分け、各バッチはそのキーの呼び出し元のコンテキストで実行します。
+"""
+
+import asyncio
+import contextvars
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+
+class AsyncMicroBatcher:
+    """
+    マイクロバッチ（asyncio 用）
+
+    最初のリクエストから max_wait 秒経過するか、max_batch_size 件溜まった時点で
+    batch_func をまとめて呼び出します。batch_func の例外はそのバッチの全員に伝わり、
+    バッチの実行がキャンセルされた場合はそのバッチの全員の待機もキャンセルされます。
+    インスタンスは作成されたイベントループでのみ使用できます。
+    """
+
+    def __init__(self, batch_func: Callable[[List[Any]], Awaitable[List[Any]]],
+                 max_batch_size: int = 100, max_wait: float = 0.005,
+                 key: Optional[Callable[[], Hashable]] = None):
+        """
+        Args:
+            batch_func: 入力のリストを受け取り、同じ順序の結果リストを返すコルーチン関数
+            max_batch_size: 1バッチの最大件数
+            max_wait: 最初のリクエストからバッチを送信するまでの最大待ち時間（秒）
+            key: 呼び出し元のコンテキストでバッチを分けるキーを返す関数（Noneの場合は分けない）
+        """
+        self.batch_func = batch_func
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait)
+        self.key = key
+        self.loop = asyncio.get_running_loop()
+        # キーごとの溜まっているリクエスト・送信タイマー・バッチを実行するコンテキスト
+        self._pending: Dict[Hashable, List[Tuple[Any, asyncio.Future]]] = {}
+        self._timers: Dict[Hashable, asyncio.TimerHandle] = {}
+        self._contexts: Dict[Hashable, contextvars.Context] = {}
+        self._tasks = set()
+        self.batches = 0
+        self.items = 0
+        self.max_observed = 0
+
+    async def submit(self, item: Any) -> Any:
+        """
+        入力をバッチに追加し、その結果を待つ
+
+        Args:
+            item: 入力
+
+        Returns:
+            入力に対応する結果
+        """
+        key = self.key() if self.key is not None else None
+        future = self.loop.create_future()
+        pending = self._pending.setdefault(key, [])
+        if not pending:
+            # バッチはそのキーの最初の呼び出し元のコンテキストで実行する
+            self._contexts[key] = contextvars.copy_context()
+        pending.append((item, future))
+        if len(pending) >= self.max_batch_size:
+            self._flush(key)
+        elif key not in self._timers:
+            self._timers[key] = self.loop.call_later(self.max_wait, self._flush, key)
+        return await future
+
+    def _flush(self, key: Hashable = None):
+        """溜まっているリクエストをバッチとして送信"""
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        context = self._contexts.pop(key, None)
+        # 待機中にキャンセルされたリクエストは送信しない
+        batch = [(item, future) for item, future in self._pending.pop(key, []) if not future.done()]
+        if not batch:
+            return
+
+        self.batches += 1
+        self.items += len(batch)
+        self.max_observed = max(self.max_observed, len(batch))
+        task = self.loop.create_task(self._run(batch), context=context)
+        # 実行中のタスクへの参照を保持（ガベージコレクションで消えないように）
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future]]):
+        """バッチ呼び出しを実行し、結果を各呼び出し元に配る"""
+        try:
+            results = await self.batch_func([item for item, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"バッチの結果件数が一致しません（{len(results)} / {len(batch)}）")
+        except asyncio.CancelledError:
+            # バッチの実行がキャンセルされた場合（イベントループの終了など）は、待機中の呼び出し元もキャンセル
+            for _, future in batch:
+                future.cancel()
+            raise
+        except BaseException as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        バッチの統計情報
+
+        Returns:
+            バッチ数・件数・平均バッチサイズなど
+        """
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": self.items / self.batches if self.batches else None,
+            "max_observed_batch_size": self.max_observed,
+        }
@@ -1,9 +1,15 @@
 """
 Pydantic models for API request/response
 """
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel, Field
 
+from . import config
+
+
+# ユーザーの自由記述1件あたりの最大文字数（単体判定・バッチ判定の各項目で共通）
+MAX_INPUT_LENGTH = 500
+
 
 class Candidate(BaseModel):
     """職業候補モデル"""
@@ -15,7 +21,7 @@ class Candidate(BaseModel):
 
 class ClassifyRequest(BaseModel):
     """職業分類判定リクエストモデル"""
-    user_input: str = Field(..., min_length=1, max_length=500, description="ユーザーの自由記述")
+    user_input: str = Field(..., min_length=1, max_length=MAX_INPUT_LENGTH, description="ユーザーの自由記述")
     
     class Config:
         json_schema_extra = {
@@ -32,6 +38,18 @@ class ClassifyResponse(BaseModel):
     reason: str = Field(..., description="判定理由")
     candidates: List[Candidate] = Field(..., description="検索された候補リスト")
     user_input: str = Field(..., description="ユーザーの入力")
+    decision_path: Optional[str] = Field(
+        None, description="判定経路（llm: Gemini で判定 / fast_path: 高信頼度のため類似度1位を採用 / cache: キャッシュ済み）"
+    )
+    retrieval: Optional[str] = Field(
+        None, description="候補検索の方式（vector / bm25 / hybrid / bm25_fallback: Embedding障害時の縮退運転）"
+    )
+    timings: Optional[Dict[str, float]] = Field(
+        None, description="処理段階ごとの所要時間（ミリ秒。queue_ms / retrieval_ms / generation_ms / total_ms）"
+    )
+    usage: Optional[Dict[str, int]] = Field(
+        None, description="判定で使用したトークン数（prompt_tokens / output_tokens / total_tokens。Gemini で判定した場合のみ）"
+    )
     
     class Config:
         json_schema_extra = {
@@ -47,11 +65,83 @@ class ClassifyResponse(BaseModel):
                         "similarity": 0.89
                     }
                 ],
-                "user_input": "消防車に乗って火を消す仕事"
+                "user_input": "消防車に乗って火を消す仕事",
+                "decision_path": "llm"
+            }
+        }
+
+
+class BatchClassifyRequest(BaseModel):
+    """バッチ判定リクエストモデル"""
+    user_inputs: List[str] = Field(
+        ...,
+        min_length=1,
+        max_length=config.BATCH_MAX_ITEMS,
+        description=f"ユーザーの自由記述のリスト（1件あたり1〜{MAX_INPUT_LENGTH}文字）"
+    )
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "user_inputs": ["消防車に乗って火を消す仕事", "エクセルの集計業務"]
             }
         }
 
 
+class BatchItemResult(BaseModel):
+    """バッチ判定の1件分の結果モデル"""
+    index: int = Field(..., description="入力リスト内の位置")
+    result: Optional[ClassifyResponse] = Field(None, description="判定結果（失敗した場合はnull）")
+    error: Optional[str] = Field(None, description="エラーメッセージ（成功した場合はnull）")
+
+
+class BatchClassifyResponse(BaseModel):
+    """バッチ判定レスポンスモデル"""
+    results: List[BatchItemResult] = Field(..., description="入力と同じ順序の結果リスト")
+    succeeded: int = Field(..., description="成功件数")
+    failed: int = Field(..., description="失敗件数")
+
+
+class StatsResponse(BaseModel):
+    """統計情報レスポンスモデル"""
+    decision_paths: Dict[str, int] = Field(..., description="判定経路ごとの件数")
+    fast_path: Dict[str, Any] = Field(..., description="高速判定の設定")
+    query_embedding_cache: Dict[str, Any] = Field(..., description="クエリEmbeddingキャッシュの状況")
+    result_cache: Optional[Dict[str, Any]] = Field(None, description="分類結果キャッシュの状況")
+    single_flight: Dict[str, int] = Field(..., description="同時リクエストの集約状況（coalesced は省略した判定処理の数）")
+    query_embedding_batcher: Optional[Dict[str, Any]] = Field(None, description="クエリEmbeddingのマイクロバッチの状況")
+    upstream_scheduler: Dict[str, Any] = Field(..., description="上流APIの流量制御の状況（呼び出しの種類ごとの送信レート・待機数）")
+
+
+class CatalogReloadResponse(BaseModel):
+    """職業データ再読み込みレスポンスモデル"""
+    reloaded: bool = Field(..., description="差し替えた場合はtrue（職業データに変更がない場合はfalse）")
+    occupations: int = Field(..., description="再読み込み後の職業数")
+    added: int = Field(..., description="追加された職業数")
+    changed: int = Field(..., description="名称・説明が変更された職業数")
+    removed: int = Field(..., description="削除された職業数")
+    embedded: int = Field(..., description="新たにEmbeddingを作成した件数（変更のない行は再利用）")
+    seconds: float = Field(..., description="所要時間（秒）")
+
+
+class CacheInvalidateResponse(BaseModel):
+    """分類結果キャッシュ無効化レスポンスモデル"""
+    all_versions: bool = Field(..., description="true: 共有層の全バージョンを削除 / false: 現在のバージョンのみ削除")
+    version: Optional[str] = Field(None, description="現在の分類結果のバージョン")
+
+
+class ReadinessResponse(BaseModel):
+    """Readiness レスポンスモデル"""
+    status: str = Field(..., description="warming: 準備中 / ready: 準備完了 / failed: 準備処理の失敗")
+    elapsed_seconds: float = Field(..., description="起動からの経過時間（秒）")
+    ready_seconds: Optional[float] = Field(None, description="起動から準備完了までの時間（秒）")
+    phases: Dict[str, Dict[str, Any]] = Field(
+        ...,
+        description="段階ごとの状態（catalog / embeddings / provider / prewarm。"
+                    "status, elapsed_seconds と、embeddings は done / total の進捗）"
+    )
+
+
 class HealthResponse(BaseModel):
     """ヘルスチェックレスポンスモデル"""
     status: str = Field(..., description="サービスステータス")
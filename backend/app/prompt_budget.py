@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+判定プロンプトの職業説明の要約とトークン数の上限
+
+e-Stat の説明文（convert_estat_data.py で作成）は「職業名。定義。\\nただし、…(1)…(2)…」の形で、
+そのまま5件貼り付けるとプロンプトが長くなります。職業データの読み込み時に1度だけ、
+職業名の重複・定型句を除き、定義と除外（他の職業に分類されるもの）の要点だけを残した
+要約を作成します。判定時は候補の要約を、プロンプトごとのトークン数の上限に収まるよう切り詰めます。
+"""
+
+import re
+from typing import Dict, List, Sequence
+
+
+# 説明文のうち、他の職業への振り分けを示す注記の開始（「ただし、〜は〜に分類される」。lexical_index と共用）
+EXCLUSION_MARKER = re.compile(r"\n\s*ただし[、，]?")
+
+# 除外の箇条書き（(1)　〜）の番号
+_ITEM_NUMBER = re.compile(r"^\s*[（(]\d+[)）]\s*")
+
+# 除外の見出し（「次の仕事に従事するものは含まれない。」など、個々の項目が続くもの）
+_EXCLUSION_HEADING = re.compile(r"^.*次の(?:とおり|仕事|もの).*[。:：]$")
+
+# 定型句の置き換え（どの職業にも現れ、職業の区別に役立たない表現）
+_BOILERPLATE = [
+    (re.compile(r"に従事するもの(?:をいう)?"), ""),
+    (re.compile(r"するものをいう"), "する"),
+    (re.compile(r"ものをいう"), ""),
+    (re.compile(r"は[、，]?(?:それぞれ)?((?:大|中|小)分類[^〔\s]{0,3}〔[^〕]+〕)に分類される"), r"→\1"),
+    (re.compile(r"は[、，]?(?:それぞれ)?該当する項目に分類される"), "→該当項目"),
+    (re.compile(r"は含まれない"), ""),
+    (re.compile(r"も含まれる"), "を含む"),
+]
+
+# 要約の区切り
+EXCLUSION_LABEL = "除外: "
+ITEM_SEPARATOR = "／"
+ELLIPSIS = "…"
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    テキストのトークン数の推定値
+
+    Gemini のトークナイザーは API 呼び出しが必要なため、文字種から推定します。
+    日本語（ASCII 以外）は1文字1トークン、ASCII は4文字1トークンとして数えます
+    （日本語は実際より多めに見積もるため、上限を超えにくい）。
+
+    Args:
+        text: テキスト
+
+    Returns:
+        推定トークン数
+    """
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return (len(text) - ascii_chars) + (ascii_chars + 3) // 4
+
+
+def _compact(text: str) -> str:
+    """定型句の置き換えと空白の整理"""
+    for pattern, replacement in _BOILERPLATE:
+        text = pattern.sub(replacement, text)
+    text = re.sub(r"\s+", " ", text).strip()
+    text = re.sub(r"(?<=[。、，])\s+", "", text)
+    # 置き換えで生じた空の文・重複した句読点を整理
+    text = re.sub(r"[、，]\s*。", "。", text)
+    text = re.sub(r"。{2,}", "。", text)
+    return text.strip(" 、。")
+
+
+def condense_description(name: str, description: str) -> str:
+    """
+    職業説明の要約（定義 + 除外の要点）
+
+    Args:
+        name: 職業名
+        description: 職業データの説明
+
+    Returns:
+        要約した説明（例: 「国又は地方公共団体における…を管理・監督する仕事。除外: 独立行政法人…→中分類〔02及び03〕」）
+    """
+    text = description.strip()
+    # 説明の先頭の「職業名。」は名称と重複するため除く
+    if name and text.startswith(f"{name}。"):
+        text = text[len(name) + 1:]
+
+    parts = EXCLUSION_MARKER.split(text, maxsplit=1)
+    definition = _compact(parts[0])
+
+    exclusions = []
+    if len(parts) > 1:
+        for line in parts[1].splitlines():
+            line = line.strip()
+            if not line or _EXCLUSION_HEADING.match(line):
+                continue
+            item = _compact(_ITEM_NUMBER.sub("", line))
+            if item:
+                exclusions.append(item)
+
+    if not exclusions:
+        return definition
+    return f"{definition}。{EXCLUSION_LABEL}{ITEM_SEPARATOR.join(exclusions)}"
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    推定トークン数が max_tokens 以下になるよう末尾を切り詰める
+
+    Args:
+        text: テキスト
+        max_tokens: トークン数の上限
+
+    Returns:
+        切り詰めたテキスト（切り詰めた場合は末尾に「…」）
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    budget = max_tokens - estimate_tokens(ELLIPSIS)
+    used = 0
+    for end, ch in enumerate(text):
+        used += 1 if ord(ch) >= 128 else 0.25
+        if used > budget:
+            return text[:end].rstrip(" 、。") + ELLIPSIS
+    return text
+
+
+def fit_descriptions(texts: Sequence[str], budget: int) -> List[str]:
+    """
+    複数の説明の合計の推定トークン数を budget 以下に収める
+
+    上限を均等に割り当て、短い説明で余った分は長い説明に回します。
+
+    Args:
+        texts: 候補の説明（類似度順）
+        budget: 合計のトークン数の上限（0以下の場合は無制限）
+
+    Returns:
+        切り詰めた説明のリスト
+    """
+    if budget <= 0 or not texts:
+        return list(texts)
+    tokens = [estimate_tokens(text) for text in texts]
+    if sum(tokens) <= budget:
+        return list(texts)
+
+    # 短い説明から順に確定し、残りの上限を未確定の説明で均等に分ける
+    limits: Dict[int, int] = {}
+    remaining = budget
+    pending = sorted(range(len(texts)), key=lambda i: tokens[i])
+    while pending:
+        share = remaining // len(pending)
+        i = pending[0]
+        if tokens[i] > share:
+            break
+        limits[i] = tokens[i]
+        remaining -= tokens[i]
+        pending.pop(0)
+    for i in pending:
+        limits[i] = remaining // len(pending)
+
+    return [truncate_to_tokens(text, limits[i]) for i, text in enumerate(texts)]
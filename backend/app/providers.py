@@ -0,0 +1,557 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+モデルプロバイダー（Embedding・テキスト生成の呼び出し先）
+
+分類器は Gemini API を直接呼ばず、このモジュールのプロバイダーを経由します。
+    - GeminiProvider:       Google Gemini API（本番）
+    - FakeProvider:         決定的なローカル実装（APIキー不要。遅延・エラーの注入が可能）
+    - RecordReplayProvider: 実際の応答をディスクに記録し、再生する
+
+負荷試験・プロファイリング・CI は MODEL_PROVIDER=fake / replay でオフラインに実行できます。
+"""
+
+import os
+import re
+import json
+import time
+import random
+import asyncio
+import hashlib
+import threading
+from typing import AsyncIterator, Dict, List, Optional
+
+import numpy as np
+
+
+class TransientError(RuntimeError):
+    """一時的なエラー（リトライで回復する可能性があるもの）"""
+
+
+class RateLimitError(TransientError):
+    """レート制限（429 / クォータ超過）"""
+
+
+# リトライ対象の一時的なエラー
+TRANSIENT_ERRORS = (TransientError, ConnectionError, TimeoutError)
+
+
+class GenerationResult:
+    """テキスト生成の結果"""
+
+    def __init__(self, text: str, usage: Optional[Dict[str, int]] = None):
+        """
+        Args:
+            text: 生成されたテキスト
+            usage: トークン使用量（prompt_tokens, output_tokens, total_tokens）。不明な場合はNone
+        """
+        self.text = text
+        self.usage = usage
+
+
+class ModelProvider:
+    """
+    モデルプロバイダーの基底クラス
+
+    embed / generate は同期版、aembed / agenerate / astream は非同期版です。
+    """
+
+    name = "base"
+
+    def __init__(self, embedding_model: str, llm_model: str):
+        """
+        Args:
+            embedding_model: Embeddingモデル名（キャッシュキーに使用）
+            llm_model: 生成モデル名（キャッシュキーに使用）
+        """
+        self.embedding_model = embedding_model
+        self.llm_model = llm_model
+
+    def warm(self):
+        """
+        クライアントの読み込み・初期化を前もって行う（起動直後にバックグラウンドで呼び出す）
+        初期化が不要なプロバイダーでは何もしません。
+        """
+
+    def embed(self, texts: List[str], task_type: Optional[str] = None) -> List[List[float]]:
+        """
+        テキストのEmbedding作成
+
+        Args:
+            texts: テキストのリスト
+            task_type: Embeddingのtask_type（NoneはAPIのデフォルト）
+
+        Returns:
+            入力と同じ順序のEmbedding
+        """
+        raise NotImplementedError
+
+    async def aembed(self, texts: List[str], task_type: Optional[str] = None) -> List[List[float]]:
+        """embed の非同期版"""
+        raise NotImplementedError
+
+    def generate(self, prompt: str, temperature: float = 0.3, json_mode: bool = True) -> GenerationResult:
+        """
+        テキスト生成
+
+        Args:
+            prompt: プロンプト
+            temperature: 生成の温度
+            json_mode: JSON形式で回答させる
+
+        Returns:
+            生成結果
+        """
+        raise NotImplementedError
+
+    async def agenerate(self, prompt: str, temperature: float = 0.3, json_mode: bool = True) -> GenerationResult:
+        """generate の非同期版"""
+        raise NotImplementedError
+
+    async def astream(self, prompt: str, temperature: float = 0.3, json_mode: bool = True) -> AsyncIterator[str]:
+        """
+        テキスト生成（生成されたテキストを届いた順に返す）
+
+        Yields:
+            生成されたテキストの断片
+        """
+        result = await self.agenerate(prompt, temperature=temperature, json_mode=json_mode)
+        yield result.text
+
+
+class GeminiProvider(ModelProvider):
+    """
+    Google Gemini API
+    google.generativeai（読み込みに約1秒）は最初の呼び出し時、または warm() で読み込みます。
+    （Embeddingキャッシュがあれば起動時には読み込まず、起動を待たせない）
+    """
+
+    name = "gemini"
+
+    def __init__(self, api_key: Optional[str], embedding_model: str, llm_model: str):
+        """
+        Args:
+            api_key: Gemini APIキー
+            embedding_model: Embeddingモデル名
+            llm_model: 生成モデル名
+
+        Raises:
+            ValueError: APIキーが設定されていない場合
+        """
+        super().__init__(embedding_model, llm_model)
+        if not api_key or api_key == "your_gemini_api_key_here":
+            raise ValueError(
+                "GEMINI_API_KEYが設定されていません。\n"
+                "環境変数を設定してください。"
+            )
+
+        self.api_key = api_key
+        self._genai = None
+        self._model = None
+        self._client_lock = threading.Lock()
+
+    def warm(self):
+        """google.generativeai の読み込みとクライアントの初期化（初回のみ）"""
+        if self._genai is not None:
+            return
+        with self._client_lock:
+            if self._genai is not None:
+                return
+            import google.generativeai as genai
+            from google.api_core import exceptions as google_exceptions
+
+            genai.configure(api_key=self.api_key)
+            self._model = genai.GenerativeModel(self.llm_model)
+            self._rate_limit_errors = (
+                google_exceptions.TooManyRequests,
+                google_exceptions.ResourceExhausted,
+            )
+            self._transient_errors = (
+                google_exceptions.ServiceUnavailable,
+                google_exceptions.InternalServerError,
+                google_exceptions.DeadlineExceeded,
+            )
+            self._genai = genai
+
+    async def _awarm(self):
+        """warm の非同期版（読み込み中もイベントループをブロックしない）"""
+        if self._genai is None:
+            await asyncio.to_thread(self.warm)
+
+    @property
+    def genai(self):
+        self.warm()
+        return self._genai
+
+    @property
+    def model(self):
+        self.warm()
+        return self._model
+
+    def _translate(self, error: Exception) -> Exception:
+        """Gemini API の例外を共通の例外に変換（一時的なエラー以外はそのまま）"""
+        if self._genai is None:
+            # クライアントの初期化（読み込み）自体の失敗
+            return error
+        if isinstance(error, self._rate_limit_errors):
+            return RateLimitError(str(error))
+        if isinstance(error, self._transient_errors):
+            return TransientError(str(error))
+        return error
+
+    def _generation_config(self, temperature: float, json_mode: bool):
+        return self.genai.GenerationConfig(
+            response_mime_type="application/json" if json_mode else None,
+            temperature=temperature
+        )
+
+    @staticmethod
+    def _usage(response) -> Optional[Dict[str, int]]:
+        """応答の usage_metadata からトークン使用量を取得"""
+        metadata = getattr(response, "usage_metadata", None)
+        if metadata is None:
+            return None
+        return {
+            "prompt_tokens": getattr(metadata, "prompt_token_count", 0) or 0,
+            "output_tokens": getattr(metadata, "candidates_token_count", 0) or 0,
+            "total_tokens": getattr(metadata, "total_token_count", 0) or 0,
+        }
+
+    def embed(self, texts: List[str], task_type: Optional[str] = None) -> List[List[float]]:
+        try:
+            result = self.genai.embed_content(model=self.embedding_model, content=texts, task_type=task_type)
+        except Exception as e:
+            raise self._translate(e) from e
+        return result['embedding']
+
+    async def aembed(self, texts: List[str], task_type: Optional[str] = None) -> List[List[float]]:
+        await self._awarm()
+        try:
+            result = await self.genai.embed_content_async(model=self.embedding_model, content=texts, task_type=task_type)
+        except Exception as e:
+            raise self._translate(e) from e
+        return result['embedding']
+
+    def generate(self, prompt: str, temperature: float = 0.3, json_mode: bool = True) -> GenerationResult:
+        try:
+            response = self.model.generate_content(
+                prompt,
+                generation_config=self._generation_config(temperature, json_mode)
+            )
+        except Exception as e:
+            raise self._translate(e) from e
+        return GenerationResult(response.text, self._usage(response))
+
+    async def agenerate(self, prompt: str, temperature: float = 0.3, json_mode: bool = True) -> GenerationResult:
+        await self._awarm()
+        try:
+            response = await self.model.generate_content_async(
+                prompt,
+                generation_config=self._generation_config(temperature, json_mode)
+            )
+        except Exception as e:
+            raise self._translate(e) from e
+        return GenerationResult(response.text, self._usage(response))
+
+    async def astream(self, prompt: str, temperature: float = 0.3, json_mode: bool = True) -> AsyncIterator[str]:
+        await self._awarm()
+        try:
+            response = await self.model.generate_content_async(
+                prompt,
+                generation_config=self._generation_config(temperature, json_mode),
+                stream=True
+            )
+            async for chunk in response:
+                if chunk.text:
+                    yield chunk.text
+        except Exception as e:
+            raise self._translate(e) from e
+
+
+class FakeProvider(ModelProvider):
+    """
+    決定的なローカル実装（APIキー・ネットワーク不要）
+
+    - Embedding: 文字bigramのハッシュから作成（同じテキストは常に同じベクトル）
+    - 生成: プロンプト内の候補リストから1位の候補を選んだJSONを返す（まとめて判定にも対応）
+    - latency_ms（Embeddingは embedding_latency_ms）で呼び出しごとの遅延、
+      error_rate でレート制限エラーを注入できます
+    """
+
+    name = "fake"
+
+    _CANDIDATE_LINE = re.compile(r"^- コード: (.+?), 名称: (.+?), 説明:", re.MULTILINE)
+    _SECTION = re.compile(r"^■ 項目 (\d+)$", re.MULTILINE)
+
+    def __init__(self, embedding_model: str = "fake/char-bigram", llm_model: str = "fake/first-candidate",
+                 dim: int = 768, latency_ms: float = 0, embedding_latency_ms: Optional[float] = None,
+                 error_rate: float = 0, seed: int = 0):
+        """
+        Args:
+            embedding_model: Embeddingモデル名
+            llm_model: 生成モデル名
+            dim: Embeddingの次元数
+            latency_ms: 生成の呼び出しごとの遅延（ミリ秒）
+            embedding_latency_ms: Embeddingの呼び出しごとの遅延（ミリ秒、Noneの場合は latency_ms と同じ）
+            error_rate: RateLimitError を発生させる確率（0〜1）
+            seed: エラー注入の乱数シード
+        """
+        super().__init__(embedding_model, llm_model)
+        self.dim = dim
+        self.latency = max(0.0, latency_ms) / 1000
+        self.embedding_latency = self.latency if embedding_latency_ms is None else max(0.0, embedding_latency_ms) / 1000
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _maybe_fail(self):
+        """error_rate の確率でレート制限エラーを発生"""
+        if self.error_rate <= 0:
+            return
+        with self._lock:
+            failed = self._random.random() < self.error_rate
+        if failed:
+            raise RateLimitError("429 Resource has been exhausted (FakeProvider によるエラー注入)")
+
+    def _vector(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for i in range(max(1, len(text) - 1)):
+            digest = hashlib.md5(text[i:i + 2].encode("utf-8")).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dim
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm > 0 else vector).tolist()
+
+    def _answer(self, prompt: str) -> str:
+        sections = self._SECTION.split(prompt)
+        if len(sections) > 1:
+            # まとめて判定: ["前置き", "0", "本文", "1", "本文", ...]
+            return json.dumps([
+                {"id": int(number), **self._choose(body)}
+                for number, body in zip(sections[1::2], sections[2::2])
+            ], ensure_ascii=False)
+        return json.dumps(self._choose(prompt), ensure_ascii=False)
+
+    def _choose(self, text: str) -> Dict[str, str]:
+        match = self._CANDIDATE_LINE.search(text)
+        if match is None:
+            return {"code": "", "name": "", "reason": "候補がありません"}
+        code, name = match.group(1), match.group(2)
+        return {"code": code, "name": name, "reason": f"入力内容が「{name}」に最も近いため（FakeProvider）"}
+
+    @staticmethod
+    def _usage(prompt: str, text: str) -> Dict[str, int]:
+        # 日本語はおおむね1〜2文字で1トークンのため、文字数の半分を目安とする
+        prompt_tokens, output_tokens = len(prompt) // 2, len(text) // 2
+        return {"prompt_tokens": prompt_tokens, "output_tokens": output_tokens,
+                "total_tokens": prompt_tokens + output_tokens}
+
+    def embed(self, texts: List[str], task_type: Optional[str] = None) -> List[List[float]]:
+        time.sleep(self.embedding_latency)
+        self._maybe_fail()
+        return [self._vector(text) for text in texts]
+
+    async def aembed(self, texts: List[str], task_type: Optional[str] = None) -> List[List[float]]:
+        await asyncio.sleep(self.embedding_latency)
+        self._maybe_fail()
+        return [self._vector(text) for text in texts]
+
+    def generate(self, prompt: str, temperature: float = 0.3, json_mode: bool = True) -> GenerationResult:
+        time.sleep(self.latency)
+        self._maybe_fail()
+        text = self._answer(prompt)
+        return GenerationResult(text, self._usage(prompt, text))
+
+    async def agenerate(self, prompt: str, temperature: float = 0.3, json_mode: bool = True) -> GenerationResult:
+        await asyncio.sleep(self.latency)
+        self._maybe_fail()
+        text = self._answer(prompt)
+        return GenerationResult(text, self._usage(prompt, text))
+
+    async def astream(self, prompt: str, temperature: float = 0.3, json_mode: bool = True) -> AsyncIterator[str]:
+        # 遅延の半分で最初の断片、残りを断片ごとに分けて返す
+        await asyncio.sleep(self.latency / 2)
+        self._maybe_fail()
+        text = self._answer(prompt)
+        chunks = [text[i:i + 16] for i in range(0, len(text), 16)]
+        for chunk in chunks:
+            yield chunk
+            await asyncio.sleep(self.latency / 2 / len(chunks))
+
+
+class RecordReplayProvider(ModelProvider):
+    """
+    応答の記録・再生
+
+    mode="record" の場合は内側のプロバイダーを呼び出し、応答を record_dir に保存します
+    （保存済みの応答があればそれを返します）。
+    mode="replay" の場合は保存済みの応答のみを返し、記録がない呼び出しはエラーにします。
+    Embeddingはテキスト単位で記録するため、バッチの組み合わせが変わっても再生できます。
+    """
+
+    name = "record_replay"
+
+    def __init__(self, record_dir: str, mode: str = "replay", inner: Optional[ModelProvider] = None,
+                 embedding_model: Optional[str] = None, llm_model: Optional[str] = None):
+        """
+        Args:
+            record_dir: 応答の保存先ディレクトリ
+            mode: "record" / "replay"
+            inner: 記録時に呼び出すプロバイダー（mode="record" の場合は必須）
+            embedding_model: Embeddingモデル名（Noneの場合は inner のもの）
+            llm_model: 生成モデル名（Noneの場合は inner のもの）
+        """
+        if mode not in ("record", "replay"):
+            raise ValueError(f"不明なモードです: {mode}（record / replay）")
+        if mode == "record" and inner is None:
+            raise ValueError("記録モードには呼び出し先のプロバイダーが必要です")
+        super().__init__(
+            embedding_model or inner.embedding_model,
+            llm_model or inner.llm_model
+        )
+        self.record_dir = record_dir
+        self.mode = mode
+        self.inner = inner
+        self.hits = 0
+        self.recorded = 0
+        os.makedirs(record_dir, exist_ok=True)
+
+    def warm(self):
+        if self.inner is not None:
+            self.inner.warm()
+
+    def _key(self, kind: str, **request) -> str:
+        source = json.dumps({"kind": kind, **request}, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.record_dir, key[:2], f"{key}.json")
+
+    def _load(self, key: str) -> Optional[Dict]:
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                record = json.load(f)
+        except FileNotFoundError:
+            return None
+        self.hits += 1
+        return record
+
+    def _save(self, key: str, record: Dict):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        self.recorded += 1
+
+    def _missing(self, description: str):
+        return KeyError(f"記録されていない呼び出しです（{description}）。MODEL_PROVIDER=record で記録してください")
+
+    def _embedding_keys(self, texts: List[str], task_type: Optional[str]) -> List[str]:
+        return [
+            self._key("embed", model=self.embedding_model, task_type=task_type, text=text)
+            for text in texts
+        ]
+
+    def _generation_key(self, prompt: str, temperature: float, json_mode: bool) -> str:
+        return self._key("generate", model=self.llm_model, temperature=temperature,
+                         json_mode=json_mode, prompt=prompt)
+
+    def embed(self, texts: List[str], task_type: Optional[str] = None) -> List[List[float]]:
+        keys = self._embedding_keys(texts, task_type)
+        records = [self._load(key) for key in keys]
+        missing = [i for i, record in enumerate(records) if record is None]
+        if missing:
+            if self.mode == "replay":
+                raise self._missing(f"Embedding {len(missing)}件")
+            for i, values in zip(missing, self.inner.embed([texts[i] for i in missing], task_type)):
+                records[i] = {"embedding": list(values)}
+                self._save(keys[i], records[i])
+        return [record["embedding"] for record in records]
+
+    async def aembed(self, texts: List[str], task_type: Optional[str] = None) -> List[List[float]]:
+        keys = self._embedding_keys(texts, task_type)
+        records = [self._load(key) for key in keys]
+        missing = [i for i, record in enumerate(records) if record is None]
+        if missing:
+            if self.mode == "replay":
+                raise self._missing(f"Embedding {len(missing)}件")
+            for i, values in zip(missing, await self.inner.aembed([texts[i] for i in missing], task_type)):
+                records[i] = {"embedding": list(values)}
+                self._save(keys[i], records[i])
+        return [record["embedding"] for record in records]
+
+    def generate(self, prompt: str, temperature: float = 0.3, json_mode: bool = True) -> GenerationResult:
+        key = self._generation_key(prompt, temperature, json_mode)
+        record = self._load(key)
+        if record is None:
+            if self.mode == "replay":
+                raise self._missing("生成")
+            result = self.inner.generate(prompt, temperature=temperature, json_mode=json_mode)
+            record = {"text": result.text, "usage": result.usage}
+            self._save(key, record)
+        return GenerationResult(record["text"], record.get("usage"))
+
+    async def agenerate(self, prompt: str, temperature: float = 0.3, json_mode: bool = True) -> GenerationResult:
+        key = self._generation_key(prompt, temperature, json_mode)
+        record = self._load(key)
+        if record is None:
+            if self.mode == "replay":
+                raise self._missing("生成")
+            result = await self.inner.agenerate(prompt, temperature=temperature, json_mode=json_mode)
+            record = {"text": result.text, "usage": result.usage}
+            self._save(key, record)
+        return GenerationResult(record["text"], record.get("usage"))
+
+    async def astream(self, prompt: str, temperature: float = 0.3, json_mode: bool = True) -> AsyncIterator[str]:
+        key = self._generation_key(prompt, temperature, json_mode)
+        record = self._load(key)
+        if record is not None:
+            yield record["text"]
+            return
+        if self.mode == "replay":
+            raise self._missing("生成")
+
+        # 記録時は内側のストリームをそのまま返し、完了後に全文を保存
+        chunks = []
+        async for chunk in self.inner.astream(prompt, temperature=temperature, json_mode=json_mode):
+            chunks.append(chunk)
+            yield chunk
+        self._save(key, {"text": "".join(chunks), "usage": None})
+
+
+def create_provider(name: str, api_key: Optional[str], embedding_model: str, llm_model: str,
+                    record_dir: Optional[str] = None, fake_latency_ms: float = 0,
+                    fake_embedding_latency_ms: Optional[float] = None,
+                    fake_error_rate: float = 0, fake_dim: int = 768) -> ModelProvider:
+    """
+    設定からモデルプロバイダーを作成
+
+    Args:
+        name: "gemini" / "fake" / "record" / "replay"
+        api_key: Gemini APIキー（gemini / record の場合）
+        embedding_model: Embeddingモデル名（gemini / record / replay の場合）
+        llm_model: 生成モデル名（gemini / record / replay の場合）
+        record_dir: 応答の保存先（record / replay の場合）
+        fake_latency_ms: fake の生成の呼び出しごとの遅延（ミリ秒）
+        fake_embedding_latency_ms: fake のEmbeddingの呼び出しごとの遅延（ミリ秒、Noneの場合は fake_latency_ms と同じ）
+        fake_error_rate: fake のエラー注入の確率
+        fake_dim: fake のEmbeddingの次元数
+
+    Returns:
+        モデルプロバイダー
+    """
+    name = (name or "gemini").lower()
+    if name == "gemini":
+        return GeminiProvider(api_key, embedding_model, llm_model)
+    if name == "fake":
+        return FakeProvider(dim=fake_dim, latency_ms=fake_latency_ms,
+                            embedding_latency_ms=fake_embedding_latency_ms, error_rate=fake_error_rate)
+    if name == "record":
+        return RecordReplayProvider(record_dir, mode="record",
+                                    inner=GeminiProvider(api_key, embedding_model, llm_model))
+    if name == "replay":
+        return RecordReplayProvider(record_dir, mode="replay",
+                                    embedding_model=embedding_model, llm_model=llm_model)
+    raise ValueError(f"不明な MODEL_PROVIDER です: {name}（gemini / fake / record / replay）")
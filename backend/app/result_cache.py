@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分類結果のキャッシュ
+
+同じ入力に対する分類結果を再利用し、Embedding・Gemini の呼び出しを省略します。
+2層構成:
+    - インプロセス層: TTLCache（Pod内）
+    - 共有層: SQLite（単一ノード）または Redis プロトコル対応サーバー（複数レプリカで共有）
+
+キャッシュキーには職業データ・モデルのバージョンが含まれるため、
+職業データが変わると古い結果は参照されません（共有層の古い結果は他のレプリカが使い終わった後、有効期限で消えます）。
+invalidate() で明示的に削除することもできます。
+"""
+
+import json
+import time
+import socket
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, Optional
+from urllib.parse import urlparse, unquote
+
+from .caches import TTLCache, normalize_input
+
+
+class SQLiteResultStore:
+    """
+    SQLite ファイルによる共有キャッシュ（同一ノード上のプロセス間で共有）
+    件数上限を超えた場合は最終参照が古いものから削除します。
+    """
+
+    def __init__(self, path: str, max_entries: int = 100000, ttl: float = 0):
+        """
+        Args:
+            path: SQLite ファイルのパス
+            max_entries: 最大件数
+            ttl: 有効期限（秒）。0以下の場合は無期限
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_accessed_at ON results (accessed_at)")
+        self._writes = 0
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE results SET accessed_at = ? WHERE key = ?", (now, key))
+            return value
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        expires_at = now + self.ttl if self.ttl > 0 else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, expires_at, now)
+            )
+            # 件数上限のチェックは一定回数ごとに行う
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._evict(now)
+
+    def _evict(self, now: float):
+        """期限切れ・上限超過分の削除"""
+        self._conn.execute("DELETE FROM results WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM results WHERE key IN ("
+                " SELECT key FROM results ORDER BY accessed_at ASC LIMIT ?)",
+                (count - self.max_entries,)
+            )
+
+    def clear(self, prefix: str = ""):
+        """prefix で始まるキーを削除（空文字の場合は全件）"""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM results WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()
+        return count
+
+
+class RedisResultStore:
+    """
+    Redis プロトコル（RESP）による共有キャッシュ（複数レプリカで共有）
+    追加の依存パッケージなしで、GET / SET EX / SCAN / DEL のみを使用します。
+    件数の上限はサーバー側の maxmemory-policy（allkeys-lru など）に任せます。
+    """
+
+    def __init__(self, url: str, ttl: float = 0, timeout: float = 1.0):
+        """
+        Args:
+            url: 接続先（redis://[:password@]host:port/db）
+            ttl: 有効期限（秒）。0以下の場合は無期限
+            timeout: ソケットのタイムアウト（秒）
+        """
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.ttl = ttl
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._sock = None
+        self._reader = None
+
+    def _connect(self):
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._reader = self._sock.makefile("rb")
+        if self.password:
+            self._command_unlocked("AUTH", self.password)
+        if self.db:
+            self._command_unlocked("SELECT", str(self.db))
+
+    def _close(self):
+        try:
+            if self._sock is not None:
+                self._sock.close()
+        finally:
+            self._sock = None
+            self._reader = None
+
+    def _command(self, *args):
+        """コマンドの送信（接続エラー時は1回だけ再接続）"""
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    return self._command_unlocked(*args)
+                except (OSError, ConnectionError):
+                    self._close()
+                    if attempt == 1:
+                        raise
+
+    def _command_unlocked(self, *args):
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+            parts.append(f"${len(data)}\r\n".encode() + data + b"\r\n")
+        self._sock.sendall(b"".join(parts))
+        return self._read_reply()
+
+    def _read_reply(self):
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("Redis との接続が切断されました")
+        prefix, payload = line[:1], line[1:-2]
+        if prefix == b"+":
+            return payload.decode()
+        if prefix == b"-":
+            raise RuntimeError(f"Redis エラー: {payload.decode()}")
+        if prefix == b":":
+            return int(payload)
+        if prefix == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = self._reader.read(length + 2)
+            return data[:-2]
+        if prefix == b"*":
+            length = int(payload)
+            if length < 0:
+                return None
+            return [self._read_reply() for _ in range(length)]
+        raise ConnectionError(f"不正な Redis 応答です: {line!r}")
+
+    def get(self, key: str) -> Optional[str]:
+        value = self._command("GET", key)
+        return value.decode("utf-8") if value is not None else None
+
+    def set(self, key: str, value: str):
+        if self.ttl > 0:
+            self._command("SET", key, value, "EX", str(int(self.ttl)))
+        else:
+            self._command("SET", key, value)
+
+    def clear(self, prefix: str = ""):
+        """prefix で始まるキーを削除（SCAN で走査）"""
+        cursor = "0"
+        while True:
+            cursor, keys = self._command("SCAN", cursor, "MATCH", f"{prefix}*", "COUNT", "500")
+            cursor = cursor.decode() if isinstance(cursor, bytes) else str(cursor)
+            if keys:
+                self._command("DEL", *keys)
+            if cursor == "0":
+                break
+
+    def __len__(self) -> int:
+        return self._command("DBSIZE")
+
+
+class ResultCache:
+    """
+    分類結果の2層キャッシュ（インプロセス層 + 共有層）
+    共有層の障害は分類処理を止めないよう、警告を出してキャッシュミスとして扱います。
+    """
+
+    NAMESPACE = "occupation:result"
+
+    def __init__(self, local: TTLCache, shared=None):
+        """
+        Args:
+            local: インプロセス層のキャッシュ
+            shared: 共有層（SQLiteResultStore / RedisResultStore、Noneの場合は共有しない）
+        """
+        self.local = local
+        self.shared = shared
+        self.version = None
+        self.shared_hits = 0
+        self.shared_errors = 0
+
+    def set_version(self, version: str):
+        """
+        職業データ・モデルのバージョンを設定
+        （変更された場合はインプロセス層のみ削除。共有層の旧バージョンの結果は、ローリング更新中・
+        再読み込み中の他のレプリカがまだ参照しているため削除せず、有効期限に任せる）
+        """
+        if self.version is not None and version != self.version:
+            self.local.clear()
+        self.version = version
+
+    def key_for(self, user_input: str) -> str:
+        """正規化した入力とバージョンからキャッシュキーを作成"""
+        digest = hashlib.sha256(normalize_input(user_input).encode("utf-8")).hexdigest()
+        return f"{self.NAMESPACE}:{self.version}:{digest}"
+
+    def get(self, user_input: str) -> Optional[Dict]:
+        """
+        キャッシュ済みの分類結果を取得（インプロセス層 → 共有層の順に参照）
+        """
+        if self.version is None:
+            return None
+
+        key = self.key_for(user_input)
+        result = self.local.get(key)
+        if result is not None:
+            return json.loads(result)
+
+        if self.shared is not None:
+            try:
+                result = self.shared.get(key)
+            except Exception as e:
+                self.shared_errors += 1
+                print(f"⚠️ 共有キャッシュの参照に失敗しました（無視して続行）: {e}")
+                return None
+            if result is not None:
+                self.shared_hits += 1
+                self.local.set(key, result)
+                return json.loads(result)
+        return None
+
+    def set(self, user_input: str, result: Dict):
+        """分類結果を両方の層に保存"""
+        if self.version is None:
+            return
+
+        key = self.key_for(user_input)
+        value = json.dumps(result, ensure_ascii=False)
+        self.local.set(key, value)
+
+        if self.shared is not None:
+            try:
+                self.shared.set(key, value)
+            except Exception as e:
+                self.shared_errors += 1
+                print(f"⚠️ 共有キャッシュへの保存に失敗しました（無視して続行）: {e}")
+
+    def invalidate(self, all_versions: bool = True):
+        """
+        キャッシュの無効化（職業データ更新時などに呼び出す）
+
+        Args:
+            all_versions: Trueの場合は全バージョン、Falseの場合は現在のバージョンのみ削除
+        """
+        self.local.clear()
+        if self.shared is not None:
+            prefix = f"{self.NAMESPACE}:" if all_versions else f"{self.NAMESPACE}:{self.version}:"
+            try:
+                self.shared.clear(prefix)
+            except Exception as e:
+                self.shared_errors += 1
+                print(f"⚠️ 共有キャッシュの削除に失敗しました: {e}")
+
+    def stats(self) -> Dict:
+        """キャッシュの統計情報"""
+        stats = {"version": self.version, "local": self.local.stats()}
+        if self.shared is not None:
+            stats["shared"] = {
+                "backend": type(self.shared).__name__,
+                "hits": self.shared_hits,
+                "errors": self.shared_errors,
+            }
+        return stats
+
+
+def create_result_cache(backend: str, size: int, ttl: float,
+                        sqlite_path: str = None, redis_url: str = None,
+                        shared_max_entries: int = 100000) -> Optional[ResultCache]:
+    """
+    設定から分類結果キャッシュを作成
+
+    Args:
+        backend: "none" / "memory" / "sqlite" / "redis"
+        size: インプロセス層の最大件数
+        ttl: 有効期限（秒、0で無期限）
+        sqlite_path: SQLite ファイルのパス（backend="sqlite" の場合）
+        redis_url: Redis の接続先（backend="redis" の場合）
+        shared_max_entries: SQLite 共有層の最大件数
+
+    Returns:
+        ResultCache（backend="none" の場合はNone）
+    """
+    backend = (backend or "memory").lower()
+    if backend == "none":
+        return None
+
+    local = TTLCache(maxsize=size, ttl=ttl)
+    if backend == "memory":
+        return ResultCache(local)
+    if backend == "sqlite":
+        return ResultCache(local, SQLiteResultStore(sqlite_path, max_entries=shared_max_entries, ttl=ttl))
+    if backend == "redis":
+        return ResultCache(local, RedisResultStore(redis_url, ttl=ttl))
+    raise ValueError(f"不明な RESULT_CACHE_BACKEND です: {backend}（none / memory / sqlite / redis）")
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+上流API（Embedding・判定）の呼び出しの流量制御
+
+Embedding・判定の呼び出しを種類ごとのトークンバケットで制限し、
+APIのクォータ（1分あたりのリクエスト数）を超えないように送信します。
+
+- 優先度は interactive（/api/classify などの対話的なリクエスト）と bulk（バッチ判定・職業データの
+  Embedding作成・起動時の事前作成）の2種類で、呼び出し元のコンテキスト（contextvars）で指定します。
+  bulk は interactive の待ちがない場合だけ、バースト分の一部（BULK_RESERVED_RATIO）を残して送信するため、
+  バッチ判定は interactive が使わなかった残りの枠で進みます。
+- レート制限エラー（429）を受けた場合は送信レートを半分に下げ（下限は設定値の UPSTREAM_MIN_RATE_RATIO 倍）、
+  少しの間すべての送信を止めます。その後は成功した呼び出しに応じて UPSTREAM_RATE_RECOVERY_SECONDS かけて
+  設定値まで戻します。1分あたりのリクエスト数が未設定（0）の場合も、429 を受けた後の一時停止は行います。
+
+制限はプロセスごとです（複数ワーカーで起動する場合は、ワーカー数で割った値を設定してください）。
+"""
+
+import time
+import asyncio
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from . import config, metrics
+from .providers import GenerationResult, ModelProvider, RateLimitError
+
+
+# 優先度（先に並べたものを優先）
+PRIORITIES = ("interactive", "bulk")
+
+# 429 を受けた後の一時停止の初期値・上限（秒。連続する場合は倍にする）
+PAUSE_INITIAL_SECONDS = 1.0
+PAUSE_MAX_SECONDS = 30.0
+
+# 待機中に状態（一時停止・レートの変更）を確認し直す間隔の上限（秒）
+MAX_SLEEP_SECONDS = 0.5
+
+_priority: contextvars.ContextVar = contextvars.ContextVar("upstream_priority", default="interactive")
+
+
+def current_priority() -> str:
+    """現在のコンテキストの優先度"""
+    return _priority.get()
+
+
+@contextmanager
+def priority(name: str):
+    """
+    このブロック内の上流APIの呼び出しの優先度を指定するコンテキストマネージャ
+
+    asyncio のタスク・asyncio.to_thread にはコンテキストが引き継がれますが、
+    ThreadPoolExecutor に渡す関数には引き継がれないため、contextvars.copy_context().run で渡してください。
+
+    Args:
+        name: interactive / bulk
+    """
+    if name not in PRIORITIES:
+        raise ValueError(f"不明な優先度です: {name}（{' / '.join(PRIORITIES)}）")
+    token = _priority.set(name)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class TokenBucket:
+    """
+    1種類の呼び出し（embed / generate）のトークンバケット（スレッド・イベントループの両方から利用）
+    """
+
+    def __init__(self, operation: str, requests_per_minute: float, burst: int = 0,
+                 bulk_reserved_ratio: float = 0.2, min_rate_ratio: float = 0.1,
+                 recovery_seconds: float = 60.0, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            operation: 呼び出しの種類（メトリクスのラベル）
+            requests_per_minute: 1分あたりのリクエスト数の上限（0で無制限。429 の後の一時停止のみ行う）
+            burst: 一度に送信できるリクエスト数（0の場合は1秒分）
+            bulk_reserved_ratio: バーストのうち interactive のために残しておく割合
+            min_rate_ratio: 429 を受けた場合に下げる送信レートの下限（設定値に対する割合）
+            recovery_seconds: 下げた送信レートを設定値まで戻すのにかける時間（秒）
+            clock: 現在時刻（秒）を返す関数（テストでは手動で進める時計を渡す）
+        """
+        self.operation = operation
+        self.clock = clock
+        self.limit = max(0.0, requests_per_minute) / 60
+        self.rate = self.limit
+        self.min_rate = self.limit * min(1.0, max(0.01, min_rate_ratio))
+        self.recovery_seconds = max(1.0, recovery_seconds)
+        self.capacity = float(burst) if burst > 0 else max(1.0, self.limit)
+        self.reserved = self.capacity * min(1.0, max(0.0, bulk_reserved_ratio))
+        self.tokens = self.capacity
+        self.waiting = {name: 0 for name in PRIORITIES}
+        self.rate_limited = 0
+        self._updated = clock()
+        self._recovered = self._updated
+        self._paused_until = 0.0
+        self._pause = 0.0
+        self._lock = threading.Lock()
+        self._publish_rate()
+        for name in PRIORITIES:
+            metrics.UPSTREAM_QUEUE_DEPTH.labels(operation, name).set(0)
+
+    @property
+    def unlimited(self) -> bool:
+        return self.limit <= 0
+
+    def _publish_rate(self):
+        metrics.UPSTREAM_RATE_LIMIT.labels(self.operation).set(self.rate * 60)
+
+    def _refill(self, now: float):
+        # 一時停止中（_updated が停止の終了時刻）は補充しない
+        if now <= self._updated:
+            return
+        if not self.unlimited:
+            self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, priority_name: str) -> float:
+        """
+        トークンの取得を試みる
+
+        Args:
+            priority_name: 優先度
+
+        Returns:
+            取得できた場合は0、できない場合は再度試すまでの待ち時間（秒）
+        """
+        with self._lock:
+            now = self.clock()
+            if now < self._paused_until:
+                return self._paused_until - now
+            if self.unlimited:
+                return 0.0
+            self._refill(now)
+            if priority_name == "interactive":
+                needed = 1.0
+            elif self.waiting["interactive"]:
+                # interactive の待ちがある間は送信しない
+                return 1.0 / self.rate
+            else:
+                needed = 1.0 + self.reserved
+            if self.tokens >= needed:
+                self.tokens -= 1.0
+                return 0.0
+            return (needed - self.tokens) / self.rate
+
+    @contextmanager
+    def queued(self, priority_name: str):
+        """待機中の呼び出し数（キューの長さ）を数えるコンテキストマネージャ"""
+        with self._lock:
+            self.waiting[priority_name] += 1
+        metrics.UPSTREAM_QUEUE_DEPTH.labels(self.operation, priority_name).inc()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.waiting[priority_name] -= 1
+            metrics.UPSTREAM_QUEUE_DEPTH.labels(self.operation, priority_name).dec()
+
+    def on_success(self):
+        """呼び出しの成功（下げた送信レートを少しずつ戻す）"""
+        with self._lock:
+            now = self.clock()
+            self._pause = 0.0
+            if self.unlimited or self.rate >= self.limit or now <= self._recovered:
+                return
+            self._refill(now)
+            self.rate = min(self.limit, self.rate + self.limit * (now - self._recovered) / self.recovery_seconds)
+            self._recovered = now
+        self._publish_rate()
+
+    def on_rate_limited(self):
+        """レート制限エラー（429）を受けた場合の送信レートの引き下げ・一時停止"""
+        with self._lock:
+            now = self.clock()
+            self.rate_limited += 1
+            # 送信済みの呼び出しがまとめて 429 を受けた場合は、1回分として扱う
+            if now < self._paused_until:
+                return
+            self._pause = min(PAUSE_MAX_SECONDS, self._pause * 2 or PAUSE_INITIAL_SECONDS)
+            self._paused_until = now + self._pause
+            if not self.unlimited:
+                self._refill(now)
+                self.rate = max(self.min_rate, self.rate / 2)
+                self.tokens = 0.0
+                self._updated = self._paused_until
+                self._recovered = self._paused_until
+        self._publish_rate()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "requests_per_minute": round(self.limit * 60, 3),
+                "current_requests_per_minute": round(self.rate * 60, 3),
+                "tokens": round(self.tokens, 3),
+                "waiting": dict(self.waiting),
+                "rate_limited": self.rate_limited,
+                "paused_seconds": round(max(0.0, self._paused_until - self.clock()), 3),
+            }
+
+
+class UpstreamScheduler:
+    """
+    上流APIの呼び出しの順番待ち（呼び出しの種類ごとのトークンバケット）
+    """
+
+    def __init__(self, buckets: Dict[str, TokenBucket], clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep,
+                 async_sleep: Callable[[float], Awaitable[None]] = asyncio.sleep):
+        """
+        Args:
+            buckets: 呼び出しの種類（embed / generate）ごとのトークンバケット
+            clock: 待ち時間の計測に使う現在時刻（秒）を返す関数（トークンバケットと同じ時計を渡す）
+            sleep: acquire の待機に使う関数
+            async_sleep: aacquire の待機に使うコルーチン関数
+        """
+        self.buckets = buckets
+        self.clock = clock
+        self.sleep = sleep
+        self.async_sleep = async_sleep
+
+    @classmethod
+    def from_config(cls) -> "UpstreamScheduler":
+        """環境変数の設定から作成"""
+        options = dict(
+            burst=config.UPSTREAM_BURST,
+            bulk_reserved_ratio=config.BULK_RESERVED_RATIO,
+            min_rate_ratio=config.UPSTREAM_MIN_RATE_RATIO,
+            recovery_seconds=config.UPSTREAM_RATE_RECOVERY_SECONDS,
+        )
+        return cls({
+            "embed": TokenBucket("embed", config.EMBED_REQUESTS_PER_MINUTE, **options),
+            "generate": TokenBucket("generate", config.GENERATE_REQUESTS_PER_MINUTE, **options),
+        })
+
+    def acquire(self, operation: str):
+        """
+        送信できるまで待機（スレッドから呼び出す）
+
+        Args:
+            operation: embed / generate
+        """
+        bucket = self.buckets[operation]
+        priority_name = current_priority()
+        wait = bucket.try_acquire(priority_name)
+        if wait <= 0:
+            metrics.UPSTREAM_QUEUE_SECONDS.labels(operation, priority_name).observe(0)
+            return
+        started = self.clock()
+        with bucket.queued(priority_name):
+            while wait > 0:
+                self.sleep(min(wait, MAX_SLEEP_SECONDS))
+                wait = bucket.try_acquire(priority_name)
+        metrics.UPSTREAM_QUEUE_SECONDS.labels(operation, priority_name).observe(self.clock() - started)
+
+    async def aacquire(self, operation: str):
+        """acquire の非同期版（待機中もイベントループを止めない）"""
+        bucket = self.buckets[operation]
+        priority_name = current_priority()
+        wait = bucket.try_acquire(priority_name)
+        if wait <= 0:
+            metrics.UPSTREAM_QUEUE_SECONDS.labels(operation, priority_name).observe(0)
+            return
+        started = self.clock()
+        with bucket.queued(priority_name):
+            while wait > 0:
+                await self.async_sleep(min(wait, MAX_SLEEP_SECONDS))
+                wait = bucket.try_acquire(priority_name)
+        metrics.UPSTREAM_QUEUE_SECONDS.labels(operation, priority_name).observe(self.clock() - started)
+
+    def release(self, operation: str, error: Optional[Exception] = None):
+        """
+        呼び出し結果の反映（429 の場合は送信レートを下げる）
+
+        Args:
+            operation: embed / generate
+            error: 呼び出しのエラー（成功した場合はNone）
+        """
+        bucket = self.buckets[operation]
+        if isinstance(error, RateLimitError):
+            bucket.on_rate_limited()
+        elif error is None:
+            bucket.on_success()
+
+    def stats(self) -> Dict:
+        """呼び出しの種類ごとの設定・現在の送信レート・待機数"""
+        return {operation: bucket.stats() for operation, bucket in self.buckets.items()}
+
+
+class ScheduledProvider(ModelProvider):
+    """
+    上流APIの呼び出しを UpstreamScheduler の順番待ちを経由して送信するラッパー
+    """
+
+    def __init__(self, inner: ModelProvider, scheduler: UpstreamScheduler = None):
+        """
+        Args:
+            inner: 実際に呼び出すプロバイダー
+            scheduler: 順番待ち（Noneの場合は環境変数の設定から作成）
+        """
+        super().__init__(inner.embedding_model, inner.llm_model)
+        self.name = inner.name
+        self.inner = inner
+        self.scheduler = scheduler or UpstreamScheduler.from_config()
+
+    def __getattr__(self, name):
+        # プロバイダー固有の属性（FakeProvider の設定など）は内側のプロバイダーを参照
+        if name == "inner":
+            raise AttributeError(name)
+        return getattr(self.inner, name)
+
+    def warm(self):
+        self.inner.warm()
+
+    def _call(self, operation: str, func, *args, **kwargs):
+        self.scheduler.acquire(operation)
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            self.scheduler.release(operation, e)
+            raise
+        self.scheduler.release(operation)
+        return result
+
+    async def _acall(self, operation: str, func, *args, **kwargs):
+        await self.scheduler.aacquire(operation)
+        try:
+            result = await func(*args, **kwargs)
+        except Exception as e:
+            self.scheduler.release(operation, e)
+            raise
+        self.scheduler.release(operation)
+        return result
+
+    def embed(self, texts: List[str], task_type: Optional[str] = None) -> List[List[float]]:
+        return self._call("embed", self.inner.embed, texts, task_type=task_type)
+
+    async def aembed(self, texts: List[str], task_type: Optional[str] = None) -> List[List[float]]:
+        return await self._acall("embed", self.inner.aembed, texts, task_type=task_type)
+
+    def generate(self, prompt: str, temperature: float = 0.3, json_mode: bool = True) -> GenerationResult:
+        return self._call("generate", self.inner.generate, prompt, temperature=temperature, json_mode=json_mode)
+
+    async def agenerate(self, prompt: str, temperature: float = 0.3, json_mode: bool = True) -> GenerationResult:
+        return await self._acall("generate", self.inner.agenerate, prompt,
+                                 temperature=temperature, json_mode=json_mode)
+
+    async def astream(self, prompt: str, temperature: float = 0.3, json_mode: bool = True) -> AsyncIterator[str]:
+        await self.scheduler.aacquire("generate")
+        try:
+            async for chunk in self.inner.astream(prompt, temperature=temperature, json_mode=json_mode):
+                yield chunk
+        except Exception as e:
+            self.scheduler.release("generate", e)
+            raise
+        self.scheduler.release("generate")
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+複数ワーカーでの起動（ワーカー間で検索インデックスを共有）
+
+uvicorn を --workers で起動すると、各ワーカーが職業データとEmbedding行列を個別に読み込みます
+（キャッシュがない場合は各ワーカーが全件のEmbeddingを作成します）。
+このランチャーは別プロセスで1度だけEmbeddingを作成（またはキャッシュから読み込み）して
+共有インデックス（shared_index）に書き出します。
+各ワーカーは共有インデックスをメモリマップするため、ワーカー数を増やしても行列のメモリは増えません。
+
+ワーカーは共有インデックスの作成を待たずに起動し、ポートを開いてから（/api/health/live は 200）
+起動時の準備処理の中で共有インデックスが書き出されるのを待って接続します（/api/health/ready は 503 のまま）。
+作成に失敗した場合・--prepare-timeout を過ぎた場合は、各ワーカーが個別に読み込みます。
+
+使い方（backend ディレクトリで実行）:
+    python -m app.serve --workers 4
+    WEB_CONCURRENCY=4 python -m app.serve --host 0.0.0.0 --port 8000
+
+    # gunicorn で起動する場合は、共有インデックスだけを作成してから起動
+    SHARED_INDEX_PATH=/dev/shm/occupation-index.npy python -m app.serve --prepare-only
+    SHARED_INDEX_PATH=/dev/shm/occupation-index.npy \\
+        gunicorn app.main:app -k uvicorn.workers.UvicornWorker -w 4 -b 0.0.0.0:8000
+"""
+
+import os
+import argparse
+import threading
+import multiprocessing
+
+from . import config, shared_index
+
+
+def prepare(path: str):
+    """
+    共有インデックスの作成（ワーカーの起動前に別プロセスで実行）
+
+    Embeddingの作成・キャッシュの読み込みは別プロセスで行い、
+    ワーカーを管理する親プロセスには職業データ・Embedding行列を残しません。
+
+    Args:
+        path: 共有インデックスのパス
+    """
+    from .classifier import OccupationClassifier
+
+    classifier = OccupationClassifier(csv_path=config.OCCUPATION_CSV_PATH)
+    classifier.create_embeddings()
+    if not classifier.publish_shared_index(path):
+        print("RETRIEVAL_BACKEND=bm25 のため、共有インデックスは作成しません")
+
+
+def start_prepare(path: str) -> multiprocessing.Process:
+    """
+    別プロセスで共有インデックスの作成を開始（完了を待たない）
+
+    プロセスが共有インデックスを書き出さずに終了した場合は、待機中のワーカーが
+    個別の読み込みに切り替えられるよう作成できなかったことを記録します。
+
+    Args:
+        path: 共有インデックスのパス
+
+    Returns:
+        作成中のプロセス
+    """
+    process = multiprocessing.get_context("spawn").Process(target=prepare, args=(path,), daemon=True)
+    process.start()
+
+    def watch():
+        process.join()
+        if os.path.exists(shared_index.metadata_path(path)):
+            print(f"✅ 共有インデックスを作成しました: {path}")
+            return
+        if process.exitcode != 0:
+            reason = f"共有インデックスの作成に失敗しました（終了コード {process.exitcode}）"
+            print(f"⚠️  {reason}。各ワーカーが個別に読み込みます")
+        else:
+            reason = "共有インデックスを作成しませんでした"
+        shared_index.mark_failed(path, reason)
+
+    threading.Thread(target=watch, name="shared-index-prepare", daemon=True).start()
+    return process
+
+
+def prepare_in_subprocess(path: str) -> bool:
+    """
+    別プロセスで共有インデックスを作成
+
+    Returns:
+        共有インデックスを作成した場合はTrue
+
+    Raises:
+        RuntimeError: 作成に失敗した場合
+    """
+    process = multiprocessing.get_context("spawn").Process(target=prepare, args=(path,))
+    process.start()
+    process.join()
+    if process.exitcode != 0:
+        raise RuntimeError(f"共有インデックスの作成に失敗しました（終了コード {process.exitcode}）")
+    return os.path.exists(shared_index.metadata_path(path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="職業分類判定APIの起動（複数ワーカー）")
+    parser.add_argument("--host", default="0.0.0.0", help="待ち受けるアドレス（デフォルト: 0.0.0.0）")
+    parser.add_argument("--port", type=int, default=8000, help="待ち受けるポート（デフォルト: 8000）")
+    parser.add_argument("--workers", type=int, default=config.WEB_CONCURRENCY,
+                        help="ワーカープロセス数（デフォルト: WEB_CONCURRENCY）")
+    parser.add_argument("--log-level", default="info", help="uvicorn のログレベル")
+    parser.add_argument("--prepare-timeout", type=float, default=600,
+                        help="ワーカーが共有インデックスの作成を待つ上限（秒。デフォルト: 600）")
+    parser.add_argument("--prepare-only", action="store_true",
+                        help="SHARED_INDEX_PATH に共有インデックスを作成して終了（gunicorn などで起動する場合）")
+    args = parser.parse_args()
+
+    if args.prepare_only:
+        if not config.SHARED_INDEX_PATH:
+            parser.error("--prepare-only には SHARED_INDEX_PATH の設定が必要です")
+        prepare_in_subprocess(config.SHARED_INDEX_PATH)
+        return
+
+    import uvicorn
+
+    # ワーカーが1つの場合は共有する必要がないため、そのまま起動
+    if args.workers <= 1:
+        uvicorn.run("app.main:app", host=args.host, port=args.port, log_level=args.log_level)
+        return
+
+    path = config.SHARED_INDEX_PATH or shared_index.default_path()
+    # 前回の起動で残ったファイルに接続しないよう削除してから作成を開始する
+    shared_index.remove(path)
+    process = start_prepare(path)
+    # ワーカーは環境変数を引き継ぎ、config の読み込み時に SHARED_INDEX_PATH を参照する
+    os.environ["SHARED_INDEX_PATH"] = path
+    os.environ.setdefault("SHARED_INDEX_WAIT_SECONDS", str(args.prepare_timeout))
+    try:
+        uvicorn.run("app.main:app", host=args.host, port=args.port,
+                    workers=args.workers, log_level=args.log_level)
+    finally:
+        if process.is_alive():
+            process.terminate()
+        shared_index.remove(path)
+
+
+if __name__ == "__main__":
+    main()
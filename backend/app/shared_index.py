@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ワーカープロセス間で共有する検索インデックス（読み取り専用のメモリマップ）
+
+複数ワーカーで起動する場合（python -m app.serve）、親プロセスが職業データのEmbeddingを
+1度だけ作成（またはキャッシュから読み込み）し、単位ベクトル化した float32 行列を
+共有メモリ（/dev/shm の tmpfs）上のファイルに書き出します。
+各ワーカーはこのファイルを読み取り専用でメモリマップするため、行列の実体は
+全ワーカーで1つだけになり（ページキャッシュを共有）、ワーカー数を増やしてもメモリ使用量は増えません。
+
+ファイル構成（SHARED_INDEX_PATH）:
+    <path>          単位ベクトル化した Embedding 行列（.npy）
+    <path>.json     メタデータ（Embeddingキャッシュのキー・形状）
+    <path>.failed   作成できなかった場合の理由（ワーカーは待たずに個別に読み込む）
+
+multiprocessing.shared_memory ではなくファイルのメモリマップを使うのは、
+ワーカーの再起動（異常終了後の再生成など）でも同じセグメントに接続でき、
+セグメントの解放をワーカーの終了処理に依存しないためです。
+"""
+
+import os
+import json
+import time
+import tempfile
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+import numpy as np
+
+
+def default_path() -> str:
+    """共有インデックスのデフォルトの保存先（/dev/shm がない環境では一時ディレクトリ）"""
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, f"occupation-classifier-{os.getpid()}.npy")
+
+
+def metadata_path(path: str) -> str:
+    return path + ".json"
+
+
+def failed_path(path: str) -> str:
+    return path + ".failed"
+
+
+def mark_failed(path: str, reason: str):
+    """共有インデックスを作成できなかったことを記録（待機中のワーカーは個別の読み込みに切り替える）"""
+    with open(failed_path(path), "w", encoding="utf-8") as f:
+        json.dump({"reason": reason, "created_at": datetime.now(timezone.utc).isoformat()}, f, ensure_ascii=False)
+
+
+def wait_for(path: str, timeout: float, interval: float = 0.5) -> bool:
+    """
+    共有インデックスが書き出されるまで待機
+
+    Args:
+        path: 共有インデックスのパス
+        timeout: 待機の上限（秒）
+        interval: 確認の間隔（秒）
+
+    Returns:
+        書き出された場合はTrue（作成に失敗した・タイムアウトした場合はFalse）
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        if os.path.exists(metadata_path(path)):
+            return True
+        if os.path.exists(failed_path(path)) or time.monotonic() >= deadline:
+            return False
+        time.sleep(interval)
+
+
+def publish(path: str, matrix: np.ndarray, key: str):
+    """
+    共有インデックスの書き出し（一時ファイル経由で置き換え）
+
+    Args:
+        path: 保存先（.npy）
+        matrix: 単位ベクトル化した float32 行列
+        key: Embeddingキャッシュのキー（ワーカー側で職業データ・モデルとの一致を確認）
+    """
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    tmp_path = path + ".tmp.npy"
+    np.save(tmp_path, matrix)
+    os.replace(tmp_path, path)
+
+    meta = {
+        "key": key,
+        "shape": list(matrix.shape),
+        "dtype": str(matrix.dtype),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+    with open(metadata_path(path) + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.replace(metadata_path(path) + ".tmp", metadata_path(path))
+
+
+def attach(path: str, key: str) -> Optional[np.ndarray]:
+    """
+    共有インデックスへの接続（読み取り専用のメモリマップ）
+
+    Args:
+        path: 共有インデックスのパス
+        key: 現在の職業データ・モデルに対応する Embeddingキャッシュのキー
+
+    Returns:
+        単位ベクトル化した行列（存在しない・キーが一致しない場合はNone）
+    """
+    try:
+        with open(metadata_path(path), encoding="utf-8") as f:
+            meta: Dict = json.load(f)
+    except (OSError, ValueError):
+        print(f"⚠️ 共有インデックスが見つかりません: {path}")
+        return None
+    if meta.get("key") != key:
+        print(f"⚠️ 共有インデックスの職業データ・モデルが一致しません（{meta.get('key')} != {key}）")
+        return None
+
+    try:
+        matrix = np.load(path, mmap_mode="r")
+    except (OSError, ValueError) as e:
+        print(f"⚠️ 共有インデックスの読み込み失敗: {e}")
+        return None
+    if matrix.dtype != np.float32 or list(matrix.shape) != meta.get("shape"):
+        print(f"⚠️ 共有インデックスの形状が不正です {matrix.shape}")
+        return None
+    # np.memmap のサブクラスではなく通常の配列として扱う（メモリは共有したまま、コピーしない）
+    return np.asarray(matrix)
+
+
+def remove(path: str):
+    """共有インデックスの削除（親プロセスの起動時・終了時）"""
+    for target in (path, metadata_path(path), failed_path(path)):
+        try:
+            os.remove(target)
+        except OSError:
+            pass
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+同一リクエストの集約（single-flight）
+
+同じキーの処理が実行中の場合、後から来たリクエストは新たに処理を開始せず、
+実行中の処理の完了を待って同じ結果を受け取ります。
+（フォーム送信が集中した際に、同じ入力の Embedding・Gemini 呼び出しを1回にまとめる）
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class _Call:
+    """実行中の処理（共有タスクと待機中のリクエスト数）"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class AsyncSingleFlight:
+    """
+    asyncio 用の single-flight
+
+    - 処理は共有タスクとして1回だけ実行し、待機中の全リクエストに同じ結果を返します
+    - 処理中の例外は待機中の全リクエストに伝わります
+    - 待機中のリクエストがキャンセルされても共有タスクは継続し、
+      全員がキャンセルされた場合のみ共有タスクをキャンセルします
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.coalesced = 0
+        self.cancelled = 0
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        key の処理を実行（実行中の場合はその結果を待つ）
+
+        Args:
+            key: 処理を集約するキー
+            func: 処理本体（コルーチンを返す関数）
+
+        Returns:
+            処理結果（集約されたリクエストには同じオブジェクトを返すため、変更する場合は複製すること）
+        """
+        loop = asyncio.get_running_loop()
+        # 共有タスクは作成されたイベントループでしか待てないため、ループごとに区別する
+        call_key = (id(loop), key)
+
+        with self._lock:
+            call = self._calls.get(call_key)
+            if call is None or call.task.get_loop() is not loop:
+                call = _Call(loop.create_task(func()))
+                self._calls[call_key] = call
+                call.task.add_done_callback(lambda _, call=call: self._forget(call_key, call))
+                self.executions += 1
+            else:
+                self.coalesced += 1
+            call.waiters += 1
+
+        try:
+            # 待機側のキャンセルが共有タスクに伝わらないよう shield で保護
+            return await asyncio.shield(call.task)
+        finally:
+            with self._lock:
+                call.waiters -= 1
+                abandoned = call.waiters == 0 and not call.task.done()
+                if abandoned:
+                    # 全員がキャンセルされた場合は処理を中止（以降のリクエストは新たに実行）
+                    self._calls.pop(call_key, None)
+                    self.cancelled += 1
+            if abandoned:
+                call.task.cancel()
+
+    def _forget(self, call_key, call: _Call):
+        """完了した処理の登録を解除"""
+        with self._lock:
+            if self._calls.get(call_key) is call:
+                del self._calls[call_key]
+        # 待機者がいない状態で失敗したタスクの例外を回収（未回収の警告を出さない）
+        if not call.task.cancelled():
+            call.task.exception()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        集約の統計情報
+
+        Returns:
+            実行回数・集約された（上流の呼び出しを省略した）リクエスト数など
+        """
+        with self._lock:
+            in_flight = len(self._calls)
+        return {
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "cancelled": self.cancelled,
+            "in_flight": in_flight,
+        }
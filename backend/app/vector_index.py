@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+職業データのベクトル検索インデックス（インプロセス）
+
+職業データのEmbeddingを単位ベクトル化した float32 行列として1度だけ保持し、
+クエリごとの類似度計算を行列積1回で行います。
+上位k件の抽出は argpartition + 小さなソートで行うため、全件ソートは不要です。
+"""
+
+from typing import Dict, List
+
+import numpy as np
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """
+    各行を単位ベクトルに正規化（float32）
+
+    Args:
+        vectors: ベクトル（1次元）または行列（2次元）
+
+    Returns:
+        正規化済みの float32 配列（ゼロベクトルはそのまま）
+    """
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """
+    スコアの高い順に上位k件のインデックスを取得
+
+    Args:
+        scores: スコア配列（1次元）
+        top_k: 取得件数
+
+    Returns:
+        スコア降順のインデックス配列
+    """
+    top_k = min(top_k, scores.shape[0])
+    if top_k <= 0:
+        return np.empty(0, dtype=np.intp)
+    if top_k < scores.shape[0]:
+        # 上位k件だけを部分ソートで抽出（O(n)）
+        indices = np.argpartition(-scores, top_k - 1)[:top_k]
+    else:
+        indices = np.arange(scores.shape[0])
+    # 抽出したk件のみを降順ソート
+    return indices[np.argsort(-scores[indices], kind="stable")]
+
+
+class VectorIndex:
+    """
+    コサイン類似度による職業候補の検索インデックス
+    """
+
+    def __init__(self, vectors: np.ndarray, records: List[Dict], normalized: bool = False):
+        """
+        Args:
+            vectors: 職業データのEmbedding行列（件数 × 次元数）
+            records: 各行に対応する候補データ（code, name, description）
+            normalized: True の場合、vectors は単位ベクトル化済みの float32 行列としてコピーせずに使用
+                        （ワーカー間で共有するメモリマップ上の行列など）
+        """
+        if len(records) != len(vectors):
+            raise ValueError(
+                f"Embeddingの件数（{len(vectors)}）と職業データの件数（{len(records)}）が一致しません"
+            )
+        if normalized:
+            self.matrix = vectors
+        else:
+            self.matrix = np.ascontiguousarray(normalize_rows(vectors))
+        self.records = records
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    @property
+    def dim(self) -> int:
+        return self.matrix.shape[1]
+
+    def scores(self, query: np.ndarray) -> np.ndarray:
+        """
+        クエリと全職業データのコサイン類似度
+
+        Args:
+            query: クエリベクトル（1次元）または行列（クエリ数 × 次元数）
+
+        Returns:
+            類似度（1次元、または クエリ数 × 件数）
+        """
+        return normalize_rows(query) @ self.matrix.T
+
+    def search(self, query, top_k: int = 5) -> List[Dict]:
+        """
+        クエリベクトルに類似する職業候補を検索
+
+        Args:
+            query: クエリベクトル
+            top_k: 取得する候補数
+
+        Returns:
+            類似度の高い職業候補のリスト
+        """
+        scores = self.scores(np.asarray(query))
+        return self._candidates(scores, top_k_indices(scores, top_k))
+
+    def search_batch(self, queries, top_k: int = 5) -> List[List[Dict]]:
+        """
+        複数クエリをまとめて検索（類似度計算は行列積1回）
+
+        Args:
+            queries: クエリ行列（クエリ数 × 次元数）
+            top_k: 取得する候補数
+
+        Returns:
+            クエリごとの職業候補リスト
+        """
+        scores = self.scores(np.asarray(queries))
+        return [
+            self._candidates(row, top_k_indices(row, top_k))
+            for row in scores
+        ]
+
+    def _candidates(self, scores: np.ndarray, indices: np.ndarray) -> List[Dict]:
+        """インデックスから候補リストを作成（事前作成した候補データに類似度を付与）"""
+        return [
+            {**self.records[idx], "similarity": float(scores[idx])}
+            for idx in indices
+        ]
+
+
+def code_level(code: str):
+    """
+    職業コードの階層（0: 大分類 A〜, 1: 中分類 01〜, 2: 小分類 011〜）
+
+    Returns:
+        階層（判別できないコードの場合はNone）
+    """
+    code = str(code)
+    if len(code) == 1 and code.isalpha():
+        return 0
+    if len(code) == 2 and code.isdigit():
+        return 1
+    if len(code) == 3 and code.isdigit():
+        return 2
+    return None
+
+
+class HierarchicalVectorIndex(VectorIndex):
+    """
+    職業コードの階層（大分類 → 中分類 → 小分類）を使った段階的な検索インデックス
+
+    大分類をまず採点し、上位の分岐の中だけで中分類・小分類を検索します。
+    各グループはそのグループ配下の職業ベクトルの重心で採点するため、
+    全件を走査せずに候補を絞り込めます（件数が増えても走査する行数はほぼ一定）。
+    職業データはCSVの並び順（大分類の直後にその配下が続く）で階層を判定します。
+    階層を判定できないデータ（ダミーデータなど）の場合は全件検索と同じ動作になります。
+    """
+
+    LEVELS = {"major": 0, "middle": 1, "minor": 2}
+
+    def __init__(self, vectors: np.ndarray, records: List[Dict],
+                 level: str = "minor", major_beam: int = 3, middle_beam: int = 6,
+                 normalized: bool = False):
+        """
+        Args:
+            vectors: 職業データのEmbedding行列（件数 × 次元数）
+            records: 各行に対応する候補データ（code, name, description）
+            level: 返す候補の階層（major / middle / minor）。
+                   minor の場合、小分類を持たない中分類も候補に含めます
+            major_beam: 絞り込む大分類の数
+            middle_beam: 絞り込む中分類の数
+            normalized: True の場合、vectors は単位ベクトル化済み（VectorIndex を参照）
+        """
+        super().__init__(vectors, records, normalized=normalized)
+        if level not in self.LEVELS:
+            raise ValueError(f"不明な階層です: {level}（major / middle / minor）")
+        self.level = level
+        self.beams = (max(1, major_beam), max(1, middle_beam))
+
+        levels = [code_level(record["code"]) for record in records]
+        self.hierarchical = bool(records) and None not in levels and levels[0] == 0
+        if not self.hierarchical:
+            return
+
+        # 並び順から親子関係と配下の範囲（連続した行）を作成
+        children: List[List[int]] = [[] for _ in records]
+        subtree_end = [len(records)] * len(records)
+        roots: List[int] = []
+        stack: List[int] = []
+        for i, lv in enumerate(levels):
+            while stack and levels[stack[-1]] >= lv:
+                subtree_end[stack.pop()] = i
+            if stack:
+                children[stack[-1]].append(i)
+            else:
+                roots.append(i)
+            stack.append(i)
+
+        self.roots = np.array(roots, dtype=np.intp)
+        self.children = [np.array(c, dtype=np.intp) for c in children]
+
+        # グループの代表ベクトル（配下全体の重心）。子を持たない行は自身のベクトル
+        representatives = self.matrix.copy()
+        for i, end in enumerate(subtree_end):
+            if end - i > 1:
+                representatives[i] = self.matrix[i:end].mean(axis=0)
+        self.representatives = np.ascontiguousarray(normalize_rows(representatives))
+
+    def search(self, query, top_k: int = 5) -> List[Dict]:
+        """
+        階層を使って職業候補を検索
+
+        Args:
+            query: クエリベクトル
+            top_k: 取得する候補数
+
+        Returns:
+            類似度の高い職業候補のリスト（指定した階層の候補）
+        """
+        if not self.hierarchical:
+            return super().search(query, top_k)
+
+        query = normalize_rows(np.asarray(query))
+        beams = self.beams
+        while True:
+            pool, exhaustive = self._descend(query, beams)
+            # 候補数が足りない場合は絞り込みを緩めて再検索
+            if len(pool) >= top_k or exhaustive:
+                break
+            beams = tuple(beam * 2 for beam in beams)
+
+        scores = self.matrix[pool] @ query
+        order = top_k_indices(scores, top_k)
+        return [
+            {**self.records[pool[i]], "similarity": float(scores[i])}
+            for i in order
+        ]
+
+    def search_batch(self, queries, top_k: int = 5) -> List[List[Dict]]:
+        """複数クエリの検索（階層検索はクエリごとに絞り込む分岐が異なるため1件ずつ）"""
+        if not self.hierarchical:
+            return super().search_batch(queries, top_k)
+        return [self.search(query, top_k) for query in np.asarray(queries)]
+
+    def _descend(self, query: np.ndarray, beams):
+        """
+        大分類から指定の階層まで、上位のグループだけを辿って候補を集める
+
+        Returns:
+            (候補の行番号, 全グループを辿ったかどうか)
+        """
+        target = self.LEVELS[self.level]
+        nodes = self.roots
+        leaves: List[np.ndarray] = []
+        exhaustive = True
+        for depth in range(target):
+            if nodes.size == 0:
+                break
+            beam = beams[min(depth, len(beams) - 1)]
+            if nodes.size > beam:
+                exhaustive = False
+                scores = self.representatives[nodes] @ query
+                nodes = nodes[top_k_indices(scores, beam)]
+            # 配下を持たないグループはその階層での最も具体的な候補として残す
+            has_children = np.array([self.children[n].size > 0 for n in nodes], dtype=bool)
+            leaves.append(nodes[~has_children])
+            expanded = [self.children[n] for n in nodes[has_children]]
+            nodes = np.concatenate(expanded) if expanded else np.empty(0, dtype=np.intp)
+        pool = np.concatenate(leaves + [nodes]) if leaves else nodes
+        return pool, exhaustive
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+起動時の準備処理（ウォームアップ）の進捗
+
+職業データの読み込み・Embeddingの作成（検索インデックスを含む）・上流APIのクライアントの読み込み・
+よく使われる入力のクエリEmbeddingの事前作成を段階（phase）ごとに記録し、
+/api/health/ready で進捗と経過時間を返します。
+必須の段階（catalog / embeddings）が完了した時点でリクエストを受け付けられる状態（ready）になります。
+"""
+
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional
+
+
+# 準備処理の段階（この順に表示）
+PHASES = ("catalog", "embeddings", "provider", "prewarm")
+
+# リクエストの受け付けに必要な段階
+REQUIRED_PHASES = ("catalog", "embeddings")
+
+
+class WarmupProgress:
+    """
+    準備処理の段階ごとの状態（pending / running / done / skipped / failed）と経過時間
+    （準備処理のスレッドから更新し、イベントループから参照するためロックで保護）
+    """
+
+    def __init__(self, phases: Iterable[str] = PHASES, required: Iterable[str] = REQUIRED_PHASES):
+        """
+        Args:
+            phases: 段階名
+            required: リクエストの受け付けに必要な段階
+        """
+        self.started = time.monotonic()
+        self.required = tuple(required)
+        self._phases: Dict[str, Dict] = {name: {"status": "pending"} for name in phases}
+        self._started: Dict[str, float] = {}
+        self._ready_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def start(self, phase: str):
+        """段階の開始"""
+        with self._lock:
+            self._started[phase] = time.monotonic()
+            self._phases[phase] = {"status": "running"}
+
+    def update(self, phase: str, **detail):
+        """段階の途中経過（done / total など）を記録"""
+        with self._lock:
+            self._phases[phase].update(detail)
+
+    def finish(self, phase: str, status: str = "done", **detail):
+        """
+        段階の終了
+
+        Args:
+            phase: 段階名
+            status: done / skipped / failed
+            detail: 段階の結果（件数・エラーメッセージなど）
+        """
+        with self._lock:
+            entry = self._phases[phase]
+            entry.update(detail)
+            entry["status"] = status
+            if phase in self._started:
+                entry["elapsed_seconds"] = round(time.monotonic() - self._started.pop(phase), 3)
+            if self._ready_at is None and self._is_ready():
+                self._ready_at = time.monotonic()
+
+    @contextmanager
+    def phase(self, phase: str):
+        """段階の開始・終了を記録するコンテキストマネージャ（例外の場合は failed）"""
+        self.start(phase)
+        try:
+            yield
+        except Exception as e:
+            self.finish(phase, "failed", error=str(e) or type(e).__name__)
+            raise
+        self.finish(phase)
+
+    def _is_ready(self) -> bool:
+        return all(self._phases[name]["status"] == "done" for name in self.required)
+
+    @property
+    def ready(self) -> bool:
+        """リクエストを受け付けられる状態かどうか"""
+        with self._lock:
+            return self._is_ready()
+
+    @property
+    def failed(self) -> bool:
+        """必須の段階が失敗したかどうか（再起動が必要）"""
+        with self._lock:
+            return any(self._phases[name]["status"] == "failed" for name in self.required)
+
+    def snapshot(self) -> Dict:
+        """
+        進捗（/api/health/ready のレスポンス）
+
+        Returns:
+            status（warming / ready / failed）・経過時間・準備完了までの時間・段階ごとの状態
+        """
+        now = time.monotonic()
+        with self._lock:
+            phases = {}
+            for name, entry in self._phases.items():
+                phases[name] = dict(entry)
+                if name in self._started:
+                    phases[name]["elapsed_seconds"] = round(now - self._started[name], 3)
+            if any(self._phases[name]["status"] == "failed" for name in self.required):
+                status = "failed"
+            elif self._is_ready():
+                status = "ready"
+            else:
+                status = "warming"
+            return {
+                "status": status,
+                "elapsed_seconds": round(now - self.started, 3),
+                "ready_seconds": None if self._ready_at is None else round(self._ready_at - self.started, 3),
+                "phases": phases,
+            }
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+職業データの読み込み・候補検索のマイクロベンチマーク
+
+FakeProvider（遅延なし）を使い、API を呼ばずに次の処理時間を計測します。
+    - 職業データ（CSV）の読み込み・BM25インデックスの作成
+      （--compare-pandas: 従来の pandas.read_csv + DataFrame.iloc での候補作成との比較）
+    - Embeddingsの作成（キャッシュなし）とキャッシュからの読み込み
+    - search_candidates の1クエリあたりの処理時間（vector / bm25 / hybrid）
+      （クエリEmbeddingはキャッシュ済みの状態で計測するため、スコア計算・並べ替えの時間のみ）
+
+使い方（backend ディレクトリで実行）:
+    python benchmarks/bench_catalog.py
+    python benchmarks/bench_catalog.py --csv data/occupation.csv --repeat 5
+    python benchmarks/bench_catalog.py --compare-pandas
+"""
+import os
+import sys
+import time
+import atexit
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+
+# backend ディレクトリを import パスに追加
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+QUERIES = [
+    "消防車に乗って火を消す仕事",
+    "エクセルの集計業務を担当",
+    "プログラミングでWebアプリを作っています",
+    "会社の経理を担当しています",
+    "お店でレジ打ちをしています",
+    "病院で看護師として働いています",
+    "トラックで荷物を配送しています",
+    "美容室でカットをしています",
+]
+
+
+def best_ms(func, repeat: int) -> float:
+    """処理時間（ミリ秒、repeat回の最良値）"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def allocated_kb(func) -> float:
+    """func の実行で確保され、結果として保持されているメモリ（KB）"""
+    tracemalloc.start()
+    result = func()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size / 1024
+
+
+def compare_pandas(csv_path: str, catalog, repeat: int):
+    """従来の DataFrame との比較（読み込み時間・メモリ・5件の候補作成）"""
+    import pandas as pd
+
+    rows = [3, 50, 120, 200, 400]
+    rows = [row for row in rows if row < len(catalog)]
+    data = pd.read_csv(csv_path)
+
+    def iloc_candidates():
+        return [
+            {"code": data.iloc[idx]["code"], "name": data.iloc[idx]["name"],
+             "description": data.iloc[idx]["description"], "similarity": 0.5}
+            for idx in rows
+        ]
+
+    def record_candidates():
+        return [{**catalog.records[idx], "similarity": 0.5} for idx in rows]
+
+    print(f"\n{'pandas との比較':<28} {'DataFrame':>12} {'catalog':>12}")
+    print("-" * 56)
+    print(f"{'CSVの読み込み (ms)':<30} {best_ms(lambda: pd.read_csv(csv_path), repeat):>12.2f} "
+          f"{best_ms(lambda: type(catalog).from_csv(csv_path), repeat):>12.2f}")
+    # 従来は DataFrame と候補データ（辞書のリスト）の両方を保持していた
+    def load_dataframe():
+        frame = pd.read_csv(csv_path)
+        records = [
+            {"code": str(code), "name": name, "description": description}
+            for code, name, description in frame[["code", "name", "description"]].itertuples(index=False, name=None)
+        ]
+        return frame, records
+
+    print(f"{'保持するメモリ (KB)':<29} {allocated_kb(load_dataframe):>12.0f} "
+          f"{allocated_kb(lambda: type(catalog).from_csv(csv_path)):>12.0f}")
+    print(f"{'候補5件の作成 (us)':<30} {best_ms(iloc_candidates, repeat) * 1000:>12.1f} "
+          f"{best_ms(record_candidates, repeat) * 1000:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="職業データの読み込み・候補検索のマイクロベンチマーク")
+    parser.add_argument("--csv", default=os.path.join(BACKEND_DIR, "data", "occupation.csv"), help="職業データのCSV")
+    parser.add_argument("--repeat", type=int, default=5, help="計測の繰り返し回数（最良値を表示）")
+    parser.add_argument("--top-k", type=int, default=5, help="候補数")
+    parser.add_argument("--compare-pandas", action="store_true", help="従来の pandas の DataFrame と比較（pandas が必要）")
+    args = parser.parse_args()
+
+    cache_dir = tempfile.mkdtemp(prefix="bench_catalog_")
+    atexit.register(shutil.rmtree, cache_dir, ignore_errors=True)
+    # 設定は app の import 前に環境変数で指定する
+    os.environ.update({
+        "MODEL_PROVIDER": "fake",
+        "FAKE_LATENCY_MS": "0",
+        "EMBEDDING_CACHE_DIR": cache_dir,
+        "RESULT_CACHE_BACKEND": "none",
+    })
+
+    from app import config
+    from app.catalog import OccupationCatalog
+    from app.classifier import OccupationClassifier
+    from app.lexical_index import BM25Index
+
+    start = time.perf_counter()
+    classifier = OccupationClassifier(csv_path=args.csv)
+    init_ms = (time.perf_counter() - start) * 1000
+
+    print(f"職業データ: {len(classifier.records)} 件\n")
+    print(f"{'処理':<36} {'ms':>10}")
+    print("-" * 48)
+    print(f"{'初期化（読み込み〜インデックス作成）':<30} {init_ms:>10.2f}")
+    print(f"{'CSVの読み込み':<32} {best_ms(lambda: OccupationCatalog.from_csv(args.csv), args.repeat):>10.2f}")
+    print(f"{'BM25インデックスの作成':<30} {best_ms(lambda: BM25Index(classifier.records), args.repeat):>10.2f}")
+
+    start = time.perf_counter()
+    classifier.create_embeddings()
+    print(f"{'Embeddingsの作成（キャッシュなし）':<27} {(time.perf_counter() - start) * 1000:>10.2f}")
+
+    def load_cached():
+        # 作成済みの状態を解除し、キャッシュファイルから読み込ませる
+        classifier.embeddings = None
+        classifier.create_embeddings()
+
+    print(f"{'Embeddingsの読み込み（キャッシュ）':<27} {best_ms(load_cached, args.repeat):>10.2f}")
+
+    print(f"\n{'search_candidates':<20} {'us/クエリ':>12}")
+    print("-" * 34)
+    for backend in ("vector", "bm25", "hybrid"):
+        config.RETRIEVAL_BACKEND = backend
+
+        def search_all():
+            for query in QUERIES:
+                classifier.search_candidates(query, top_k=args.top_k)
+
+        # クエリEmbeddingをキャッシュに載せてから計測
+        search_all()
+        per_query_us = best_ms(search_all, args.repeat) * 1000 / len(QUERIES)
+        print(f"{backend:<20} {per_query_us:>12.1f}")
+
+    if args.compare_pandas:
+        compare_pandas(args.csv, classifier.catalog, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ベクトル検索のマイクロベンチマーク
+
+従来の検索（sklearn の cosine_similarity + 全件 argsort + DataFrame.iloc）と
+VectorIndex（正規化済み float32 行列 + argpartition）の1クエリあたりの処理時間を比較します。
+
+使い方（backend ディレクトリで実行）:
+    python benchmarks/bench_vector_index.py
+    python benchmarks/bench_vector_index.py --sizes 415 10000 --dim 768 --top-k 5
+"""
+import os
+import sys
+import time
+import argparse
+
+# backend ディレクトリを import パスに追加
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from app.vector_index import VectorIndex
+
+
+def per_query_us(func, queries, repeat: int) -> float:
+    """1クエリあたりの処理時間（マイクロ秒、repeat回の最良値）"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for query in queries:
+            func(query)
+        best = min(best, (time.perf_counter() - start) / len(queries))
+    return best * 1e6
+
+
+def make_records(size: int):
+    return [
+        {"code": f"{i:03d}", "name": f"職業{i}", "description": f"職業{i}の説明"}
+        for i in range(size)
+    ]
+
+
+def baseline_search(embeddings, data, top_k):
+    """従来の search_candidates と同じ処理"""
+    from sklearn.metrics.pairwise import cosine_similarity
+
+    def search(query):
+        similarities = cosine_similarity(np.array([query]), embeddings)[0]
+        top_indices = np.argsort(similarities)[::-1][:top_k]
+        return [
+            {
+                "code": data.iloc[idx]["code"],
+                "name": data.iloc[idx]["name"],
+                "description": data.iloc[idx]["description"],
+                "similarity": float(similarities[idx])
+            }
+            for idx in top_indices
+        ]
+    return search
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ベクトル検索のマイクロベンチマーク")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[415, 5000, 50000], help="職業データの件数")
+    parser.add_argument("--dim", type=int, default=768, help="Embeddingの次元数")
+    parser.add_argument("--top-k", type=int, default=5, help="取得する候補数")
+    parser.add_argument("--queries", type=int, default=200, help="計測に使うクエリ数")
+    parser.add_argument("--repeat", type=int, default=3, help="繰り返し回数（最良値を採用）")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    queries = rng.standard_normal((args.queries, args.dim)).tolist()
+
+    print(f"{'件数':>8} {'方式':<28} {'1クエリあたり':>14}")
+    print("-" * 54)
+    for size in args.sizes:
+        embeddings = rng.standard_normal((size, args.dim))
+        records = make_records(size)
+
+        start = time.perf_counter()
+        index = VectorIndex(embeddings, records)
+        build_ms = (time.perf_counter() - start) * 1e3
+
+        try:
+            import pandas as pd
+            baseline = baseline_search(embeddings, pd.DataFrame(records), args.top_k)
+            elapsed = per_query_us(baseline, queries, args.repeat)
+            print(f"{size:>8} {'cosine_similarity+argsort':<28} {elapsed:>11.1f} µs")
+        except ImportError:
+            print(f"{size:>8} {'cosine_similarity+argsort':<28} {'(sklearn/pandas なし)':>14}")
+
+        elapsed = per_query_us(lambda q: index.search(q, args.top_k), queries, args.repeat)
+        print(f"{size:>8} {'VectorIndex.search':<28} {elapsed:>11.1f} µs")
+
+        batch = np.asarray(queries)
+        start = time.perf_counter()
+        index.search_batch(batch, args.top_k)
+        elapsed = (time.perf_counter() - start) / len(queries) * 1e6
+        print(f"{size:>8} {'VectorIndex.search_batch':<28} {elapsed:>11.1f} µs")
+        print(f"{size:>8} {'(インデックス作成)':<28} {build_ms:>11.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
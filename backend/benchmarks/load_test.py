@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+エンドツーエンドの負荷試験（/api/classify）
+
+Gemini API の代わりに FakeProvider（遅延を指定可能）を使って FastAPI アプリを起動し、
+同時実行数を段階的に上げながらスループットとレイテンシ（p50/p95/p99）を計測します。
+処理段階ごとの所要時間（queue / retrieval / generation）はレスポンスの timings から集計します。
+結果は JSON に保存し、--baseline で前回の結果と比較できます。
+--background-batch を指定すると、計測中に /api/classify/batch を送り続け（上流APIの流量制御の
+優先度 bulk）、バッチ判定と同時に受けた対話的なリクエストのレイテンシを計測できます。
+
+使い方（backend ディレクトリで実行。httpx が必要: pip install -r requirements-dev.txt）:
+    python benchmarks/load_test.py
+    python benchmarks/load_test.py --concurrency 1 8 32 128 --requests 400 \\
+        --generation-latency-ms 800 --embedding-latency-ms 80
+    python benchmarks/load_test.py --baseline benchmarks/results/load_test_20250101-000000.json
+    python benchmarks/load_test.py --concurrency 4 --background-batch 50 \
+        --env GENERATE_REQUESTS_PER_MINUTE=1200 --env EMBED_REQUESTS_PER_MINUTE=3000
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 集計する処理段階（レスポンスの timings のキー）
+STAGES = ["queue_ms", "retrieval_ms", "generation_ms", "total_ms"]
+
+# 入力文のひな形（{i} で入力ごとに異なる文にし、キャッシュ・集約を効かせない）
+TEMPLATES = [
+    "消防車に乗って火を消す仕事 {i}",
+    "エクセルの集計業務を担当 {i}",
+    "プログラミングでWebアプリを作っています {i}",
+    "会社の経理を担当しています {i}",
+    "お店でレジ打ちをしています {i}",
+    "病院で看護師として働いています {i}",
+    "トラックで荷物を配送しています {i}",
+    "美容室でカットをしています {i}",
+]
+
+
+def percentile(values, q: float) -> float:
+    """パーセンタイル（線形補間）"""
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(values) -> dict:
+    return {
+        "p50": percentile(values, 0.50),
+        "p95": percentile(values, 0.95),
+        "p99": percentile(values, 0.99),
+        "mean": sum(values) / len(values) if values else float("nan"),
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args, port: int, cache_dir: str) -> subprocess.Popen:
+    """FakeProvider を使ってアプリを起動"""
+    env = dict(os.environ)
+    env.update({
+        "MODEL_PROVIDER": "fake",
+        "FAKE_LATENCY_MS": str(args.generation_latency_ms),
+        "FAKE_EMBEDDING_LATENCY_MS": str(args.embedding_latency_ms),
+        "FAKE_ERROR_RATE": str(args.error_rate),
+        "EMBEDDING_CACHE_DIR": cache_dir,
+        "RESULT_CACHE_BACKEND": args.result_cache,
+    })
+    for assignment in args.env:
+        name, _, value = assignment.partition("=")
+        env[name] = value
+
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+        stdout=None if args.server_logs else subprocess.DEVNULL,
+        stderr=None if args.server_logs else subprocess.DEVNULL
+    )
+
+
+async def wait_until_ready(base_url: str, process: subprocess.Popen, timeout: float = 120):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError("サーバーの起動に失敗しました（--server-logs でログを確認できます）")
+            try:
+                response = await client.get(f"{base_url}/api/health", timeout=1.0)
+                if response.status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("サーバーの起動がタイムアウトしました")
+
+
+async def run_background_batch(base_url: str, batch_size: int, offset: int, stop: asyncio.Event) -> dict:
+    """
+    stop が設定されるまで /api/classify/batch を1件ずつ送信し続ける
+
+    Returns:
+        判定した件数・エラー数
+    """
+    items, errors, n = 0, 0, 0
+    async with httpx.AsyncClient(timeout=600) as client:
+        while not stop.is_set():
+            user_inputs = [TEMPLATES[i % len(TEMPLATES)].format(i=f"batch-{offset + n}-{i}") for i in range(batch_size)]
+            n += 1
+            try:
+                response = await client.post(f"{base_url}/api/classify/batch", json={"user_inputs": user_inputs})
+            except httpx.HTTPError:
+                errors += batch_size
+                continue
+            if response.status_code != 200:
+                errors += batch_size
+                continue
+            results = response.json()["results"]
+            succeeded = sum(1 for item in results if item.get("result"))
+            items += succeeded
+            errors += len(results) - succeeded
+    return {"items": items, "errors": errors}
+
+
+async def run_level(base_url: str, concurrency: int, total: int, offset: int, background_batch: int = 0) -> dict:
+    """
+    同時実行数 concurrency で total 件のリクエストを送信して計測
+
+    Args:
+        background_batch: 計測中に並行して送信するバッチ判定の1リクエストあたりの件数（0で送信しない）
+
+    Returns:
+        スループット・レイテンシ・処理段階ごとの所要時間
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(TEMPLATES[i % len(TEMPLATES)].format(i=offset + i))
+
+    latencies, errors = [], 0
+    stages = {stage: [] for stage in STAGES}
+
+    async def worker(client: httpx.AsyncClient):
+        nonlocal errors
+        while True:
+            try:
+                user_input = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            start = time.perf_counter()
+            try:
+                response = await client.post(f"{base_url}/api/classify", json={"user_input": user_input})
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            elapsed = (time.perf_counter() - start) * 1000
+            if response.status_code != 200:
+                errors += 1
+                continue
+            latencies.append(elapsed)
+            for stage, value in (response.json().get("timings") or {}).items():
+                if stage in stages:
+                    stages[stage].append(value)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    stop = asyncio.Event()
+    background = None
+    if background_batch > 0:
+        background = asyncio.create_task(run_background_batch(base_url, background_batch, offset, stop))
+    async with httpx.AsyncClient(limits=limits, timeout=120) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*[worker(client) for _ in range(concurrency)])
+        duration = time.perf_counter() - start
+    stop.set()
+
+    level = {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "duration_s": duration,
+        "throughput_rps": len(latencies) / duration if duration > 0 else 0.0,
+        "latency_ms": summarize(latencies),
+        "stages_ms": {stage: summarize(values) for stage, values in stages.items() if values},
+    }
+    if background is not None:
+        # 計測終了時点で送信中のバッチの完了を待つ（件数は完了したものだけを数える）
+        batch = await background
+        level["background_batch"] = {
+            "items": batch["items"],
+            "errors": batch["errors"],
+            "items_per_s": batch["items"] / duration if duration > 0 else 0.0,
+        }
+    return level
+
+
+def print_level(level: dict, baseline: dict = None):
+    latency = level["latency_ms"]
+    stages = level["stages_ms"]
+    line = (
+        f"{level['concurrency']:>6} {level['throughput_rps']:>9.1f} "
+        f"{latency['p50']:>9.1f} {latency['p95']:>9.1f} {latency['p99']:>9.1f} "
+        f"{stages.get('queue_ms', {}).get('p50', float('nan')):>9.1f} "
+        f"{stages.get('retrieval_ms', {}).get('p50', float('nan')):>9.1f} "
+        f"{stages.get('generation_ms', {}).get('p50', float('nan')):>9.1f} "
+        f"{level['errors']:>6}"
+    )
+    if "background_batch" in level:
+        line += f"   (batch {level['background_batch']['items_per_s']:.1f} items/s)"
+    if baseline is not None:
+        change = (level["throughput_rps"] / baseline["throughput_rps"] - 1) * 100 if baseline["throughput_rps"] else 0
+        p95 = (latency["p95"] / baseline["latency_ms"]["p95"] - 1) * 100 if baseline["latency_ms"]["p95"] else 0
+        line += f"   (rps {change:+.1f}%, p95 {p95:+.1f}%)"
+    print(line)
+
+
+async def run(args) -> dict:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    with tempfile.TemporaryDirectory() as cache_dir:
+        process = start_server(args, port, cache_dir)
+        try:
+            await wait_until_ready(base_url, process)
+            # ウォームアップ（計測には含めない）
+            await run_level(base_url, min(4, max(args.concurrency)), args.warmup, offset=10 ** 6)
+
+            levels = []
+            for n, concurrency in enumerate(args.concurrency):
+                levels.append(await run_level(base_url, concurrency, args.requests, offset=n * args.requests,
+                                              background_batch=args.background_batch))
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+    return {"levels": levels}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="/api/classify の負荷試験（FakeProvider 使用）")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64], help="同時実行数（段階ごと）")
+    parser.add_argument("--requests", type=int, default=200, help="段階ごとのリクエスト数")
+    parser.add_argument("--warmup", type=int, default=20, help="ウォームアップのリクエスト数")
+    parser.add_argument("--generation-latency-ms", type=float, default=300, help="FakeProvider の生成の遅延")
+    parser.add_argument("--embedding-latency-ms", type=float, default=50, help="FakeProvider のEmbeddingの遅延")
+    parser.add_argument("--error-rate", type=float, default=0, help="FakeProvider のエラー注入の確率")
+    parser.add_argument("--result-cache", default="none", help="RESULT_CACHE_BACKEND（デフォルトは none でキャッシュなし）")
+    parser.add_argument("--background-batch", type=int, default=0, metavar="N",
+                        help="計測中に N 件ずつのバッチ判定を送り続ける（0で送信しない）")
+    parser.add_argument("--env", action="append", default=[], metavar="NAME=VALUE", help="サーバーに渡す追加の環境変数")
+    parser.add_argument("--server-logs", action="store_true", help="サーバーのログを表示")
+    parser.add_argument("--output", default=None, help="結果の保存先（デフォルト: benchmarks/results/load_test_<日時>.json）")
+    parser.add_argument("--baseline", default=None, help="比較対象の結果ファイル")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = {level["concurrency"]: level for level in json.load(f)["levels"]}
+
+    started_at = datetime.now(timezone.utc)
+    result = asyncio.run(run(args))
+
+    print(f"{'同時数':>6} {'req/s':>9} {'p50':>9} {'p95':>9} {'p99':>9} "
+          f"{'queue50':>9} {'retr50':>9} {'gen50':>9} {'errors':>6}  (ms)")
+    print("-" * 90)
+    for level in result["levels"]:
+        print_level(level, baseline.get(level["concurrency"]) if baseline else None)
+
+    result["settings"] = {
+        key: value for key, value in vars(args).items() if key not in ("output", "baseline")
+    }
+    result["started_at"] = started_at.isoformat()
+    try:
+        result["git_commit"] = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        result["git_commit"] = None
+
+    output = args.output or os.path.join(
+        BACKEND_DIR, "benchmarks", "results", f"load_test_{started_at.strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"\n結果を保存しました: {output}")
+
+
+if __name__ == "__main__":
+    main()
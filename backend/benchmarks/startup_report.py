@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+起動時間のレポート
+
+次の項目を計測し、起動時間の悪化（重い依存パッケージの import の追加など）を検出します。
+    - モジュールごとの import 時間（モジュールごとに新しいプロセスで計測）
+    - app.main の import 時に読み込まれた重いパッケージ（pandas / sklearn / google.generativeai など）
+    - アプリの起動から /api/health/live が応答するまでの時間（liveness）と、
+      /api/health/ready が 200 を返すまでの時間（準備完了）・その時点のメモリ使用量（RSS）
+      （Embeddingキャッシュなし / ありの2回。FakeProvider を使用するため APIキー不要）
+    - 複数ワーカーで起動した場合のメモリ使用量の合計（PSS。--workers 指定時、
+      uvicorn --workers と python -m app.serve（共有インデックス）を比較）
+
+使い方（backend ディレクトリで実行）:
+    python benchmarks/startup_report.py
+    python benchmarks/startup_report.py --output startup.json
+    # CI: app.main の import で重いパッケージを読み込んだ場合・起動が上限を超えた場合は終了コード 1
+    python benchmarks/startup_report.py --check --max-ready-seconds 10
+    # ワーカー数ごとのメモリ使用量
+    python benchmarks/startup_report.py --workers 1 2 4
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import subprocess
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# import 時間を計測するモジュール（依存パッケージ・アプリのモジュール）
+MODULES = [
+    "numpy",
+    "fastapi",
+    "prometheus_client",
+    "pandas",
+    "google.generativeai",
+    "app.config",
+    "app.providers",
+    "app.classifier",
+    "app.main",
+]
+
+# 推論のサーバーでは import 時に読み込まないパッケージ（必要になった時点で読み込む）
+HEAVY_MODULES = ["pandas", "sklearn", "scipy", "google.generativeai", "google.api_core"]
+
+
+def import_seconds(module: str) -> float:
+    """新しいプロセスでの import 時間（秒）。import できない場合は None"""
+    code = (
+        "import time; started = time.perf_counter(); "
+        f"import {module}; print(time.perf_counter() - started)"
+    )
+    completed = subprocess.run(
+        [sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        return None
+    return float(completed.stdout.strip().splitlines()[-1])
+
+
+def heavy_modules_loaded(module: str = "app.main"):
+    """module の import 時に読み込まれた重いパッケージ"""
+    code = (
+        "import sys, json; "
+        f"import {module}; "
+        f"print(json.dumps([name for name in {HEAVY_MODULES!r} if name in sys.modules]))"
+    )
+    completed = subprocess.run(
+        [sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def rss_mb(pid: int) -> float:
+    """プロセスのメモリ使用量（MB。/proc がない環境では None）"""
+    try:
+        with open(f"/proc/{pid}/status", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def pss_mb(pid: int) -> float:
+    """プロセスの比例配分のメモリ使用量（MB。共有ページはプロセス数で按分。/proc がない環境では None）"""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def process_tree(pid: int):
+    """pid とその子孫のプロセスID"""
+    pids = [pid]
+    for current in pids:
+        try:
+            with open(f"/proc/{current}/task/{current}/children", encoding="utf-8") as f:
+                pids.extend(int(child) for child in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_ready(cache_dir: str, provider: str, timeout: float = 300) -> dict:
+    """
+    アプリを起動し、/api/health/live が応答するまでの時間と /api/health/ready が 200 を返すまでの時間を計測
+
+    Returns:
+        起動（liveness）・準備完了までの秒数・メモリ使用量・段階ごとの所要時間
+    """
+    port = free_port()
+    env = dict(os.environ, MODEL_PROVIDER=provider, EMBEDDING_CACHE_DIR=cache_dir)
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    live_seconds = None
+    try:
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                raise RuntimeError("サーバーの起動に失敗しました")
+            path = "/api/health/live" if live_seconds is None else "/api/health/ready"
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=1) as response:
+                    if live_seconds is None:
+                        live_seconds = time.perf_counter() - started
+                        continue
+                    readiness = json.loads(response.read())
+                    return {
+                        "live_seconds": live_seconds,
+                        "ready_seconds": time.perf_counter() - started,
+                        "rss_mb": rss_mb(process.pid),
+                        "phases": {
+                            name: phase.get("elapsed_seconds")
+                            for name, phase in readiness["phases"].items()
+                        },
+                    }
+            except OSError:
+                # 準備中の /api/health/ready は 503（HTTPError も OSError）
+                pass
+            time.sleep(0.05)
+        raise RuntimeError("サーバーの起動がタイムアウトしました")
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def workers_memory(cache_dir: str, provider: str, workers: int, shared: bool, timeout: float = 300) -> dict:
+    """
+    複数ワーカーで起動し、全ワーカーの起動後のメモリ使用量の合計（PSS）を計測
+
+    Args:
+        shared: True の場合は python -m app.serve（共有インデックス）、False の場合は uvicorn --workers
+
+    Returns:
+        プロセス数・メモリ使用量の合計
+    """
+    port = free_port()
+    env = dict(os.environ, MODEL_PROVIDER=provider, EMBEDDING_CACHE_DIR=cache_dir)
+    env.pop("SHARED_INDEX_PATH", None)
+    if shared:
+        command = [sys.executable, "-m", "app.serve"]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "app.main:app"]
+    command += ["--host", "127.0.0.1", "--port", str(port), "--workers", str(workers), "--log-level", "warning"]
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    started = time.perf_counter()
+    try:
+        ready = 0
+        while ready < workers:
+            if time.perf_counter() - started > timeout:
+                raise RuntimeError("サーバーの起動がタイムアウトしました")
+            if process.poll() is not None:
+                raise RuntimeError("サーバーの起動に失敗しました")
+            try:
+                # 各ワーカーの起動を待つため、連続して応答するまで確認
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/health", timeout=1) as response:
+                    ready = ready + 1 if response.status == 200 else 0
+            except OSError:
+                ready = 0
+            time.sleep(0.2)
+        time.sleep(1.0)
+        pids = process_tree(process.pid)
+        total = [pss_mb(pid) for pid in pids]
+        return {
+            "processes": len(pids),
+            "pss_mb": None if None in total else sum(total),
+        }
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="起動時間のレポート")
+    parser.add_argument("--provider", default="fake", help="起動時の MODEL_PROVIDER（デフォルト: fake）")
+    parser.add_argument("--skip-server", action="store_true", help="起動時間の計測を省略（import のみ）")
+    parser.add_argument("--output", default=None, help="結果を保存する JSON ファイル")
+    parser.add_argument("--check", action="store_true",
+                        help="app.main の import で重いパッケージを読み込んだ場合に終了コード 1")
+    parser.add_argument("--max-ready-seconds", type=float, default=None,
+                        help="起動時間（キャッシュあり）の上限。超えた場合は終了コード 1")
+    parser.add_argument("--workers", type=int, nargs="*", default=[],
+                        help="メモリ使用量を計測するワーカー数（例: --workers 1 2 4）")
+    args = parser.parse_args()
+
+    report = {"python": sys.version.split()[0], "imports": {}}
+
+    print(f"{'モジュール':<24} {'import (ms)':>12}")
+    print("-" * 38)
+    for module in MODULES:
+        seconds = import_seconds(module)
+        report["imports"][module] = seconds
+        print(f"{module:<28} {'-' if seconds is None else f'{seconds * 1000:.0f}':>12}")
+
+    report["heavy_modules_loaded"] = heavy_modules_loaded()
+    print(f"\napp.main の import 時に読み込まれた重いパッケージ: {report['heavy_modules_loaded'] or 'なし'}")
+
+    failures = []
+    if args.check and report["heavy_modules_loaded"]:
+        failures.append(f"重いパッケージを import 時に読み込んでいます: {report['heavy_modules_loaded']}")
+
+    if not args.skip_server:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            report["startup"] = {
+                "cold": time_to_ready(cache_dir, args.provider),
+                "warm": time_to_ready(cache_dir, args.provider),
+            }
+        print(f"\n{'起動':<20} {'live (s)':>10} {'ready (s)':>10} {'RSS (MB)':>10}")
+        print("-" * 53)
+        for label, name in (("キャッシュなし", "cold"), ("キャッシュあり", "warm")):
+            startup = report["startup"][name]
+            rss = "-" if startup["rss_mb"] is None else f"{startup['rss_mb']:.0f}"
+            print(f"{label:<18} {startup['live_seconds']:>10.2f} {startup['ready_seconds']:>10.2f} {rss:>10}")
+
+        warm = report["startup"]["warm"]["ready_seconds"]
+        if args.max_ready_seconds is not None and warm > args.max_ready_seconds:
+            failures.append(f"起動時間 {warm:.2f}秒 が上限 {args.max_ready_seconds}秒 を超えています")
+
+    if args.workers:
+        report["workers"] = []
+        print(f"\n{'ワーカー数':<10} {'uvicorn (MB)':>14} {'app.serve (MB)':>16}")
+        print("-" * 44)
+        with tempfile.TemporaryDirectory() as cache_dir:
+            for workers in args.workers:
+                row = {
+                    "workers": workers,
+                    "uvicorn": workers_memory(cache_dir, args.provider, workers, shared=False),
+                    "serve": workers_memory(cache_dir, args.provider, workers, shared=True),
+                }
+                report["workers"].append(row)
+                cells = [
+                    "-" if row[name]["pss_mb"] is None else f"{row[name]['pss_mb']:.0f}"
+                    for name in ("uvicorn", "serve")
+                ]
+                print(f"{workers:<14} {cells[0]:>14} {cells[1]:>16}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n結果を保存しました: {args.output}")
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
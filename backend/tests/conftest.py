@@ -0,0 +1,31 @@
+"""
+テスト共通のフィクスチャ
+"""
+
+import pytest
+
+from app import config
+from app.classifier import OccupationClassifier
+
+
+@pytest.fixture
+def make_classifier(monkeypatch, tmp_path):
+    """
+    FakeProvider・ダミーデータ（csv_path を指定した場合はそのCSV）で動く OccupationClassifier を作成する関数
+    （キーワード引数で config の設定を上書き。シングルトンはテストごとに作り直す）
+    """
+    def make(csv_path=None, **settings):
+        settings = {
+            "MODEL_PROVIDER": "fake",
+            "FAKE_EMBEDDING_DIM": 64,
+            "EMBEDDING_CACHE_DIR": str(tmp_path),
+            "SHARED_INDEX_PATH": "",
+            **settings,
+        }
+        for name, value in settings.items():
+            monkeypatch.setattr(config, name, value)
+        OccupationClassifier._instance = None
+        return OccupationClassifier(csv_path=csv_path)
+
+    yield make
+    OccupationClassifier._instance = None
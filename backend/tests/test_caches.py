@@ -0,0 +1,82 @@
+"""
+インプロセスキャッシュ（TTLCache・normalize_input）のテスト
+"""
+
+import pytest
+
+from app.caches import TTLCache, normalize_input
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """time.monotonic を手動で進める時計に置き換える"""
+    state = {"now": 1000.0}
+    monkeypatch.setattr("app.caches.time.monotonic", lambda: state["now"])
+    return state
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # a を最近使ったものにする
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("a", 1)
+
+    clock["now"] += 59.9
+    assert cache.get("a") == 1
+    clock["now"] += 0.1
+    assert cache.get("a", "expired") == "expired"
+    assert len(cache) == 0
+
+
+def test_zero_ttl_never_expires(clock):
+    cache = TTLCache(maxsize=10, ttl=0)
+    cache.set("a", 1)
+
+    clock["now"] += 10 ** 9
+    assert cache.get("a") == 1
+
+
+def test_setting_again_refreshes_the_expiry(clock):
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("a", 1)
+    clock["now"] += 50
+    cache.set("a", 2)
+    clock["now"] += 50
+
+    assert cache.get("a") == 2
+
+
+def test_non_positive_maxsize_disables_the_cache():
+    cache = TTLCache(maxsize=0)
+    cache.set("a", 1)
+
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_stats_count_hits_and_misses():
+    cache = TTLCache(maxsize=10)
+    cache.set("a", 1)
+    cache.get("a")
+    cache.get("b")
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+    cache.delete("a")
+    cache.clear()
+    assert cache.stats()["size"] == 0
+
+
+def test_normalize_input_folds_width_and_whitespace():
+    assert normalize_input("  ＰＣ　で\n\tデータ入力 ") == "PC で データ入力"
+    assert normalize_input("ｶﾞｿﾘﾝｽﾀﾝﾄﾞ") == "ガソリンスタンド"
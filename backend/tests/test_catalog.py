@@ -0,0 +1,54 @@
+"""
+職業データ（OccupationCatalog）のテスト
+"""
+
+import pytest
+
+from app.catalog import OccupationCatalog
+
+
+def _write(path, text: str, encoding: str = "utf-8"):
+    path.write_text(text, encoding=encoding)
+    return str(path)
+
+
+def test_codes_are_kept_as_strings_with_leading_zeros(tmp_path):
+    path = _write(tmp_path / "occupation.csv", "code,name,description\n01,管理職,会社役員\n011,管理的公務員,\n")
+    catalog = OccupationCatalog.from_csv(path)
+
+    assert catalog.codes == ("01", "011")
+    assert catalog.get("01") == {"code": "01", "name": "管理職", "description": "会社役員"}
+    assert catalog.get(1) is None
+    assert catalog.records[1]["description"] == ""
+    assert catalog.rows() == [("01", "管理職", "会社役員"), ("011", "管理的公務員", "")]
+
+
+def test_excel_bom_is_removed(tmp_path):
+    path = _write(tmp_path / "occupation.csv", "code,name,description\nA,管理的職業従事者,説明\n", encoding="utf-8-sig")
+    assert OccupationCatalog.from_csv(path).get("A")["name"] == "管理的職業従事者"
+
+
+def test_missing_columns_are_rejected(tmp_path):
+    path = _write(tmp_path / "occupation.csv", "code,name\n01,管理職\n")
+    with pytest.raises(ValueError, match="description"):
+        OccupationCatalog.from_csv(path)
+
+
+def test_duplicate_codes_are_rejected():
+    with pytest.raises(ValueError, match="01"):
+        OccupationCatalog.from_records([
+            {"code": "01", "name": "管理職", "description": ""},
+            {"code": "01", "name": "事務職", "description": ""},
+        ])
+
+
+def test_mismatched_column_lengths_are_rejected():
+    with pytest.raises(ValueError):
+        OccupationCatalog(["01", "02"], ["管理職"], ["", ""])
+
+
+def test_numeric_codes_are_converted_to_strings():
+    catalog = OccupationCatalog([11, 21], ["管理職", "事務職"], ["", ""])
+    assert catalog.codes == ("11", "21")
+    assert catalog.get("21")["name"] == "事務職"
+    assert len(catalog) == 2
@@ -0,0 +1,91 @@
+"""
+職業データの再読み込み（reload_catalog・_incremental_embeddings）のテスト
+"""
+
+import csv
+
+import numpy as np
+import pytest
+
+from app.embedding_cache import build_embedding_texts
+from app.vector_index import normalize_rows
+
+ROWS = [
+    ("11", "管理的職業従事者", "会社役員、企業の部課長、管理職。"),
+    ("21", "一般事務従事者", "庶務、人事、総務、秘書。"),
+    ("25", "会計事務従事者", "経理担当者、会計係、簿記担当。"),
+    ("32", "保安職業従事者", "警察官、消防士、警備員。"),
+    ("41", "販売従事者", "小売店員、営業職、レジ業務。"),
+    ("52", "飲食物調理従事者", "調理師、コック、料理人。"),
+]
+
+
+def _write_csv(path, rows):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["code", "name", "description"])
+        writer.writerows(rows)
+    return str(path)
+
+
+def _record_embeds(classifier):
+    """職業データのEmbedding呼び出しの入力を記録"""
+    embed = classifier.provider.embed
+    seen = []
+
+    def wrapper(texts, task_type=None):
+        seen.extend(texts)
+        return embed(texts, task_type=task_type)
+
+    classifier.provider.embed = wrapper
+    return seen
+
+
+@pytest.fixture
+def classifier(make_classifier, tmp_path):
+    classifier = make_classifier(csv_path=_write_csv(tmp_path / "v1.csv", ROWS), RESULT_CACHE_BACKEND="none")
+    classifier.create_embeddings()
+    return classifier
+
+
+def test_only_added_and_changed_rows_are_embedded(classifier, tmp_path):
+    rows = [row for row in ROWS if row[0] != "32"]                          # 削除
+    rows[1] = ("21", "一般事務従事者", "庶務、人事、総務、秘書、データ入力。")  # 変更
+    rows.append(("61", "農林漁業従事者", "農家、漁師、林業作業者。"))          # 追加
+    seen = _record_embeds(classifier)
+
+    summary = classifier.reload_catalog(_write_csv(tmp_path / "v2.csv", rows))
+
+    assert (summary["added"], summary["changed"], summary["removed"], summary["embedded"]) == (1, 1, 1, 2)
+    texts = build_embedding_texts([row[1] for row in rows], [row[2] for row in rows])
+    assert seen == [texts[1], texts[-1]]
+
+    # 差分だけ作成した行列は全件を作成し直した場合と同じ
+    full = normalize_rows(np.array(classifier.provider.embed(texts)))
+    np.testing.assert_allclose(classifier.index.matrix, full, rtol=1e-5, atol=1e-6)
+    assert [record["code"] for record in classifier.index.records] == [row[0] for row in rows]
+
+
+def test_reordered_rows_reuse_every_vector(classifier, tmp_path):
+    before = {record["code"]: classifier.index.matrix[row].copy() for row, record in enumerate(classifier.index.records)}
+    seen = _record_embeds(classifier)
+
+    summary = classifier.reload_catalog(_write_csv(tmp_path / "v2.csv", list(reversed(ROWS))))
+
+    assert summary["reloaded"] and summary["embedded"] == 0 and seen == []
+    for row, record in enumerate(classifier.index.records):
+        np.testing.assert_array_equal(classifier.index.matrix[row], before[record["code"]])
+
+
+def test_unchanged_catalog_is_not_reloaded(classifier, tmp_path):
+    version = classifier.result_version
+    summary = classifier.reload_catalog(_write_csv(tmp_path / "same.csv", ROWS))
+
+    assert not summary["reloaded"]
+    assert classifier.result_version == version
+
+
+def test_empty_catalog_is_rejected(classifier, tmp_path):
+    with pytest.raises(ValueError):
+        classifier.reload_catalog(_write_csv(tmp_path / "empty.csv", []))
+    assert len(classifier.catalog) == len(ROWS)
@@ -0,0 +1,66 @@
+"""
+OccupationClassifier の判定処理のテスト（FakeProvider・ダミーデータ）
+"""
+
+import asyncio
+
+import pytest
+
+
+@pytest.mark.parametrize("limit", [0, -3])
+def test_non_positive_concurrency_limit_is_clamped_to_one(make_classifier, limit):
+    classifier = make_classifier(RESULT_CACHE_BACKEND="none", MAX_CONCURRENT_CLASSIFICATIONS=limit)
+    classifier.create_embeddings()
+
+    result = asyncio.run(asyncio.wait_for(classifier.aclassify("お店でレジ打ちをしています"), 5))
+    assert classifier.max_concurrency == 1
+    assert result["code"]
+
+
+def _candidates(*similarities):
+    return [
+        {"code": str(i), "name": f"職業{i}", "description": "", "similarity": similarity}
+        for i, similarity in enumerate(similarities)
+    ]
+
+
+@pytest.mark.parametrize("similarities, decided", [
+    ((0.85, 0.70), True),
+    ((0.80, 0.72), True),    # 閾値ちょうど
+    ((0.79, 0.50), False),   # 類似度が足りない
+    ((0.90, 0.83), False),   # 次点との差が足りない
+    ((0.85,), True),         # 候補が1件のみ
+    ((), False),
+])
+def test_fast_path_thresholds(make_classifier, similarities, decided):
+    classifier = make_classifier(FAST_PATH_ENABLED=True, FAST_PATH_MIN_SIMILARITY=0.80, FAST_PATH_MIN_MARGIN=0.08)
+
+    result = classifier._fast_path_decision(_candidates(*similarities))
+    if decided:
+        assert result["code"] == "0" and result["decision_path"] == "fast_path"
+    else:
+        assert result is None
+
+
+def test_disabled_fast_path_only_counts_shadow_decisions(make_classifier):
+    classifier = make_classifier(FAST_PATH_ENABLED=False, FAST_PATH_MIN_SIMILARITY=0.80, FAST_PATH_MIN_MARGIN=0.08)
+
+    assert classifier._fast_path_decision(_candidates(0.95, 0.50)) is None
+    assert classifier._fast_path_decision(_candidates(0.60, 0.50)) is None
+    assert classifier.decision_path_counts["fast_path_shadow"] == 1
+
+
+def test_fast_path_skips_the_llm_and_changes_the_result_version(make_classifier):
+    settings = dict(RESULT_CACHE_BACKEND="none", FAST_PATH_MIN_SIMILARITY=-1.0, FAST_PATH_MIN_MARGIN=-1.0)
+    classifier = make_classifier(FAST_PATH_ENABLED=False, **settings)
+    classifier.create_embeddings()
+    disabled_version = classifier.result_version
+
+    classifier = make_classifier(FAST_PATH_ENABLED=True, **settings)
+    classifier.create_embeddings()
+    classifier.provider.agenerate = None  # 呼ばれた場合はエラーにする
+
+    result = asyncio.run(classifier.aclassify("消防車に乗って火を消す仕事"))
+    assert result["decision_path"] == "fast_path"
+    assert result["code"] == result["candidates"][0]["code"]
+    assert classifier.result_version != disabled_version
@@ -0,0 +1,60 @@
+"""
+ストリーミング判定（aclassify_stream）のテスト
+"""
+
+import asyncio
+
+
+async def _collect(stream):
+    return [event async for event in stream]
+
+
+def test_stream_result_has_the_same_shape_as_aclassify(make_classifier):
+    classifier = make_classifier(RESULT_CACHE_BACKEND="none")
+    classifier.create_embeddings()
+
+    async def main():
+        events = await _collect(classifier.aclassify_stream("レストランで料理を作っています"))
+        result = await classifier.aclassify("学校で子供たちに勉強を教えています")
+        return events, result
+
+    events, result = asyncio.run(main())
+    names = [name for name, _ in events]
+    assert names[0] == "candidates" and names[-1] == "result"
+    assert "token" in names
+    streamed = events[-1][1]
+    assert set(streamed) == set(result)
+    assert set(streamed["timings"]) == set(result["timings"])
+    assert "".join(data["text"] for name, data in events if name == "token") == streamed["reason"]
+
+
+def test_stream_does_not_hold_the_semaphore_while_the_client_reads(make_classifier):
+    classifier = make_classifier(RESULT_CACHE_BACKEND="none", MAX_CONCURRENT_CLASSIFICATIONS=1)
+    classifier.create_embeddings()
+
+    async def main():
+        stream = classifier.aclassify_stream("レストランで料理を作っています")
+        # 最初のイベントを受け取ったまま読み進めない（遅いクライアント）
+        await stream.__anext__()
+        other = await asyncio.wait_for(classifier.aclassify("病院で患者さんのケアをしています"), 5)
+        rest = await _collect(stream)
+        return other, rest
+
+    other, rest = asyncio.run(main())
+    assert other["code"]
+    assert rest[-1][0] == "result"
+
+
+def test_concurrent_stream_and_classify_share_one_decision(make_classifier):
+    classifier = make_classifier(RESULT_CACHE_BACKEND="none", FAKE_LATENCY_MS=50)
+    classifier.create_embeddings()
+
+    async def main():
+        return await asyncio.gather(
+            _collect(classifier.aclassify_stream("お店でレジ打ちをしています")),
+            classifier.aclassify("お店でレジ打ちをしています"),
+        )
+
+    events, result = asyncio.run(main())
+    assert classifier.single_flight.stats()["coalesced"] == 1
+    assert events[-1][1]["code"] == result["code"]
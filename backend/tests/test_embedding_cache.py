@@ -0,0 +1,91 @@
+"""
+職業データEmbeddingのキャッシュ（EmbeddingCache）のテスト
+"""
+
+import json
+import os
+
+import numpy as np
+
+from app.embedding_cache import EmbeddingCache, build_embedding_texts
+
+ROWS = [("11", "管理的職業従事者", "会社役員、管理職"), ("21", "一般事務従事者", "庶務、経理、総務")]
+
+
+def _describe(cache: EmbeddingCache, rows=ROWS):
+    texts = build_embedding_texts([name for _, name, _ in rows], [description for _, _, description in rows])
+    return cache.describe(rows, texts)
+
+
+def test_saved_embeddings_are_loaded_as_a_memory_map(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "models/text-embedding-004")
+    meta = _describe(cache)
+    matrix = np.arange(6, dtype=np.float32).reshape(2, 3)
+    cache.save(meta, matrix)
+
+    loaded = cache.load(meta)
+    assert isinstance(loaded, np.memmap)
+    np.testing.assert_array_equal(loaded, matrix)
+    stored = json.loads(open(cache.metadata_path(meta), encoding="utf-8").read())
+    assert stored["dim"] == 3 and stored["num_rows"] == 2
+
+
+def test_key_changes_with_catalog_model_and_task_type(tmp_path):
+    base = _describe(EmbeddingCache(str(tmp_path), "model-a"))
+    changed_rows = [ROWS[0], ("21", "一般事務従事者", "庶務、経理、総務、秘書")]
+
+    assert _describe(EmbeddingCache(str(tmp_path), "model-a"))["key"] == base["key"]
+    assert _describe(EmbeddingCache(str(tmp_path), "model-a"), changed_rows)["key"] != base["key"]
+    assert _describe(EmbeddingCache(str(tmp_path), "model-b"))["key"] != base["key"]
+    assert _describe(EmbeddingCache(str(tmp_path), "model-a", task_type="retrieval_document"))["key"] != base["key"]
+
+
+def test_mismatched_sidecar_is_not_used(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "model-a")
+    meta = _describe(cache)
+    cache.save(meta, np.ones((2, 3), dtype=np.float32))
+
+    path = cache.metadata_path(meta)
+    stored = json.loads(open(path, encoding="utf-8").read())
+    stored["row_hashes"] = list(reversed(stored["row_hashes"]))
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(stored, f)
+    assert cache.load(meta) is None
+
+
+def test_wrong_shape_is_not_used(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "model-a")
+    meta = _describe(cache)
+    cache.save(meta, np.ones((2, 3), dtype=np.float32))
+    np.save(cache.embeddings_path(meta), np.ones((3, 3), dtype=np.float32))
+
+    assert cache.load(meta) is None
+
+
+def test_missing_sidecar_is_not_used(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "model-a")
+    meta = _describe(cache)
+    cache.save(meta, np.ones((2, 3), dtype=np.float32))
+    os.remove(cache.metadata_path(meta))
+
+    assert cache.load(meta) is None
+
+
+def test_saving_removes_stale_files_for_other_keys(tmp_path):
+    old = EmbeddingCache(str(tmp_path), "model-a")
+    old_meta = _describe(old)
+    old.save(old_meta, np.ones((2, 3), dtype=np.float32))
+    open(old.checkpoint_path(old_meta), "wb").close()
+    unrelated = tmp_path / "result_cache.sqlite3"
+    unrelated.write_bytes(b"")
+
+    new = EmbeddingCache(str(tmp_path), "model-b")
+    new_meta = _describe(new)
+    assert new.load(new_meta) is None
+    new.save(new_meta, np.zeros((2, 3), dtype=np.float32))
+
+    assert sorted(os.listdir(tmp_path)) == sorted([
+        os.path.basename(new.embeddings_path(new_meta)),
+        os.path.basename(new.metadata_path(new_meta)),
+        unrelated.name,
+    ])
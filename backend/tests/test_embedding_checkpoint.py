@@ -0,0 +1,86 @@
+"""
+職業データのEmbedding作成のチェックポイント・再開（create_embeddings）のテスト
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+from app.providers import TransientError
+
+
+def _failing_after(classifier, calls: int, error: Exception):
+    """calls 回目以降の職業データのEmbedding呼び出しを失敗させ、呼び出された入力を記録"""
+    embed = classifier.provider.embed
+    seen = []
+
+    def wrapper(texts, task_type=None):
+        seen.append(list(texts))
+        if len(seen) > calls:
+            raise error
+        return embed(texts, task_type=task_type)
+
+    classifier.provider.embed = wrapper
+    return seen
+
+
+def _settings(**overrides):
+    return {"EMBEDDING_BATCH_SIZE": 4, "EMBEDDING_WORKERS": 1, "EMBEDDING_MAX_RETRIES": 0, **overrides}
+
+
+def test_interrupted_run_resumes_from_the_checkpoint(make_classifier):
+    classifier = make_classifier(**_settings())
+    _failing_after(classifier, 2, ValueError("上流APIの障害"))
+    with pytest.raises(RuntimeError):
+        classifier.create_embeddings()
+    meta = classifier.embedding_cache.describe(classifier.catalog.rows(), classifier.embedding_texts)
+    checkpoint = classifier.embedding_cache.checkpoint_path(meta)
+    assert os.path.exists(checkpoint)
+
+    # 再開時は完了済みのバッチを送信しない
+    del classifier.provider.embed
+    seen = _failing_after(classifier, 100, AssertionError())
+    classifier.create_embeddings()
+    resumed = [text for batch in seen for text in batch]
+    assert resumed == classifier.embedding_texts[8:]
+    assert not os.path.exists(checkpoint)
+
+    # 再開して作成した行列は最初から作成した場合と同じ
+    fresh = classifier.provider.embed(classifier.embedding_texts)
+    np.testing.assert_allclose(classifier.embeddings, np.array(fresh))
+
+
+def test_checkpoint_for_other_data_is_discarded(make_classifier, tmp_path):
+    classifier = make_classifier()
+    checkpoint = str(tmp_path / "other.partial.npz")
+    classifier._save_checkpoint(checkpoint, "key-a", [[1.0, 0.0], None, [0.0, 1.0]])
+
+    assert classifier._load_checkpoint(checkpoint, "key-a", 3) == [[1.0, 0.0], None, [0.0, 1.0]]
+    assert classifier._load_checkpoint(checkpoint, "key-b", 3) == [None] * 3
+
+
+def test_unreadable_checkpoint_starts_over(make_classifier, tmp_path):
+    classifier = make_classifier()
+    checkpoint = tmp_path / "broken.partial.npz"
+    checkpoint.write_bytes(b"not a npz file")
+
+    assert classifier._load_checkpoint(str(checkpoint), "key", 2) == [None, None]
+
+
+def test_transient_errors_are_retried(make_classifier, monkeypatch):
+    classifier = make_classifier(**_settings(EMBEDDING_MAX_RETRIES=2))
+    monkeypatch.setattr("app.classifier.time.sleep", lambda seconds: None)
+    embed = classifier.provider.embed
+    failures = []
+
+    def flaky(texts, task_type=None):
+        if len(failures) < 2:
+            failures.append(texts)
+            raise TransientError("一時的なエラー")
+        return embed(texts, task_type=task_type)
+
+    classifier.provider.embed = flaky
+    classifier.create_embeddings()
+    assert len(failures) == 2
+    assert classifier.embeddings.shape == (len(classifier.catalog), 64)
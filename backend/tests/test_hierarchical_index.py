@@ -0,0 +1,83 @@
+"""
+階層を使った段階的な検索インデックス（HierarchicalVectorIndex）のテスト
+"""
+
+import numpy as np
+import pytest
+
+from app.vector_index import HierarchicalVectorIndex, VectorIndex, code_level
+
+# 大分類 A・B、その配下の中分類・小分類（CSVの並び順。小分類を持たない中分類 03 を含む）
+CODES = ["A", "01", "011", "012", "02", "021", "B", "03", "04", "041", "042"]
+
+
+def _records(codes):
+    return [{"code": code, "name": f"職業{code}", "description": ""} for code in codes]
+
+
+def _vectors(seed: int = 0):
+    rng = np.random.default_rng(seed)
+    return rng.normal(size=(len(CODES), 16))
+
+
+def test_code_level():
+    assert [code_level(code) for code in ("A", "01", "011", "0111", "x1")] == [0, 1, 2, None, None]
+
+
+@pytest.mark.parametrize("level, expected", [
+    ("major", {"A", "B"}),
+    ("middle", {"01", "02", "03", "04"}),
+    ("minor", {"011", "012", "021", "03", "041", "042"}),
+])
+def test_candidates_come_from_the_requested_level(level, expected):
+    index = HierarchicalVectorIndex(_vectors(), _records(CODES), level=level, major_beam=2, middle_beam=4)
+    results = index.search(np.ones(16), top_k=len(CODES))
+
+    assert {result["code"] for result in results} == expected
+
+
+def test_wide_beams_match_flat_search_within_the_level():
+    vectors = _vectors(1)
+    minor = [i for i, code in enumerate(CODES) if code in {"011", "012", "021", "03", "041", "042"}]
+    index = HierarchicalVectorIndex(vectors, _records(CODES), major_beam=10, middle_beam=10)
+    flat = VectorIndex(vectors[minor], _records([CODES[i] for i in minor]))
+    query = np.random.default_rng(2).normal(size=16)
+
+    assert [r["code"] for r in index.search(query, top_k=3)] == [r["code"] for r in flat.search(query, top_k=3)]
+
+
+def test_narrow_beams_only_score_the_best_branch():
+    vectors = _vectors()
+    # クエリを大分類 B の配下に寄せる
+    query = vectors[CODES.index("041")] + vectors[CODES.index("042")]
+    index = HierarchicalVectorIndex(vectors, _records(CODES), major_beam=1, middle_beam=1)
+
+    results = index.search(query, top_k=2)
+    assert {result["code"] for result in results} == {"041", "042"}
+
+
+def test_beams_are_widened_when_too_few_candidates():
+    vectors = _vectors()
+    query = vectors[CODES.index("041")]
+    index = HierarchicalVectorIndex(vectors, _records(CODES), major_beam=1, middle_beam=1)
+
+    # 1つの分岐の小分類は2件のため、5件を求めると絞り込みを緩めて他の分岐も含める
+    results = index.search(query, top_k=5)
+    assert len(results) == 5
+    assert results[0]["code"] == "041"
+    assert index.beams == (1, 1)
+
+
+def test_non_hierarchical_codes_fall_back_to_flat_search():
+    vectors = _vectors()
+    records = _records([f"{i + 11}" for i in range(len(CODES))])
+    index = HierarchicalVectorIndex(vectors, records)
+    query = np.ones(16)
+
+    assert not index.hierarchical
+    assert index.search(query, top_k=3) == VectorIndex(vectors, records).search(query, top_k=3)
+
+
+def test_unknown_level_is_rejected():
+    with pytest.raises(ValueError):
+        HierarchicalVectorIndex(_vectors(), _records(CODES), level="detail")
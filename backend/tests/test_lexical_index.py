@@ -0,0 +1,79 @@
+"""
+文字n-gram BM25インデックス（BM25Index・fuse_scores・rank_records）のテスト
+"""
+
+import numpy as np
+import pytest
+
+from app.lexical_index import BM25Index, char_ngrams, definition_text, fuse_scores, rank_records
+
+RECORDS = [
+    {"code": "16", "name": "看護師", "description": "患者のケア、診療の補助を行う。"},
+    {"code": "15", "name": "医師", "description": "診療、治療、手術を行う。\nただし、看護師は16に分類される。"},
+    {"code": "52", "name": "調理人", "description": "レストラン、食堂で料理を作る。"},
+    {"code": "41", "name": "販売店員", "description": "店舗で商品の販売、レジ業務を行う。"},
+]
+
+
+def test_char_ngrams_split_at_separators():
+    assert char_ngrams("看護師、ケア") == ["看護", "護師", "看護師", "ケア"]
+    assert char_ngrams("Ａ") == ["a"]
+
+
+def test_definition_text_drops_the_exclusion_note():
+    assert definition_text(RECORDS[1]["description"]) == "診療、治療、手術を行う。"
+
+
+def test_name_match_ranks_first():
+    index = BM25Index(RECORDS)
+    results = index.search("病院で看護師をしています", top_k=3)
+
+    assert results[0]["code"] == "16"
+    assert 0 < results[0]["similarity"] <= 1
+
+
+def test_exclusion_note_does_not_match():
+    # 医師の説明の「ただし、看護師は…」の注記は索引に含めない
+    results = BM25Index(RECORDS).search("看護師", top_k=5)
+    assert [result["code"] for result in results] == ["16"]
+
+
+def test_records_without_a_shared_term_are_not_returned():
+    index = BM25Index(RECORDS)
+
+    assert index.search("zzzz", top_k=5) == []
+    assert all(result["similarity"] > 0 for result in index.search("レジ", top_k=5))
+
+
+def test_normalized_scores_are_between_zero_and_one():
+    scores = BM25Index(RECORDS).normalized_scores("レストランで料理を作る調理人")
+    assert scores.max() <= 1 and scores.min() == 0
+    assert int(np.argmax(scores)) == 2
+
+
+def test_weighted_fusion():
+    fused = fuse_scores(np.array([0.9, 0.1]), np.array([0.0, 1.0]), method="weighted", vector_weight=0.7)
+    np.testing.assert_allclose(fused, [0.63, 0.37])
+
+
+def test_rrf_fusion_ignores_unmatched_lexical_records():
+    vector = np.array([0.9, 0.8, 0.1])
+    lexical = np.array([0.0, 0.5, 0.0])
+
+    fused = fuse_scores(vector, lexical, method="rrf", rrf_k=60)
+    np.testing.assert_allclose(fused, [1 / 61, 1 / 62 + 1 / 61, 1 / 63], rtol=1e-6)
+
+
+def test_rrf_depth_limits_ranked_records():
+    fused = fuse_scores(np.array([0.9, 0.8, 0.7]), np.zeros(3), method="rrf", depth=2)
+    assert fused[2] == 0
+
+
+def test_unknown_fusion_is_rejected():
+    with pytest.raises(ValueError):
+        fuse_scores(np.zeros(2), np.zeros(2), method="max")
+
+
+def test_rank_records_orders_by_score_and_reports_similarity():
+    results = rank_records(RECORDS, np.array([0.1, 0.4, 0.3, 0.2]), np.array([0.5, 0.6, 0.7, 0.8]), top_k=2)
+    assert [(r["code"], r["similarity"]) for r in results] == [("15", pytest.approx(0.6)), ("52", pytest.approx(0.7))]
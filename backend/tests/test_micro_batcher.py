@@ -0,0 +1,131 @@
+"""
+クエリEmbeddingのマイクロバッチ（AsyncMicroBatcher）のテスト
+"""
+
+import asyncio
+import contextvars
+
+from app.micro_batcher import AsyncMicroBatcher
+from app.providers import FakeProvider, RateLimitError
+
+
+class _RecordingProvider(FakeProvider):
+    """Embeddingの呼び出しごとの入力を記録する FakeProvider"""
+
+    def __init__(self, **kwargs):
+        super().__init__(dim=16, **kwargs)
+        self.batches = []
+
+    async def aembed(self, texts, task_type=None):
+        self.batches.append(list(texts))
+        return await super().aembed(texts, task_type=task_type)
+
+
+def _run(provider, texts, cancel=(), **options):
+    """texts を同時に submit し、cancel に含まれる位置の呼び出し元は送信前にキャンセル"""
+    async def main():
+        batcher = AsyncMicroBatcher(provider.aembed, **options)
+        waiters = [asyncio.ensure_future(batcher.submit(text)) for text in texts]
+        await asyncio.sleep(0)
+        for i in cancel:
+            waiters[i].cancel()
+        return await asyncio.gather(*waiters, return_exceptions=True), batcher
+
+    return asyncio.run(main())
+
+
+def test_concurrent_submits_share_one_call():
+    provider = _RecordingProvider()
+    results, batcher = _run(provider, ["営業", "経理", "看護師"], max_wait=0.01)
+
+    assert provider.batches == [["営業", "経理", "看護師"]]
+    assert results == [FakeProvider(dim=16).embed([text])[0] for text in ["営業", "経理", "看護師"]]
+    assert batcher.stats()["batches"] == 1
+
+
+def test_batches_are_split_at_max_batch_size():
+    provider = _RecordingProvider()
+    results, _ = _run(provider, [f"入力{i}" for i in range(5)], max_batch_size=2, max_wait=0.01)
+
+    assert [len(batch) for batch in provider.batches] == [2, 2, 1]
+    assert len(results) == 5
+
+
+def test_error_is_raised_to_every_caller_in_the_batch():
+    provider = _RecordingProvider(error_rate=1.0)
+    results, _ = _run(provider, ["営業", "経理"], max_wait=0.01)
+
+    assert len(provider.batches) == 1
+    assert all(isinstance(result, RateLimitError) for result in results)
+
+
+def test_cancelled_callers_are_not_sent():
+    provider = _RecordingProvider()
+    results, batcher = _run(provider, ["営業", "経理", "看護師"], cancel=[1], max_wait=0.01)
+
+    assert provider.batches == [["営業", "看護師"]]
+    assert isinstance(results[1], asyncio.CancelledError)
+    assert batcher.stats()["items"] == 2
+
+
+def test_batch_is_skipped_when_every_caller_is_cancelled():
+    provider = _RecordingProvider()
+    results, batcher = _run(provider, ["営業", "経理"], cancel=[0, 1], max_wait=0.01)
+
+    assert provider.batches == []
+    assert batcher.stats()["batches"] == 0
+
+
+def test_result_count_mismatch_fails_the_batch():
+    async def broken(items):
+        return items[:-1]
+
+    async def main():
+        batcher = AsyncMicroBatcher(broken, max_wait=0.01)
+        return await asyncio.gather(batcher.submit("a"), batcher.submit("b"), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, RuntimeError) and "結果件数" in str(result) for result in results)
+
+
+def test_cancelled_batch_cancels_every_caller():
+    started = asyncio.Event()
+
+    async def hang(items):
+        started.set()
+        await asyncio.Event().wait()
+
+    async def main():
+        batcher = AsyncMicroBatcher(hang, max_wait=0)
+        waiters = [asyncio.ensure_future(batcher.submit(text)) for text in ["営業", "経理"]]
+        await started.wait()
+        for task in batcher._tasks:
+            task.cancel()
+        return await asyncio.wait_for(asyncio.gather(*waiters, return_exceptions=True), 1)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, asyncio.CancelledError) for result in results)
+
+
+def test_batches_are_split_by_key_and_run_in_its_context():
+    label = contextvars.ContextVar("label", default="interactive")
+    calls = []
+
+    async def record(items):
+        calls.append((label.get(), list(items)))
+        return items
+
+    async def submit(batcher, text, value):
+        label.set(value)
+        return await batcher.submit(text)
+
+    async def main():
+        batcher = AsyncMicroBatcher(record, max_wait=0.01, key=label.get)
+        return await asyncio.gather(
+            submit(batcher, "営業", "bulk"),
+            submit(batcher, "経理", "interactive"),
+            submit(batcher, "看護師", "bulk"),
+        )
+
+    assert asyncio.run(main()) == ["営業", "経理", "看護師"]
+    assert sorted(calls) == [("bulk", ["営業", "看護師"]), ("interactive", ["経理"])]
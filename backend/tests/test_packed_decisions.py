@@ -0,0 +1,97 @@
+"""
+まとめて判定（decide_classes・_parse_packed_decisions）のテスト
+"""
+
+import json
+
+import pytest
+
+from app.providers import GenerationResult
+
+ITEMS = [
+    ("会社の経理を担当しています", [
+        {"code": "25", "name": "会計事務従事者", "description": ""},
+        {"code": "21", "name": "一般事務従事者", "description": ""},
+    ]),
+    ("レストランで料理を作っています", [
+        {"code": "52", "name": "飲食物調理従事者", "description": ""},
+        {"code": "41", "name": "販売従事者", "description": ""},
+    ]),
+]
+
+
+@pytest.fixture
+def classifier(make_classifier):
+    return make_classifier()
+
+
+def test_valid_answers_use_the_catalog_names(classifier):
+    text = json.dumps([
+        {"id": 1, "code": "52", "name": "コック", "reason": "調理"},
+        {"id": 0, "code": "25", "name": "経理", "reason": "経理"},
+    ], ensure_ascii=False)
+
+    results = classifier._parse_packed_decisions(text, ITEMS)
+    assert results == [
+        {"code": "25", "name": "会計事務従事者", "reason": "経理"},
+        {"code": "52", "name": "飲食物調理従事者", "reason": "調理"},
+    ]
+
+
+def test_results_wrapped_in_an_object_are_accepted(classifier):
+    text = json.dumps({"results": [{"id": 0, "code": "21", "reason": ""}]})
+    assert classifier._parse_packed_decisions(text, ITEMS)[0]["code"] == "21"
+
+
+@pytest.mark.parametrize("entries", [
+    [],                                                           # 欠落
+    [{"id": 5, "code": "25"}, {"id": -1, "code": "25"}],          # 範囲外の項目番号
+    [{"id": 0, "code": "52"}],                                    # その項目の候補にないコード
+    [{"id": "x", "code": "25"}, {"code": "25"}, "25"],            # 不正な要素
+])
+def test_invalid_entries_are_left_for_retry(classifier, entries):
+    assert classifier._parse_packed_decisions(json.dumps(entries), ITEMS) == [None, None]
+
+
+def test_first_answer_wins_for_duplicate_ids(classifier):
+    text = json.dumps([{"id": 0, "code": "25", "reason": "1回目"}, {"id": 0, "code": "21", "reason": "2回目"}])
+
+    results = classifier._parse_packed_decisions(text, ITEMS)
+    assert results[0]["reason"] == "1回目"
+    assert results[1] is None
+
+
+def test_only_invalid_items_are_decided_again(classifier):
+    generate = classifier.provider.generate
+    prompts = []
+
+    def packed_then_real(prompt, temperature=0.3, json_mode=True):
+        prompts.append(prompt)
+        if len(prompts) == 1:
+            return GenerationResult(json.dumps([{"id": 0, "code": "25", "reason": "まとめて"}]))
+        return generate(prompt, temperature=temperature, json_mode=json_mode)
+
+    classifier.provider.generate = packed_then_real
+    results = classifier.decide_classes(ITEMS)
+
+    assert len(prompts) == 2
+    assert ITEMS[1][0] in prompts[1] and ITEMS[0][0] not in prompts[1]
+    assert results[0]["reason"] == "まとめて"
+    assert results[1]["code"] in ("52", "41")
+
+
+def test_unparseable_answer_decides_every_item_again(classifier):
+    generate = classifier.provider.generate
+    calls = []
+
+    def broken_then_real(prompt, temperature=0.3, json_mode=True):
+        calls.append(prompt)
+        if len(calls) == 1:
+            return GenerationResult("not json")
+        return generate(prompt, temperature=temperature, json_mode=json_mode)
+
+    classifier.provider.generate = broken_then_real
+    results = classifier.decide_classes(ITEMS)
+
+    assert len(calls) == 3
+    assert [result["code"] for result in results] == ["25", "52"]
@@ -0,0 +1,60 @@
+"""
+判定プロンプトの職業説明の要約とトークン数の上限（prompt_budget）のテスト
+"""
+
+from app.prompt_budget import (
+    ELLIPSIS, condense_description, estimate_tokens, fit_descriptions, truncate_to_tokens,
+)
+
+
+def test_estimate_tokens_counts_japanese_per_character():
+    assert estimate_tokens("看護師") == 3
+    assert estimate_tokens("abcdefgh") == 2
+    assert estimate_tokens("") == 0
+
+
+def test_truncate_to_tokens_adds_an_ellipsis():
+    text = "患者のケア、診療の補助を行う"
+    truncated = truncate_to_tokens(text, 6)
+
+    assert truncated.endswith(ELLIPSIS)
+    assert estimate_tokens(truncated) <= 6
+    assert truncate_to_tokens(text, 100) == text
+
+
+def test_descriptions_within_budget_are_unchanged():
+    texts = ["看護師", "医師"]
+    assert fit_descriptions(texts, 10) == texts
+    assert fit_descriptions(texts, 0) == texts
+    assert fit_descriptions([], 10) == []
+
+
+def test_total_fits_the_budget_and_short_descriptions_are_kept():
+    texts = ["短い説明", "長" * 100, "長" * 80]
+    fitted = fit_descriptions(texts, 60)
+
+    assert sum(estimate_tokens(text) for text in fitted) <= 60
+    # 短い説明はそのまま残し、余った分は長い説明に均等に回す
+    assert fitted[0] == "短い説明"
+    assert estimate_tokens(fitted[1]) == estimate_tokens(fitted[2]) == 28
+
+
+def test_order_of_descriptions_is_kept():
+    texts = ["ア" * 50, "イ" * 5, "ウ" * 50]
+    fitted = fit_descriptions(texts, 40)
+
+    assert [text[0] for text in fitted] == ["ア", "イ", "ウ"]
+    assert fitted[1] == "イ" * 5
+
+
+def test_condense_description_keeps_definition_and_exclusions():
+    description = (
+        "管理的公務員。国又は地方公共団体の管理的な仕事に従事するものをいう。\n"
+        "ただし、次の仕事に従事するものは含まれない。\n"
+        "(1)　独立行政法人の役員は中分類〔02〕に分類される。\n"
+    )
+    condensed = condense_description("管理的公務員", description)
+
+    assert not condensed.startswith("管理的公務員。")
+    assert "従事するものをいう" not in condensed
+    assert "除外: 独立行政法人の役員→中分類〔02〕" in condensed
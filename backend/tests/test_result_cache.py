@@ -0,0 +1,159 @@
+"""
+分類結果キャッシュ（RESP クライアント・2層キャッシュ）のテスト
+
+Redis の代わりに、GET / SET / SCAN / DEL / DBSIZE / AUTH / SELECT だけを実装した
+RESP サーバーをテスト内で起動します。
+"""
+
+import socketserver
+import threading
+
+import pytest
+
+from app.caches import TTLCache
+from app.result_cache import RedisResultStore, ResultCache
+
+
+class _RespHandler(socketserver.StreamRequestHandler):
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        assert line.startswith(b"*")
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def handle(self):
+        server = self.server
+        while True:
+            args = self._read_command()
+            if args is None:
+                return
+            name = args[0].decode().upper()
+            server.commands.append(name)
+            if server.drop_next:
+                # 応答せずに接続を切断（サーバーの再起動・アイドル切断の再現）
+                server.drop_next = False
+                return
+            if name in ("AUTH", "SELECT"):
+                self.wfile.write(b"+OK\r\n")
+            elif name == "GET":
+                value = server.data.get(args[1])
+                self.wfile.write(b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value))
+            elif name == "SET":
+                server.data[args[1]] = args[2]
+                self.wfile.write(b"+OK\r\n")
+            elif name == "SCAN":
+                prefix = args[3][:-1]
+                keys = [key for key in server.data if key.startswith(prefix)]
+                reply = b"*2\r\n$1\r\n0\r\n*%d\r\n" % len(keys)
+                reply += b"".join(b"$%d\r\n%s\r\n" % (len(key), key) for key in keys)
+                self.wfile.write(reply)
+            elif name == "DEL":
+                removed = sum(server.data.pop(key, None) is not None for key in args[1:])
+                self.wfile.write(b":%d\r\n" % removed)
+            elif name == "DBSIZE":
+                self.wfile.write(b":%d\r\n" % len(server.data))
+            else:
+                self.wfile.write(b"-ERR unknown command\r\n")
+
+
+@pytest.fixture
+def resp_server():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _RespHandler)
+    server.daemon_threads = True
+    server.data, server.commands, server.drop_next = {}, [], False
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _url(server, path="") -> str:
+    host, port = server.server_address
+    return f"redis://:secret@{host}:{port}{path}"
+
+
+def test_redis_store_round_trip(resp_server):
+    store = RedisResultStore(_url(resp_server, "/2"), ttl=60)
+
+    assert store.get("missing") is None
+    store.set("occupation:result:v1:a", "結果A")
+    store.set("occupation:result:v2:b", "結果B")
+
+    assert store.get("occupation:result:v1:a") == "結果A"
+    assert len(store) == 2
+    assert resp_server.commands[:2] == ["AUTH", "SELECT"]
+
+    store.clear("occupation:result:v1:")
+    assert store.get("occupation:result:v1:a") is None
+    assert store.get("occupation:result:v2:b") == "結果B"
+
+
+def test_redis_store_reconnects_once_after_disconnect(resp_server):
+    store = RedisResultStore(_url(resp_server))
+    store.set("key", "value")
+
+    resp_server.drop_next = True
+    assert store.get("key") == "value"
+    assert resp_server.commands.count("AUTH") == 2
+
+
+def test_redis_store_raises_error_replies(resp_server):
+    store = RedisResultStore(_url(resp_server))
+    with pytest.raises(RuntimeError, match="unknown command"):
+        store._command("FLUSHALL")
+
+
+def test_result_cache_shares_results_between_replicas(resp_server):
+    first = ResultCache(TTLCache(maxsize=10), RedisResultStore(_url(resp_server)))
+    second = ResultCache(TTLCache(maxsize=10), RedisResultStore(_url(resp_server)))
+    for cache in (first, second):
+        cache.set_version("v1")
+
+    first.set("  経理の仕事 ", {"code": "251"})
+    assert second.get("経理の仕事") == {"code": "251"}
+    assert second.shared_hits == 1
+
+    # 別のバージョンのレプリカは参照しない
+    other = ResultCache(TTLCache(maxsize=10), RedisResultStore(_url(resp_server)))
+    other.set_version("v2")
+    assert other.get("経理の仕事") is None
+
+
+def test_result_cache_treats_shared_failure_as_miss():
+    # 接続できないポートを指定（共有層の障害は分類処理を止めない）
+    with socketserver.TCPServer(("127.0.0.1", 0), socketserver.BaseRequestHandler) as unused:
+        host, port = unused.server_address
+    cache = ResultCache(TTLCache(maxsize=10), RedisResultStore(f"redis://{host}:{port}", timeout=0.2))
+    cache.set_version("v1")
+
+    cache.set("入力", {"code": "001"})
+    assert cache.get("入力") == {"code": "001"}
+    cache.local.clear()
+    assert cache.get("入力") is None
+    assert cache.shared_errors == 2
+
+
+def test_version_change_keeps_shared_entries_for_other_replicas(resp_server):
+    old = ResultCache(TTLCache(maxsize=10), RedisResultStore(_url(resp_server)))
+    new = ResultCache(TTLCache(maxsize=10), RedisResultStore(_url(resp_server)))
+    for cache in (old, new):
+        cache.set_version("v1")
+    old.set("経理の仕事", {"code": "251"})
+
+    # 再読み込み・ローリング更新で一方のレプリカだけが新しいバージョンに変わる
+    new.set_version("v2")
+    assert len(new.local) == 0
+    assert new.get("経理の仕事") is None
+    assert old.get("経理の仕事") == {"code": "251"}
+    assert "SCAN" not in resp_server.commands
+
+    # 共有層の削除は明示的な invalidate のみ
+    new.invalidate(all_versions=True)
+    old.local.clear()
+    assert old.get("経理の仕事") is None
@@ -0,0 +1,174 @@
+"""
+上流APIの流量制御（TokenBucket・UpstreamScheduler・ScheduledProvider）のテスト
+（時刻は手動で進める時計を使い、実際の経過時間には依存しない）
+"""
+
+import asyncio
+
+import pytest
+
+from app import scheduler
+from app.providers import FakeProvider, RateLimitError
+from app.scheduler import ScheduledProvider, TokenBucket, UpstreamScheduler
+
+
+class _ManualClock:
+    """手動で進める時計（time.monotonic・time.sleep・asyncio.sleep の代わり）"""
+
+    def __init__(self):
+        self.now = 0.0
+        self._sleepers = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        # 同期版の待機は呼び出し元が1つだけのため、そのまま時計を進める
+        self.now += seconds
+
+    async def async_sleep(self, seconds: float):
+        # 非同期版の待機は advance で時計が起床時刻まで進むまで待つ
+        future = asyncio.get_running_loop().create_future()
+        self._sleepers.append((self.now + seconds, future))
+        await future
+
+    async def advance(self, seconds: float):
+        """時計を進め、起床時刻を過ぎた待機を再開させる"""
+        self.now += seconds
+        for sleeper in [sleeper for sleeper in self._sleepers if sleeper[0] <= self.now]:
+            self._sleepers.remove(sleeper)
+            sleeper[1].set_result(None)
+        for _ in range(10):
+            await asyncio.sleep(0)
+
+
+def _bucket(clock: _ManualClock, requests_per_minute: float, **options) -> TokenBucket:
+    return TokenBucket("embed", requests_per_minute, clock=clock, **options)
+
+
+def _provider(clock: _ManualClock, bucket: TokenBucket, **fake_options) -> ScheduledProvider:
+    return ScheduledProvider(
+        FakeProvider(dim=16, **fake_options),
+        UpstreamScheduler({"embed": bucket}, clock=clock, sleep=clock.sleep, async_sleep=clock.async_sleep),
+    )
+
+
+def test_unlimited_bucket_does_not_wait():
+    bucket = _bucket(_ManualClock(), 0)
+    assert all(bucket.try_acquire("bulk") == 0 for _ in range(100))
+
+
+def test_calls_beyond_the_burst_wait_for_a_token():
+    clock = _ManualClock()
+    provider = _provider(clock, _bucket(clock, 600, burst=2))  # 10件/秒
+
+    for _ in range(3):
+        provider.embed(["営業"])
+    assert clock.now == pytest.approx(0.1)
+
+
+def test_bulk_leaves_reserved_tokens_for_interactive():
+    bucket = _bucket(_ManualClock(), 60, burst=5, bulk_reserved_ratio=0.2)  # 1件/秒
+
+    assert [bucket.try_acquire("bulk") == 0 for _ in range(5)] == [True] * 4 + [False]
+    assert bucket.try_acquire("interactive") == 0
+
+
+def test_bulk_waits_while_interactive_is_queued():
+    bucket = _bucket(_ManualClock(), 60, burst=5)
+
+    with bucket.queued("interactive"):
+        assert bucket.try_acquire("bulk") > 0
+    assert bucket.try_acquire("bulk") == 0
+    assert bucket.stats()["waiting"] == {"interactive": 0, "bulk": 0}
+
+
+def test_interactive_is_served_before_queued_bulk():
+    clock = _ManualClock()
+    provider = _provider(clock, _bucket(clock, 1200, burst=1, bulk_reserved_ratio=0))  # 20件/秒
+    order = []
+
+    async def call(priority: str, name: str):
+        with scheduler.priority(priority):
+            await provider.aembed([name])
+        order.append(name)
+
+    async def main():
+        await provider.aembed(["最初"])  # バーストを使い切る
+        bulk = [asyncio.ensure_future(call("bulk", f"bulk{i}")) for i in range(3)]
+        await clock.advance(0)
+        interactive = asyncio.ensure_future(call("interactive", "interactive"))
+        await clock.advance(0)
+        tasks = [interactive, *bulk]
+        while not all(task.done() for task in tasks):
+            await clock.advance(0.05)
+
+    asyncio.run(main())
+    assert order == ["interactive", "bulk0", "bulk1", "bulk2"]
+
+
+def test_rate_limit_error_halves_rate_and_pauses():
+    clock = _ManualClock()
+    bucket = _bucket(clock, 6000, recovery_seconds=1)
+    provider = _provider(clock, bucket, error_rate=1.0)
+
+    with pytest.raises(RateLimitError):
+        provider.embed(["営業"])
+    assert bucket.stats()["current_requests_per_minute"] == 3000
+    assert bucket.try_acquire("interactive") == pytest.approx(scheduler.PAUSE_INITIAL_SECONDS)
+
+    # 一時停止中に届いた 429（送信済みの呼び出し）は1回分として扱う
+    bucket.on_rate_limited()
+    assert bucket.stats()["current_requests_per_minute"] == 3000
+    assert bucket.stats()["rate_limited"] == 2
+
+    # 一時停止が終わり、下げたレートでトークンが補充されるまで待ってから送信する
+    with pytest.raises(RateLimitError):
+        provider.embed(["営業"])
+    assert clock.now == pytest.approx(scheduler.PAUSE_INITIAL_SECONDS + 60 / 3000)
+
+    # 連続する 429 は一時停止を倍にする
+    assert bucket.stats()["current_requests_per_minute"] == 1500
+    assert bucket.stats()["paused_seconds"] == pytest.approx(scheduler.PAUSE_INITIAL_SECONDS * 2)
+
+
+def test_rate_recovers_after_successful_calls():
+    clock = _ManualClock()
+    bucket = _bucket(clock, 6000, recovery_seconds=1)
+    provider = _provider(clock, bucket, error_rate=1.0)
+    with pytest.raises(RateLimitError):
+        provider.embed(["営業"])
+
+    provider.inner.error_rate = 0
+    provider.embed(["営業"])  # 一時停止の終了を待って送信
+    rates = [bucket.stats()["current_requests_per_minute"]]
+    for _ in range(10):
+        clock.now += 0.1
+        provider.embed(["営業"])
+        rates.append(bucket.stats()["current_requests_per_minute"])
+    # recovery_seconds（1秒）かけて設定値まで戻す
+    assert 3000 < rates[0] < rates[1] < rates[2] < 6000
+    assert rates[-1] == 6000
+    assert bucket.stats()["paused_seconds"] == 0
+
+
+def test_unlimited_bucket_still_pauses_after_rate_limit_error():
+    clock = _ManualClock()
+    bucket = _bucket(clock, 0)
+    provider = _provider(clock, bucket, error_rate=1.0)
+
+    with pytest.raises(RateLimitError):
+        provider.embed(["営業"])
+    assert bucket.try_acquire("interactive") == pytest.approx(scheduler.PAUSE_INITIAL_SECONDS)
+    clock.now += scheduler.PAUSE_INITIAL_SECONDS
+    assert bucket.try_acquire("interactive") == 0
+
+
+def test_priority_context():
+    assert scheduler.current_priority() == "interactive"
+    with scheduler.priority("bulk"):
+        assert scheduler.current_priority() == "bulk"
+    assert scheduler.current_priority() == "interactive"
+    with pytest.raises(ValueError):
+        with scheduler.priority("urgent"):
+            pass
@@ -0,0 +1,102 @@
+"""
+同一リクエストの集約（AsyncSingleFlight）のテスト
+"""
+
+import asyncio
+
+import pytest
+
+from app.providers import FakeProvider, RateLimitError
+from app.singleflight import AsyncSingleFlight
+
+
+class _CountingProvider(FakeProvider):
+    """生成の呼び出し回数・キャンセルを記録する FakeProvider"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = 0
+        self.cancelled = False
+
+    async def agenerate(self, prompt, temperature=0.3, json_mode=True):
+        self.calls += 1
+        try:
+            return await super().agenerate(prompt, temperature=temperature, json_mode=json_mode)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+
+def test_concurrent_requests_share_one_call():
+    provider = _CountingProvider(latency_ms=50)
+    flight = AsyncSingleFlight()
+
+    async def main():
+        return await asyncio.gather(*[
+            flight.do("key", lambda: provider.agenerate("入力")) for _ in range(5)
+        ])
+
+    results = asyncio.run(main())
+    assert provider.calls == 1
+    assert all(result is results[0] for result in results)
+    assert flight.stats() == {"executions": 1, "coalesced": 4, "cancelled": 0, "in_flight": 0}
+
+
+def test_error_is_raised_to_every_waiter():
+    provider = _CountingProvider(latency_ms=20, error_rate=1.0)
+    flight = AsyncSingleFlight()
+
+    async def main():
+        return await asyncio.gather(*[
+            flight.do("key", lambda: provider.agenerate("入力")) for _ in range(3)
+        ], return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert provider.calls == 1
+    assert len(results) == 3 and all(isinstance(result, RateLimitError) for result in results)
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_cancelling_one_waiter_keeps_the_shared_call():
+    provider = _CountingProvider(latency_ms=100)
+    flight = AsyncSingleFlight()
+
+    async def main():
+        first = asyncio.ensure_future(flight.do("key", lambda: provider.agenerate("入力")))
+        second = asyncio.ensure_future(flight.do("key", lambda: provider.agenerate("入力")))
+        await asyncio.sleep(0.02)
+        first.cancel()
+        result = await second
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return result
+
+    result = asyncio.run(main())
+    assert result.text
+    assert provider.calls == 1
+    assert not provider.cancelled
+    assert flight.stats()["cancelled"] == 0
+
+
+def test_cancelling_every_waiter_cancels_the_shared_call():
+    provider = _CountingProvider(latency_ms=200)
+    flight = AsyncSingleFlight()
+
+    async def main():
+        waiters = [asyncio.ensure_future(flight.do("key", lambda: provider.agenerate("入力"))) for _ in range(2)]
+        await asyncio.sleep(0.02)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.sleep(0)
+        assert provider.cancelled
+        assert flight.stats()["in_flight"] == 0
+
+        # 中止後の同じキーのリクエストは新たに実行する
+        provider.latency = 0
+        await flight.do("key", lambda: provider.agenerate("入力"))
+
+    asyncio.run(main())
+    assert provider.calls == 2
+    assert flight.stats()["cancelled"] == 1
+    assert flight.stats()["executions"] == 2
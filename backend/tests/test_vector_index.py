@@ -0,0 +1,72 @@
+"""
+ベクトル検索インデックス（top_k_indices・VectorIndex）のテスト
+"""
+
+import numpy as np
+import pytest
+
+from app.vector_index import VectorIndex, normalize_rows, top_k_indices
+
+
+def _records(n: int):
+    return [{"code": str(i), "name": f"職業{i}", "description": ""} for i in range(n)]
+
+
+def test_top_k_indices_are_sorted_by_score():
+    scores = np.array([0.1, 0.9, 0.5, 0.7, 0.3])
+
+    assert top_k_indices(scores, 3).tolist() == [1, 3, 2]
+    assert top_k_indices(scores, 10).tolist() == [1, 3, 2, 4, 0]
+    assert top_k_indices(scores, 0).tolist() == []
+
+
+def test_top_k_indices_keep_ties_in_row_order():
+    scores = np.array([0.5, 0.8, 0.5, 0.8])
+    assert top_k_indices(scores, 4).tolist() == [1, 3, 0, 2]
+
+
+def test_normalize_rows_keeps_zero_vectors():
+    normalized = normalize_rows(np.array([[3.0, 4.0], [0.0, 0.0]]))
+
+    assert normalized.dtype == np.float32
+    np.testing.assert_allclose(normalized, [[0.6, 0.8], [0.0, 0.0]])
+
+
+def test_search_matches_brute_force_cosine_similarity():
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(50, 8))
+    query = rng.normal(size=8)
+    index = VectorIndex(vectors, _records(50))
+
+    expected = vectors @ query / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query))
+    results = index.search(query, top_k=5)
+    assert [int(r["code"]) for r in results] == np.argsort(-expected)[:5].tolist()
+    np.testing.assert_allclose([r["similarity"] for r in results], np.sort(expected)[::-1][:5], rtol=1e-5)
+
+
+def test_search_batch_matches_single_searches():
+    rng = np.random.default_rng(1)
+    index = VectorIndex(rng.normal(size=(30, 8)), _records(30))
+    queries = rng.normal(size=(4, 8))
+
+    batched = index.search_batch(queries, top_k=3)
+    single = [index.search(query, top_k=3) for query in queries]
+    assert [[r["code"] for r in rows] for rows in batched] == [[r["code"] for r in rows] for rows in single]
+    np.testing.assert_allclose(
+        [[r["similarity"] for r in rows] for rows in batched],
+        [[r["similarity"] for r in rows] for rows in single],
+        rtol=1e-5,
+    )
+
+
+def test_normalized_matrix_is_used_without_copy():
+    matrix = normalize_rows(np.eye(3))
+    index = VectorIndex(matrix, _records(3), normalized=True)
+
+    assert index.matrix is matrix
+    assert index.dim == 3 and len(index) == 3
+
+
+def test_mismatched_record_count_is_rejected():
+    with pytest.raises(ValueError):
+        VectorIndex(np.eye(3), _records(2))
@@ -0,0 +1,129 @@
+"""
+起動時の準備処理の進捗（WarmupProgress）と /api/health/live・/api/health/ready のテスト
+（準備処理はバックグラウンドで実行しないよう、lifespan を起動せずに進捗を差し替える）
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.warmup import WarmupProgress
+
+
+def _finish_required(progress: WarmupProgress):
+    for phase in progress.required:
+        with progress.phase(phase):
+            pass
+
+
+def test_status_is_warming_until_required_phases_are_done():
+    progress = WarmupProgress()
+    assert progress.snapshot()["status"] == "warming"
+
+    with progress.phase("catalog"):
+        assert progress.snapshot()["phases"]["catalog"]["status"] == "running"
+    assert not progress.ready
+    assert progress.snapshot()["ready_seconds"] is None
+
+    with progress.phase("embeddings"):
+        progress.update("embeddings", done=5, total=10)
+        assert progress.snapshot()["phases"]["embeddings"]["done"] == 5
+
+    snapshot = progress.snapshot()
+    assert progress.ready
+    assert snapshot["status"] == "ready"
+    assert snapshot["ready_seconds"] is not None
+    assert snapshot["phases"]["embeddings"]["total"] == 10
+    assert "elapsed_seconds" in snapshot["phases"]["embeddings"]
+    assert snapshot["phases"]["provider"]["status"] == "pending"
+
+
+def test_failed_required_phase_fails_readiness():
+    progress = WarmupProgress()
+
+    with pytest.raises(RuntimeError):
+        with progress.phase("catalog"):
+            raise RuntimeError("CSVが見つかりません")
+
+    snapshot = progress.snapshot()
+    assert progress.failed
+    assert not progress.ready
+    assert snapshot["status"] == "failed"
+    assert snapshot["phases"]["catalog"] == {
+        "status": "failed",
+        "error": "CSVが見つかりません",
+        "elapsed_seconds": snapshot["phases"]["catalog"]["elapsed_seconds"],
+    }
+
+
+def test_optional_phase_failure_keeps_ready():
+    progress = WarmupProgress()
+    _finish_required(progress)
+
+    with pytest.raises(OSError):
+        with progress.phase("prewarm"):
+            raise OSError()
+    progress.finish("provider", "skipped")
+
+    snapshot = progress.snapshot()
+    assert not progress.failed
+    assert snapshot["status"] == "ready"
+    assert snapshot["phases"]["prewarm"]["error"] == "OSError"
+    assert snapshot["phases"]["provider"]["status"] == "skipped"
+
+
+@pytest.fixture
+def progress(monkeypatch):
+    """アプリの準備処理の進捗を差し替える（Classifier は未作成の状態から始める）"""
+    progress = WarmupProgress()
+    monkeypatch.setattr(main, "warmup_progress", progress)
+    monkeypatch.setattr(main, "classifier", None)
+    return progress
+
+
+@pytest.fixture
+def client(progress):
+    """lifespan（バックグラウンドの準備処理）を起動しない TestClient"""
+    return TestClient(main.app)
+
+
+def test_health_while_warming(client, progress):
+    with progress.phase("catalog"):
+        pass
+
+    live = client.get("/api/health/live")
+    assert live.status_code == 200
+    assert live.json()["message"] == "warming up"
+
+    ready = client.get("/api/health/ready")
+    assert ready.status_code == 503
+    assert ready.json()["status"] == "warming"
+    assert ready.json()["phases"]["catalog"]["status"] == "done"
+
+
+def test_health_after_ready(client, progress, monkeypatch):
+    _finish_required(progress)
+    # 必須の段階が完了しても Classifier が公開されるまでは 503
+    assert client.get("/api/health/ready").status_code == 503
+
+    monkeypatch.setattr(main, "classifier", object())
+    live = client.get("/api/health/live")
+    assert live.status_code == 200
+    assert live.json()["message"] == "ready"
+
+    ready = client.get("/api/health/ready")
+    assert ready.status_code == 200
+    assert ready.json()["status"] == "ready"
+    assert ready.json()["ready_seconds"] is not None
+
+
+def test_health_after_required_phase_failed(client, progress):
+    with pytest.raises(RuntimeError):
+        with progress.phase("embeddings"):
+            raise RuntimeError("上流APIに接続できません")
+
+    assert client.get("/api/health/live").status_code == 503
+    ready = client.get("/api/health/ready")
+    assert ready.status_code == 503
+    assert ready.json()["status"] == "failed"
+    assert ready.json()["phases"]["embeddings"]["error"] == "上流APIに接続できません"
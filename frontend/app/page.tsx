@@ -15,12 +15,15 @@ interface ClassifyResponse {
   reason: string;
   candidates: Candidate[];
   user_input: string;
+  decision_path?: string;
 }
 
 export default function Home() {
   const [userInput, setUserInput] = useState('');
   const [loading, setLoading] = useState(false);
   const [result, setResult] = useState<ClassifyResponse | null>(null);
+  const [candidates, setCandidates] = useState<Candidate[] | null>(null);
+  const [streamingReason, setStreamingReason] = useState('');
   const [error, setError] = useState<string | null>(null);
 
   const handleSubmit = async (e: React.FormEvent) => {
@@ -34,12 +37,15 @@ export default function Home() {
     setLoading(true);
     setError(null);
     setResult(null);
+    setCandidates(null);
+    setStreamingReason('');
 
     try {
       // Note: Using hardcoded LoadBalancer IP since Next.js NEXT_PUBLIC_ vars
       // are embedded at build-time and don't reflect Kubernetes runtime env vars
       const backendUrl = 'http://10.0.20.96:8000';
-      const response = await fetch(`${backendUrl}/api/classify`, {
+      // 候補リスト → 判定理由 → 判定結果 の順に Server-Sent Events で受信
+      const response = await fetch(`${backendUrl}/api/classify/stream`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -47,13 +53,46 @@ export default function Home() {
         body: JSON.stringify({ user_input: userInput }),
       });
 
-      if (!response.ok) {
+      if (!response.ok || !response.body) {
         const errorData = await response.json();
         throw new Error(errorData.detail || '判定に失敗しました');
       }
 
-      const data: ClassifyResponse = await response.json();
-      setResult(data);
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // イベントは空行で区切られる
+        let separator;
+        while ((separator = buffer.indexOf('\n\n')) !== -1) {
+          const block = buffer.slice(0, separator);
+          buffer = buffer.slice(separator + 2);
+
+          let event = 'message';
+          let data = '';
+          for (const line of block.split('\n')) {
+            if (line.startsWith('event:')) event = line.slice(6).trim();
+            else if (line.startsWith('data:')) data += line.slice(5).trim();
+          }
+          if (!data) continue;
+          const payload = JSON.parse(data);
+
+          if (event === 'candidates') {
+            setCandidates(payload.candidates);
+          } else if (event === 'token') {
+            setStreamingReason((prev) => prev + payload.text);
+          } else if (event === 'result') {
+            setResult(payload as ClassifyResponse);
+          } else if (event === 'error') {
+            throw new Error(payload.detail || '判定に失敗しました');
+          }
+        }
+      }
     } catch (err) {
       setError(err instanceof Error ? err.message : '予期しないエラーが発生しました');
     } finally {
@@ -159,9 +198,9 @@ export default function Home() {
         )}
 
         {/* 結果表示 */}
-        {result && (
+        {(result || candidates) && (
           <div className="space-y-6">
-            {/* 判定結果 */}
+            {/* 判定結果（判定中は受信済みの判定理由を表示） */}
             <div className="glass rounded-2xl p-6 md:p-8 card animate-pulse-glow">
               <h2 className="text-2xl font-bold mb-4 flex items-center gap-2">
                 <span className="text-3xl">✅</span>
@@ -171,21 +210,21 @@ export default function Home() {
               <div className="space-y-4">
                 <div className="flex items-start gap-4">
                   <div className="px-4 py-2 bg-gradient-to-r from-blue-600 to-purple-600 rounded-lg font-mono text-2xl font-bold">
-                    {result.code}
+                    {result ? result.code : '…'}
                   </div>
                   <div className="flex-1">
                     <h3 className="text-2xl font-bold text-blue-300 mb-2">
-                      {result.name}
+                      {result ? result.name : '判定中...'}
                     </h3>
                     <p className="text-gray-300 leading-relaxed">
-                      {result.reason}
+                      {result ? result.reason : streamingReason}
                     </p>
                   </div>
                 </div>
 
                 <div className="pt-4 border-t border-gray-700">
                   <p className="text-sm text-gray-400">
-                    <span className="font-semibold">入力内容:</span> {result.user_input}
+                    <span className="font-semibold">入力内容:</span> {result ? result.user_input : userInput}
                   </p>
                 </div>
               </div>
@@ -199,7 +238,7 @@ export default function Home() {
               </h3>
 
               <div className="space-y-3">
-                {result.candidates.map((candidate, index) => (
+                {(result ? result.candidates : candidates ?? []).map((candidate, index) => (
                   <div
                     key={index}
                     className="bg-gray-900/50 rounded-xl p-4 border border-gray-700 hover:border-blue-500 transition-all card"
@@ -3,17 +3,25 @@
 """
 職業分類判定システム (RAG構成)
 ユーザーの自由記述から適切な職業分類コードを判定します。
+
+使い方:
+    python main.py                                  # テストケースの実行
+    python main.py bulk answers.csv -o results.jsonl  # ファイルの一括判定
+    python main.py bulk answers.csv -o results.jsonl --resume  # 中断した位置から再開
+    （bulk はバックエンドの python -m app.bulk を実行します）
 """
 
 import os
 import sys
 import json
-import pandas as pd
-import numpy as np
-from typing import List, Dict, Tuple
+import subprocess
+from typing import TYPE_CHECKING, List, Dict, Tuple
 from dotenv import load_dotenv
-import google.generativeai as genai
-from sklearn.metrics.pairwise import cosine_similarity
+
+# pandas・scikit-learn・Gemini SDK は判定を実行する場合のみ読み込む
+# （bulk はバックエンドを起動するだけのため、これらを読み込まずにすぐに開始する）
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 class OccupationClassifier:
@@ -41,6 +49,7 @@ class OccupationClassifier:
             )
         
         # Gemini APIの設定
+        import google.generativeai as genai
         genai.configure(api_key=api_key)
         
         # Embeddingモデルの指定
@@ -59,7 +68,7 @@ class OccupationClassifier:
         self.embeddings = None
         self.embedding_texts = None
     
-    def _load_data(self, csv_path: str = None) -> pd.DataFrame:
+    def _load_data(self, csv_path: str = None) -> "pd.DataFrame":
         """
         職業分類データの読み込み
         
@@ -69,6 +78,8 @@ class OccupationClassifier:
         Returns:
             職業分類データのDataFrame
         """
+        import pandas as pd
+        
         if csv_path and os.path.exists(csv_path):
             # CSVファイルから読み込み
             print(f"CSVファイルを読み込んでいます: {csv_path}")
@@ -169,6 +180,9 @@ class OccupationClassifier:
             print("Embeddingsは既に作成済みです。")
             return
         
+        import numpy as np
+        import google.generativeai as genai
+        
         print(f"Embeddingsを作成しています...（{len(self.data)}件）")
         
         # テキストの結合: "職業名: 説明"
@@ -210,6 +224,10 @@ class OccupationClassifier:
         if self.embeddings is None:
             self.create_embeddings()
         
+        import numpy as np
+        import google.generativeai as genai
+        from sklearn.metrics.pairwise import cosine_similarity
+        
         try:
             # ユーザー入力をベクトル化
             result = genai.embed_content(
@@ -273,6 +291,8 @@ class OccupationClassifier:
   "reason": "この職業を選択した理由（日本語で簡潔に）"
 }}"""
         
+        import google.generativeai as genai
+        
         try:
             # Gemini での判定（JSON Modeを使用）
             response = self.model.generate_content(
@@ -380,5 +400,38 @@ def main():
         sys.exit(1)
 
 
+# バックエンドのディレクトリ（一括判定はバックエンドの app.bulk で実行）
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+
+
+def bulk_main(argv) -> int:
+    """
+    一括判定：バックエンドの python -m app.bulk を実行（引数はそのまま渡す）
+    
+    Returns:
+        終了コード
+    """
+    if not os.path.isdir(os.path.join(BACKEND_DIR, "app")):
+        raise RuntimeError(
+            f"バックエンド（{os.path.join(BACKEND_DIR, 'app')}）が見つかりません。"
+            "バックエンドを配置した環境で python -m app.bulk を実行してください"
+        )
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [BACKEND_DIR, env.get("PYTHONPATH")]))
+    process = subprocess.Popen([sys.executable, "-m", "app.bulk", *argv], env=env)
+    try:
+        return process.wait()
+    except KeyboardInterrupt:
+        # Ctrl-C は子プロセスにも届くため、子プロセスの中断処理（進捗の保存）の完了を待つ
+        return process.wait()
+
+
 if __name__ == "__main__":
-    main()
+    if sys.argv[1:2] == ["bulk"]:
+        try:
+            sys.exit(bulk_main(sys.argv[2:]))
+        except RuntimeError as e:
+            print(f"エラー: {e}", file=sys.stderr)
+            sys.exit(1)
+    else:
+        main()